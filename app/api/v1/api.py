@@ -1,7 +1,7 @@
 # /app/api/v1/api.py
 from fastapi import APIRouter, Depends
 
-from app.api.v1.endpoints import chat, login, api_keys
+from app.api.v1.endpoints import chat, login, api_keys, export, debug
 from app.services.external.multimodal_service import get_multimodal_service, MultiModalService
 from app.models.chat import ImageAnalysisRequest  # 添加这个导入
 
@@ -11,6 +11,8 @@ api_router = APIRouter()
 api_router.include_router(login.router, prefix="/auth", tags=["认证"])
 api_router.include_router(chat.router, prefix="/chat", tags=["聊天"])
 api_router.include_router(api_keys.router, prefix="/account", tags=["账户管理"])
+api_router.include_router(export.router, prefix="/export", tags=["数据导出"])
+api_router.include_router(debug.router, prefix="/debug", tags=["调试"])
 
 
 @api_router.post("/analyze-image")
@@ -1,21 +1,22 @@
 # /app/api/v1/endpoints/chat.py
 from datetime import datetime, timezone
 import time
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 from app.core.security import get_current_active_user
-from app.models.chat import TextChatRequest, ImageChatRequest, ChatRequest, ChatResponse
+from app.models.chat import TextChatRequest, ImageChatRequest, ChatRequest, ChatResponse, ConversationMessagesPage
 from app.models.user import User
-from app.services.chat_service import ChatService
+from app.services.chat_service import ChatService, TIER_ANONYMOUS, TIER_USER
 from app.services.external.llm_service import LLMService
-from app.services.storage.mongo_service import MongoService
-from app.services.storage.redis_service import RedisService
+from app.services.storage.mongo_service import get_mongo_service
+from app.services.storage.redis_service import get_redis_service
 from app.models.api_key import APIKey
 from app.services.api_key_service import APIKeyService
 from app.core.api_key_auth import get_current_api_key
 from app.core.logging import get_logger
+from app.core.tracing import traced_stream
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -23,9 +24,12 @@ router = APIRouter()
 async def get_chat_service() -> ChatService:
     """依赖注入聊天服务"""
     llm_service = LLMService()
-    mongo_service = MongoService()
-    redis_service = RedisService()
-    return ChatService(llm_service, mongo_service, redis_service)
+    mongo_service = get_mongo_service()
+    return ChatService(
+        llm_service=llm_service,
+        mongo_service=mongo_service,
+        redis_service=get_redis_service(),
+    )
 
 
 @router.post("/text", summary="文本咨询API")
@@ -41,8 +45,11 @@ async def chat_text(
     logger.info(f"Request ID: {request_id} - Received text chat request from user: {current_user.id}")
 
     try:
-        response_stream = chat_service.process_text_chat(
-            request=request, user=current_user, request_id=request_id
+        response_stream = traced_stream(
+            request_id,
+            "chat.text",
+            chat_service.process_text_chat(request=request, user=current_user, request_id=request_id, tier=TIER_USER),
+            conversation_id=request.conversation_id,
         )
         return StreamingResponse(
             response_stream,
@@ -78,8 +85,13 @@ async def chat_image(
         raise HTTPException(status_code=400, detail="Maximum of 5 images allowed.")
 
     try:
-        response_stream = chat_service.process_image_chat(
-            request=request, user=current_user, request_id=request_id
+        response_stream = traced_stream(
+            request_id,
+            "chat.image",
+            chat_service.process_image_chat(request=request, user=current_user, request_id=request_id, tier=TIER_USER),
+            conversation_id=request.conversation_id,
+            image_type=request.image_type.value,
+            images=len(request.images),
         )
         return StreamingResponse(
             response_stream,
@@ -105,7 +117,7 @@ async def chat(
     发送聊天消息并获取AI回复
     """
     try:
-        response = await chat_service.process_chat_request(request)
+        response = await chat_service.process_chat_request(request, tier=TIER_ANONYMOUS)
         return response
     except Exception as e:
         raise HTTPException(
@@ -141,6 +153,51 @@ async def get_conversation_history(
         )
 
 
+MESSAGE_FIELDS = {"role", "content", "timestamp", "metadata"}
+
+
+@router.get("/conversations/{conversation_id}/messages", response_model=ConversationMessagesPage, summary="分页获取对话消息")
+async def get_conversation_messages(
+    conversation_id: str,
+    limit: int = Query(20, ge=1, le=200),
+    before: str | None = Query(None, description="消息ID或ISO时间戳，返回其之前的消息"),
+    after: str | None = Query(None, description="消息ID或ISO时间戳，返回其之后的消息"),
+    since: datetime | None = Query(None, description="增量同步：返回该时间之后的新消息"),
+    fields: str | None = Query(None, description="逗号分隔的返回字段: role,content,timestamp,metadata"),
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """
+    基于游标的对话消息分页与增量同步
+    """
+    field_list = None
+    if fields:
+        field_list = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = set(field_list) - MESSAGE_FIELDS
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的字段: {', '.join(sorted(unknown))}"
+            )
+
+    if since and not after:
+        after = since.isoformat()
+
+    try:
+        return await chat_service.get_conversation_messages(
+            conversation_id, limit=limit, before=before, after=after, fields=field_list
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"无效的分页游标: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取对话消息失败: {str(e)}"
+        )
+
+
 class OpenAIChatMessage(BaseModel):
     role: str = Field(..., pattern="^(system|user|assistant)$")
     content: str
@@ -166,12 +223,12 @@ class OpenAIChatResponse(BaseModel):
 async def chat_completions(
     request: Request,
     chat_request: OpenAIChatRequest,
-    api_key: APIKey = Depends(get_current_api_key)
+    api_key: APIKey = Depends(get_current_api_key),
+    chat_service: ChatService = Depends(),
 ):
     """
     OpenAI兼容的聊天完成API
     """
-    chat_service = ChatService()
     api_key_service = APIKeyService()
 
     try:
@@ -198,7 +255,7 @@ async def chat_completions(
         )
 
         # 处理聊天请求
-        chat_response = await chat_service.process_chat_request(internal_request)
+        chat_response = await chat_service.process_chat_request(internal_request, tier=api_key.type.value)
 
         if not chat_response.success:
             raise HTTPException(
@@ -258,12 +315,12 @@ async def chat_completions(
 @router.post("/", response_model=ChatResponse, summary="发送聊天消息")
 async def chat(
     request: ChatRequest,
-    api_key: APIKey = Depends(get_current_api_key)
+    api_key: APIKey = Depends(get_current_api_key),
+    chat_service: ChatService = Depends(),
 ):
     """
     原有的聊天API (保持向后兼容)
     """
-    chat_service = ChatService()
     api_key_service = APIKeyService()
 
     try:
@@ -274,7 +331,7 @@ async def chat(
         await api_key_service.check_quota(api_key, estimated_tokens)
 
         # 处理聊天请求
-        response = await chat_service.process_chat_request(request)
+        response = await chat_service.process_chat_request(request, tier=api_key.type.value)
 
         if response.success:
             # 计算实际使用的Token
@@ -0,0 +1,116 @@
+import os
+import time
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+
+from app.core import profiling
+from app.core.config import settings
+from app.core.executors import run_in_thread
+from app.core.loop_monitor import loop_monitor
+from app.core.security import get_current_admin_user
+from app.core.tracing import waterfall
+from app.models.user import User
+
+router = APIRouter()
+
+
+@router.get("/traces/{request_id}", summary="请求追踪瀑布图")
+async def get_trace(
+    request_id: str,
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    按聊天接口返回的 X-Request-ID 查看该请求各阶段的 span（仅保存在本 worker 的环形缓冲区中）。
+    """
+    trace = waterfall(request_id)
+    if trace is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trace not found (expired from the buffer or served by another worker)"
+        )
+    return trace
+
+
+@router.get("/loop", summary="事件循环延迟与阻塞记录")
+async def get_loop_stats(current_user: User = Depends(get_current_admin_user)):
+    """
+    本 worker 的事件循环平均调度延迟，以及看门狗最近捕获的阻塞调用栈。
+    """
+    return loop_monitor.stats()
+
+
+@router.get("/profile", summary="剖析当前 worker")
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, le=settings.PROFILER_MAX_SECONDS),
+    mode: Literal["sampling", "cprofile"] = profiling.PROFILE_MODE_SAMPLING,
+    include_tasks: bool = Query(True, description="sampling 模式下同时采样挂起任务的 await 链（墙钟时间）"),
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    对处理本请求的 worker 剖析 seconds 秒后返回结果文件：
+    - sampling: collapsed stack 文本，可直接用于 flamegraph.pl / speedscope；
+    - cprofile: pstats 文件，可用 snakeviz 或 `python -m pstats` 查看。
+    """
+    try:
+        content, summary = await profiling.profile(
+            seconds, mode, settings.PROFILER_SAMPLE_INTERVAL, include_tasks
+        )
+    except profiling.ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    extension = "pstats" if mode == profiling.PROFILE_MODE_CPROFILE else "folded"
+    filename = f"profile-{os.getpid()}-{int(time.time())}.{extension}"
+    return Response(
+        content=content,
+        media_type="application/octet-stream" if mode == profiling.PROFILE_MODE_CPROFILE else "text/plain",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Profile-Summary": ", ".join(f"{key}={value}" for key, value in summary.items()),
+        },
+    )
+
+
+@router.post("/memory/start", summary="开始 tracemalloc 内存追踪")
+async def start_memory_tracing(
+    frames: int = Query(settings.TRACEMALLOC_FRAMES, ge=1, le=100),
+    current_user: User = Depends(get_current_admin_user),
+):
+    """追踪期间所有内存分配都有额外开销，排查结束后请调用 /memory/stop"""
+    profiling.memory_tracker.start(frames)
+    return {"tracing": True, "frames": frames}
+
+
+@router.post("/memory/stop", summary="停止 tracemalloc 内存追踪")
+async def stop_memory_tracing(current_user: User = Depends(get_current_admin_user)):
+    profiling.memory_tracker.stop()
+    return {"tracing": False}
+
+
+@router.get("/memory/snapshot", summary="内存分配快照")
+async def memory_snapshot(
+    limit: int = Query(30, ge=1, le=500),
+    key_type: Literal["lineno", "filename", "traceback"] = "lineno",
+    baseline: bool = Query(False, description="将本次快照设为 /memory/diff 的对比基线"),
+    current_user: User = Depends(get_current_admin_user),
+):
+    if not profiling.memory_tracker.tracing:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="tracemalloc is not running, call /memory/start first")
+    return await run_in_thread(profiling.memory_tracker.snapshot, limit, key_type, baseline)
+
+
+@router.get("/memory/diff", summary="与基线快照对比内存增长")
+async def memory_diff(
+    limit: int = Query(30, ge=1, le=500),
+    key_type: Literal["lineno", "filename", "traceback"] = "lineno",
+    current_user: User = Depends(get_current_admin_user),
+):
+    if not profiling.memory_tracker.tracing:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="tracemalloc is not running, call /memory/start first")
+    result = await run_in_thread(profiling.memory_tracker.diff, limit, key_type)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="No baseline snapshot, call /memory/snapshot?baseline=true first"
+        )
+    return result
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from app.core.security import get_current_admin_user
+from app.models.user import User
+from app.services.export_service import ExportService, EXPORTABLE_COLLECTIONS
+from app.services.storage.mongo_service import get_mongo_service
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+
+def get_export_service() -> ExportService:
+    """依赖注入导出服务"""
+    return ExportService(get_mongo_service())
+
+
+@router.get("/{collection}", summary="流式导出数据 (NDJSON)")
+async def export_collection(
+    collection: str,
+    after_id: str | None = Query(None, description="从该 _id 之后继续导出（断点续传）"),
+    limit: int | None = Query(None, ge=1, description="最多导出的文档数"),
+    gzip: bool = Query(False, description="是否以 gzip 压缩输出"),
+    current_user: User = Depends(get_current_admin_user),
+    export_service: ExportService = Depends(get_export_service),
+):
+    """
+    按 _id 顺序以常量内存流式导出 conversations / conversations-archive / usage-records。
+    conversations-archive 将归档的对话解压为逐条消息输出，续传使用 archive_id。
+    """
+    if collection not in EXPORTABLE_COLLECTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"不支持导出的集合: {collection}"
+        )
+
+    logger.info(f"User {current_user.username} exporting {collection} after_id={after_id} gzip={gzip}")
+    stream = export_service.iter_ndjson(collection, after_id=after_id, limit=limit)
+    headers = {"Content-Disposition": f'attachment; filename="{collection}.ndjson{".gz" if gzip else ""}"'}
+    if gzip:
+        return StreamingResponse(
+            export_service.iter_gzip(stream),
+            media_type="application/gzip",
+            headers=headers,
+        )
+    return StreamingResponse(stream, media_type="application/x-ndjson", headers=headers)
@@ -0,0 +1,101 @@
+"""
+按请求统计后端（Redis / MongoDB）往返次数与耗时。
+- 请求开始时在 contextvar 中放入一个 BackendUsage；gather / create_task / 线程池（motor 会复制上下文）
+  中的子任务共享同一个对象，因此并发阶段的命令也会计入；
+- 请求结束时按路由模板写入直方图，并可对照 BACKEND_BUDGETS 检查是否超出预算；
+- 开启 BACKEND_USAGE_HEADER 时通过 X-Backend-Usage 响应头返回。流式响应的响应头在流开始前发出，
+  只包含此前的命令（如鉴权、历史读取），流结束后的写入只体现在指标和日志中。
+"""
+from contextvars import ContextVar
+
+from app.core.metrics import metrics
+
+BACKEND_REDIS = "redis"
+BACKEND_MONGO = "mongo"
+BACKENDS = (BACKEND_REDIS, BACKEND_MONGO)
+
+USAGE_HEADER = "X-Backend-Usage"
+
+REQUEST_ROUND_TRIPS = metrics.histogram(
+    "request_backend_round_trips", "Backend commands issued per request", ("backend", "route"),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+REQUEST_BACKEND_TIME = metrics.histogram(
+    "request_backend_time_seconds", "Time spent in backend commands per request", ("backend", "route"),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+BUDGET_EXCEEDED = metrics.counter(
+    "request_backend_budget_exceeded_total", "Requests that issued more backend commands than budgeted",
+    ("backend", "route")
+)
+
+_current_usage: ContextVar["BackendUsage | None"] = ContextVar("backend_usage", default=None)
+
+
+class BackendUsage:
+    """单个请求的后端命令计数；Redis 只在事件循环线程写入，MongoDB 只在持锁的监听器中写入"""
+
+    __slots__ = ("commands", "seconds")
+
+    def __init__(self):
+        self.commands = dict.fromkeys(BACKENDS, 0)
+        self.seconds = dict.fromkeys(BACKENDS, 0.0)
+
+    def add(self, backend: str, seconds: float, commands: int = 1):
+        self.commands[backend] += commands
+        self.seconds[backend] += seconds
+
+    def header_value(self) -> str:
+        """如 redis=5;2.31ms, mongo=2;4.80ms"""
+        return ", ".join(
+            f"{backend}={self.commands[backend]};{self.seconds[backend] * 1000:.2f}ms" for backend in BACKENDS
+        )
+
+
+def _exceeded(commands: dict[str, int], budget: dict[str, int]) -> dict[str, tuple[int, int]]:
+    """返回超出预算的后端 -> (实际次数, 预算次数)"""
+    return {
+        backend: (commands.get(backend, 0), limit)
+        for backend, limit in budget.items()
+        if commands.get(backend, 0) > limit
+    }
+
+
+def start_request() -> BackendUsage:
+    """在当前上下文中开始统计（由请求中间件在调用应用前执行）"""
+    usage = BackendUsage()
+    _current_usage.set(usage)
+    return usage
+
+
+def current_usage() -> BackendUsage | None:
+    return _current_usage.get()
+
+
+def record(backend: str, seconds: float, commands: int = 1):
+    """计入当前请求；不在请求上下文中（启动任务、后台归档等）时忽略"""
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add(backend, seconds, commands)
+
+
+def observe(usage: BackendUsage, route: str, budget: dict[str, int] | None = None) -> dict[str, tuple[int, int]]:
+    """请求结束时写入指标，返回超出预算的后端"""
+    for backend in BACKENDS:
+        REQUEST_ROUND_TRIPS.observe(usage.commands[backend], backend=backend, route=route)
+        REQUEST_BACKEND_TIME.observe(usage.seconds[backend], backend=backend, route=route)
+    exceeded = _exceeded(usage.commands, budget) if budget else {}
+    for backend in exceeded:
+        BUDGET_EXCEEDED.inc(backend=backend, route=route)
+    return exceeded
+
+
+def parse_header(value: str) -> dict[str, int]:
+    """解析 X-Backend-Usage 响应头为 {后端: 命令数}，供压测脚本检查往返预算（见 tools/loadtest）"""
+    commands = {}
+    for part in value.split(","):
+        backend, _, stats = part.strip().partition("=")
+        if backend:
+            commands[backend] = int(stats.partition(";")[0])
+    return commands
+
@@ -0,0 +1,165 @@
+"""
+图片端点的请求体内存预算（ASGI 中间件）。
+按 worker 和 API Key 统计在途请求体字节数，超出预算的请求在读完请求体之前就排队或拒绝，
+避免大量 base64 图片请求同时驻留内存把 worker 撑爆。
+"""
+import asyncio
+import hashlib
+
+from fastapi import HTTPException, status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+IN_FLIGHT_BYTES = metrics.gauge(
+    "request_body_in_flight_bytes", "Request body bytes admitted and not yet released on this worker"
+)
+BUDGET_BYTES = metrics.gauge(
+    "request_body_budget_bytes", "Request body byte budget of this worker"
+)
+BUDGET_REJECTIONS = metrics.counter(
+    "request_body_budget_rejections_total", "Requests rejected by the request body budget", ("reason",)
+)
+
+
+class BodyBudget:
+    """worker 级与单个 API Key 级的字节预算；release 时唤醒排队者"""
+
+    def __init__(self, worker_bytes: int, per_key_bytes: int):
+        self.worker_bytes = worker_bytes
+        self.per_key_bytes = per_key_bytes
+        self.in_use = 0
+        self._per_key: dict[str, int] = {}
+        self._condition = asyncio.Condition()
+        IN_FLIGHT_BYTES.set_function(lambda: self.in_use)
+        BUDGET_BYTES.set(worker_bytes)
+
+    def _fits(self, key: str, size: int) -> bool:
+        return (
+            self.in_use + size <= self.worker_bytes
+            and self._per_key.get(key, 0) + size <= self.per_key_bytes
+        )
+
+    async def reserve(self, key: str, size: int, timeout: float) -> bool:
+        """预留 size 字节；预算不足时最多等待 timeout 秒，仍不足返回 False"""
+        async with self._condition:
+            if not self._fits(key, size):
+                try:
+                    await asyncio.wait_for(self._condition.wait_for(lambda: self._fits(key, size)), timeout)
+                except asyncio.TimeoutError:
+                    return False
+            self.in_use += size
+            self._per_key[key] = self._per_key.get(key, 0) + size
+            return True
+
+    async def release(self, key: str, size: int):
+        if not size:
+            return
+        async with self._condition:
+            self.in_use -= size
+            remaining = self._per_key.get(key, 0) - size
+            if remaining > 0:
+                self._per_key[key] = remaining
+            else:
+                self._per_key.pop(key, None)
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "worker_bytes": self.worker_bytes,
+            "per_key_bytes": self.per_key_bytes,
+            "in_use": self.in_use,
+            "keys": len(self._per_key),
+        }
+
+
+def _client_key(headers: dict[bytes, bytes], scope: Scope) -> str:
+    """按 Authorization（API Key 或 JWT）区分调用方，只保留哈希前缀；匿名请求按客户端 IP"""
+    authorization = headers.get(b"authorization")
+    if authorization:
+        return hashlib.sha256(authorization).hexdigest()[:16]
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "anonymous"
+
+
+class BodyBudgetMiddleware:
+    """
+    只作用于指定路径的 POST 请求：
+    - 有 Content-Length: 超过单请求上限直接 413，否则先预留整块预算，预算不足排队，超时 503；
+    - 分块传输: 每收到一块就预留对应字节，超限时在读取请求体阶段抛出 413/503。
+    预留的字节在请求处理完成（响应发送完毕）后释放。
+    """
+
+    def __init__(self, app: ASGIApp, paths: list[str], budget: BodyBudget | None = None):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.budget = budget or BodyBudget(
+            settings.BODY_BUDGET_WORKER_BYTES, settings.BODY_BUDGET_PER_KEY_BYTES
+        )
+        self.max_request_bytes = min(settings.BODY_BUDGET_MAX_REQUEST_BYTES, settings.BODY_BUDGET_PER_KEY_BYTES)
+        self.queue_timeout = settings.BODY_BUDGET_QUEUE_TIMEOUT
+
+    def _reject(self, reason: str) -> HTTPException:
+        BUDGET_REJECTIONS.inc(reason=reason)
+        if reason == "too_large":
+            return HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Request body exceeds {self.max_request_bytes} bytes"
+            )
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many large requests in flight, please retry later",
+            headers={"Retry-After": str(max(1, int(self.queue_timeout)))}
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        key = _client_key(headers, scope)
+        try:
+            declared = int(headers[b"content-length"]) if b"content-length" in headers else None
+        except ValueError:
+            declared = None
+
+        reserved = 0
+        if declared is not None:
+            error = None
+            if declared > self.max_request_bytes:
+                error = self._reject("too_large")
+            elif not await self.budget.reserve(key, declared, self.queue_timeout):
+                error = self._reject("budget_exhausted")
+            if error is not None:
+                logger.warning(f"Body budget rejected {scope['path']} ({declared} bytes): {error.detail}")
+                response = JSONResponse({"detail": error.detail}, status_code=error.status_code, headers=error.headers)
+                await response(scope, receive, send)
+                return
+            reserved = declared
+
+        received = 0
+
+        async def budgeted_receive() -> Message:
+            nonlocal reserved, received
+            message = await receive()
+            if declared is None and message["type"] == "http.request":
+                size = len(message.get("body", b""))
+                received += size
+                if received > self.max_request_bytes:
+                    raise self._reject("too_large")
+                if size:
+                    if not await self.budget.reserve(key, size, self.queue_timeout):
+                        raise self._reject("budget_exhausted")
+                    reserved += size
+            return message
+
+        try:
+            await self.app(scope, budgeted_receive, send)
+        finally:
+            await self.budget.release(key, reserved)
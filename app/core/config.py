@@ -24,6 +24,12 @@ class Settings(BaseSettings):
     # --- Logging ---
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/app.log"
+    # text: 开发环境彩色输出；json: 生产环境 JSON Lines
+    LOG_FORMAT: str = "text"
+    # 异常堆栈中输出变量值（可能包含敏感数据，且开销较大），仅建议在开发环境开启
+    LOG_DIAGNOSE: bool = False
+    # 按 logger 名称前缀对 INFO 及以下日志采样，如 {"app.services.chat_service": 0.1}
+    LOG_SAMPLING: dict[str, float] = {}
 
     # --- JWT Security ---
     JWT_SECRET_KEY: str
@@ -35,6 +41,10 @@ class Settings(BaseSettings):
     ALGORITHM: str | None = None
     ACCESS_TOKEN_EXPIRE_MINUTES: int | None = None
 
+    # --- Admin ---
+    # 允许访问运维接口（数据导出、调试等）的用户名
+    ADMIN_USERNAMES: list[str] = []
+
     # --- Database ---
     MONGODB_URL: str
     MONGODB_DB_NAME: str
@@ -47,6 +57,19 @@ class Settings(BaseSettings):
     REDIS_DB: int = 0
     REDIS_MAX_CONNECTIONS: int = 20
 
+    # --- Conversation Storage ---
+    # "message": 每条消息一个文档; "bucket": 每个桶文档最多保存 CONVERSATION_BUCKET_SIZE 条消息
+    CONVERSATION_STORAGE_LAYOUT: str = "message"
+    CONVERSATION_BUCKET_SIZE: int = 50
+    CHAT_HISTORY_CACHE_SIZE: int = 20
+    CHAT_HISTORY_CACHE_TTL: int = 3600
+    CONVERSATION_ARCHIVE_IDLE_DAYS: int = 90
+    CONVERSATION_ARCHIVE_COMPRESSION_LEVEL: int = 10
+
+    # --- Data Export ---
+    EXPORT_BATCH_SIZE: int = 1000
+    EXPORT_CHUNK_BYTES: int = 256 * 1024
+
     # --- Password Policy ---
     PASSWORD_MIN_LENGTH: int = 8
     PASSWORD_REQUIRE_UPPERCASE: bool = True
@@ -72,15 +95,82 @@ class Settings(BaseSettings):
     MULTIMODAL_API_KEY: str
     MULTIMODAL_API_SECRET: str
     MULTIMODAL_TIMEOUT: int = 30
+    # 图片咨询中每张图片分析的截止时间（秒，各图片单独计时），超时的图片跳过，用已完成的结果继续
+    MULTIMODAL_IMAGE_DEADLINE: float = 20.0
+    # 请求对冲: 超过观测到的延迟分位数仍未返回时发送一个重复请求，取先返回者
+    MULTIMODAL_HEDGE_ENABLED: bool = False
+    MULTIMODAL_HEDGE_PERCENTILE: float = 95.0
+    MULTIMODAL_HEDGE_MAX_RATIO: float = 0.05
+    MULTIMODAL_HEDGE_MIN_DELAY: float = 0.2
+    # 舱壁隔离: 按图片类型和整个多模态上游限制并发，队列满时立即返回 503
+    MULTIMODAL_BULKHEAD_CONCURRENCY: int = 10
+    MULTIMODAL_BULKHEAD_TYPE_CONCURRENCY: dict[str, int] = {}  # 按 ImageType 值覆盖，如 {"skin-recognition": 5}
+    MULTIMODAL_BULKHEAD_UPSTREAM_CONCURRENCY: int = 40
+    MULTIMODAL_BULKHEAD_QUEUE_SIZE: int = 20
+    MULTIMODAL_BULKHEAD_QUEUE_TIMEOUT: float = 5.0
 
     # --- Pet Info Service ---
     PET_INFO_BASE_URL: str
     PET_INFO_CLIENT_ID: str
     PET_INFO_CLIENT_SECRET: str
+    # 为 True 时返回内置的示例数据，不调用宠物信息接口
+    PET_INFO_USE_MOCK: bool = True
 
     # --- HTTP Client ---
     HTTP_TIMEOUT: int = 30
     HTTP_MAX_RETRIES: int = 3
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_POOL_TIMEOUT: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = True
+    HTTP_PREWARM_CONNECTIONS: int = 2
+    HTTP_RETRY_BACKOFF_BASE: float = 0.1
+    HTTP_RETRY_BACKOFF_MAX: float = 2.0
+    # 重试预算: 每个请求存入 RATIO 个重试令牌，另外每秒保底 MIN_PER_SECOND 个
+    HTTP_RETRY_BUDGET_RATIO: float = 0.1
+    HTTP_RETRY_BUDGET_MIN_PER_SECOND: float = 1.0
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RESET_TIMEOUT: float = 30.0
+    MULTIMODAL_MAX_CONNECTIONS: int = 50
+    PET_INFO_MAX_CONNECTIONS: int = 20
+    LLM_MAX_CONNECTIONS: int = 100
+
+    # --- Request Body Budget (图片端点) ---
+    BODY_BUDGET_WORKER_BYTES: int = 512 * 1024 * 1024
+    BODY_BUDGET_PER_KEY_BYTES: int = 64 * 1024 * 1024
+    BODY_BUDGET_MAX_REQUEST_BYTES: int = 48 * 1024 * 1024
+    BODY_BUDGET_QUEUE_TIMEOUT: float = 2.0
+
+    # --- CPU Offload ---
+    # 大于阈值的图片校验、请求体序列化与签名放到线程池执行，避免阻塞事件循环
+    CPU_OFFLOAD_ENABLED: bool = True
+    CPU_OFFLOAD_THRESHOLD_BYTES: int = 256 * 1024
+    CPU_OFFLOAD_THREAD_WORKERS: int = 4
+    CPU_OFFLOAD_PROCESS_WORKERS: int = 0  # 0 表示不启用进程池，纯 Python 任务退回线程池
+
+    # --- Tracing ---
+    TRACING_ENABLED: bool = True
+    TRACE_BUFFER_SIZE: int = 1000  # 进程内保留最近多少个请求的追踪数据
+    TRACE_EXPORT_FILE: str | None = None  # 以 OTLP/JSON 行写入本地文件
+    TRACE_OTLP_ENDPOINT: str | None = None  # 如 http://localhost:4318/v1/traces
+
+    # --- Event Loop Monitor ---
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL: float = 0.1
+    LOOP_STALL_THRESHOLD: float = 0.2  # 单次阻塞超过该秒数时记录事件循环线程的调用栈
+    LOOP_DEBUG_SLOW_CALLBACKS: bool = False  # 开启 asyncio debug 模式记录慢回调（开销大，仅排查时使用）
+
+    # --- Backend Round-Trip Accounting ---
+    BACKEND_USAGE_HEADER: bool = False  # 在响应中返回 X-Backend-Usage（每请求 Redis/MongoDB 命令数与耗时）
+    # 按路由模板配置每请求的命令数预算，超出时记录告警和指标，如 {"/api/v1/chat/completions": {"redis": 8, "mongo": 3}}
+    BACKEND_BUDGETS: dict[str, dict[str, int]] = {}
+
+    # --- Profiling (admin debug endpoints) ---
+    PROFILER_MAX_SECONDS: float = 60.0
+    PROFILER_SAMPLE_INTERVAL: float = 0.005
+    TRACEMALLOC_FRAMES: int = 25
 
     # --- File Paths ---
     BREED_MAP_FILE: str = "data/pet_breed_0dd7f7.json"
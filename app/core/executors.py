@@ -0,0 +1,103 @@
+"""
+CPU 密集型请求处理的执行器。
+- 线程池：hashlib / zlib 等处理大缓冲区时会释放 GIL 的 C 实现（HMAC、压缩），
+  在线程中运行时事件循环可以继续调度其他 SSE 流；
+- 进程池：纯 Python 的 CPU 工作，不受 GIL 限制，但参数和结果需要 pickle，只适合输入小、计算重的任务。
+数据量低于 CPU_OFFLOAD_THRESHOLD_BYTES 时直接在事件循环上执行，避免调度开销超过计算本身。
+"""
+import asyncio
+import functools
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TypeVar
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+EXECUTOR_THREAD = "thread"
+EXECUTOR_PROCESS = "process"
+
+OFFLOADED = metrics.counter(
+    "cpu_offload_tasks_total", "CPU-heavy tasks by where they ran", ("executor",)
+)
+OFFLOAD_DURATION = metrics.histogram(
+    "cpu_offload_duration_seconds", "Wall time of offloaded CPU-heavy tasks including scheduling", ("executor",)
+)
+
+_thread_pool: ThreadPoolExecutor | None = None
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=settings.CPU_OFFLOAD_THREAD_WORKERS, thread_name_prefix="cpu-offload"
+        )
+    return _thread_pool
+
+
+def _get_process_pool() -> ProcessPoolExecutor | None:
+    global _process_pool
+    if _process_pool is None and settings.CPU_OFFLOAD_PROCESS_WORKERS > 0:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.CPU_OFFLOAD_PROCESS_WORKERS)
+    return _process_pool
+
+
+async def run_in_thread(func: Callable[..., T], *args, **kwargs) -> T:
+    """在线程池中执行（适合释放 GIL 的 C 实现）"""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_get_thread_pool(), functools.partial(func, *args, **kwargs))
+    finally:
+        OFFLOADED.inc(executor=EXECUTOR_THREAD)
+        OFFLOAD_DURATION.observe(time.perf_counter() - started, executor=EXECUTOR_THREAD)
+
+
+async def run_in_process(func: Callable[..., T], *args) -> T:
+    """
+    在进程池中执行（适合纯 Python 的 CPU 工作）。
+    func 和参数必须可 pickle；未配置进程池（CPU_OFFLOAD_PROCESS_WORKERS=0）时退回线程池。
+    """
+    pool = _get_process_pool()
+    if pool is None:
+        return await run_in_thread(func, *args)
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(pool, functools.partial(func, *args))
+    finally:
+        OFFLOADED.inc(executor=EXECUTOR_PROCESS)
+        OFFLOAD_DURATION.observe(time.perf_counter() - started, executor=EXECUTOR_PROCESS)
+
+
+async def offload(func: Callable[..., T], *args, size: int, executor: str = EXECUTOR_THREAD, **kwargs) -> T:
+    """
+    size 达到阈值时放到对应执行器，否则直接在事件循环上执行。
+    size 为待处理数据的字节数（如图片 base64 长度）。
+    """
+    if not settings.CPU_OFFLOAD_ENABLED or size < settings.CPU_OFFLOAD_THRESHOLD_BYTES:
+        OFFLOADED.inc(executor="inline")
+        return func(*args, **kwargs)
+    if executor == EXECUTOR_PROCESS:
+        return await run_in_process(functools.partial(func, **kwargs) if kwargs else func, *args)
+    return await run_in_thread(func, *args, **kwargs)
+
+
+def shutdown_executors():
+    """应用关闭时释放执行器"""
+    global _thread_pool, _process_pool
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    logger.info("CPU offload executors shut down.")
@@ -1,22 +1,96 @@
 # /app/core/logging.py
+import random
 import sys
+import traceback
 from pathlib import Path
 from loguru import logger
 from app.core.config import settings
+from app.utils import serialization
 
-def setup_logging():
-    """配置 Loguru 日志记录器"""
+LOG_FORMAT_TEXT = "text"
+LOG_FORMAT_JSON = "json"
+
+TEXT_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}"
+COLOR_TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
+    "<level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+
+# 只对 INFO 及以下级别采样，WARNING/ERROR 总是输出
+_SAMPLING_MAX_LEVEL = logger.level("INFO").no
+
+
+class SamplingFilter:
+    """
+    按 logger 名称（模块名）采样高频日志，如 {"app.services.external.multimodal_service": 0.1}。
+    前缀匹配，最长前缀优先；未配置的 logger 全量输出。
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self._cache: dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = next((value for prefix, value in self.rates if name.startswith(prefix)), 1.0)
+            self._cache[name] = rate
+        return rate
+
+    def __call__(self, record) -> bool:
+        if not self.rates or record["level"].no > _SAMPLING_MAX_LEVEL:
+            return True
+        rate = self._rate(record["name"] or "")
+        return rate >= 1.0 or random.random() < rate
+
+
+def _json_format(record) -> str:
+    """
+    JSON Lines 格式：在 sink 输出时才序列化（被过滤或采样掉的记录不付出序列化开销），
+    同一条记录写入多个 sink 时只序列化一次。
+    """
+    extra = record["extra"]
+    if "_json" not in extra:
+        payload = {
+            "ts": record["time"].isoformat(),
+            "level": record["level"].name,
+            "logger": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": record["message"],
+        }
+        context = {key: value for key, value in extra.items() if key != "name"}
+        if context:
+            payload["extra"] = context
+        if record["exception"] is not None:
+            exc_type, exc_value, exc_traceback = record["exception"]
+            payload["exception"] = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
+        extra["_json"] = serialization.dumps_str(payload)
+    return "{extra[_json]}\n"
+
+
+def setup_logging(log_format: str | None = None):
+    """
+    配置 Loguru 日志记录器
+    - text: 开发环境，彩色输出（LOG_DIAGNOSE 控制是否在异常中输出变量值）
+    - json: 生产环境，JSON Lines，按 LOG_SAMPLING 采样高频日志
+    """
     logger.remove()
 
+    log_format = log_format or settings.LOG_FORMAT
+    level = settings.LOG_LEVEL.upper()
+    sampler = SamplingFilter(settings.LOG_SAMPLING)
+    json_lines = log_format == LOG_FORMAT_JSON
+
     logger.add(
         sys.stdout,
-        level=settings.LOG_LEVEL.upper(),
-        format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
-               "<level>{level: <8}</level> | "
-               "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        colorize=True,
-        backtrace=True,
-        diagnose=True
+        level=level,
+        format=_json_format if json_lines else COLOR_TEXT_FORMAT,
+        filter=sampler,
+        colorize=not json_lines,
+        backtrace=not json_lines,
+        diagnose=settings.LOG_DIAGNOSE
     )
 
     log_file_path = Path(settings.LOG_FILE)
@@ -24,18 +98,19 @@ def setup_logging():
 
     logger.add(
         settings.LOG_FILE,
-        level=settings.LOG_LEVEL.upper(),
-        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}",
+        level=level,
+        format=_json_format if json_lines else TEXT_FORMAT,
+        filter=sampler,
         rotation="10 MB",
         retention="7 days",
         compression="zip",
         serialize=False,
         enqueue=True,
-        backtrace=True,
-        diagnose=True
+        backtrace=not json_lines,
+        diagnose=settings.LOG_DIAGNOSE
     )
 
-    logger.info("Logger configured successfully.")
+    logger.info("Logger configured successfully (format={}).", log_format)
 
 def get_logger(name: str | None = None):  # 修复类型注解
     """获取日志记录器实例"""
@@ -43,4 +118,4 @@ def get_logger(name: str | None = None):  # 修复类型注解
         return logger.bind(name=name)
     return logger
 
-__all__ = ["setup_logging", "get_logger", "logger"]
+__all__ = ["setup_logging", "get_logger", "logger", "SamplingFilter"]
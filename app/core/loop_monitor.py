@@ -0,0 +1,110 @@
+"""
+事件循环延迟监控与阻塞检测。
+- 探针协程按固定间隔 sleep，实际唤醒时间与预期之差即调度延迟，导出为直方图；
+- 看门狗线程检查探针心跳，心跳停滞超过阈值说明事件循环被某个回调阻塞，
+  此时通过 sys._current_frames() 抓取事件循环线程的当前调用栈并记录，用于定位生产环境中的阻塞代码；
+- 可选开启 asyncio debug 模式的慢回调日志（开销较大，仅用于排查）。
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+LOOP_LAG = metrics.histogram(
+    "event_loop_lag_seconds", "Event loop scheduling lag measured by a periodic probe",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_STALLS = metrics.counter(
+    "event_loop_stalls_total", "Times the watchdog found the event loop blocked longer than the threshold"
+)
+
+
+class LoopMonitor:
+    def __init__(self, interval: float, stall_threshold: float, max_stalls: int = 20):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.stalls: deque[dict] = deque(maxlen=max_stalls)
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: int | None = None
+        self._probe_task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        if settings.LOOP_DEBUG_SLOW_CALLBACKS:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.stall_threshold
+        self._probe_task = asyncio.create_task(self._probe(), name="loop-lag-probe")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info("Event loop monitor started (interval={}s, stall threshold={}s).", self.interval, self.stall_threshold)
+
+    async def stop(self):
+        self._stopped.set()
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            LOOP_LAG.observe(max(0.0, loop.time() - expected))
+            self._heartbeat = time.monotonic()
+
+    def _watch(self):
+        """心跳超过 interval + threshold 未更新时抓取事件循环线程的调用栈；同一次阻塞只记录一次"""
+        check_every = max(0.01, self.stall_threshold / 2)
+        reported_heartbeat = None
+        while not self._stopped.wait(check_every):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+            if blocked_for < self.stall_threshold or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            LOOP_STALLS.inc()
+            self.stalls.append({
+                "detected_at": datetime.now(timezone.utc).isoformat(),
+                "blocked_for_s": round(blocked_for, 3),
+                "stack": stack,
+            })
+            logger.warning("Event loop blocked for at least {:.3f}s, loop thread stack:\n{}", blocked_for, stack)
+
+    def stats(self) -> dict:
+        count = LOOP_LAG.count()
+        return {
+            "interval_s": self.interval,
+            "stall_threshold_s": self.stall_threshold,
+            "probes": count,
+            "mean_lag_ms": round(LOOP_LAG.sum() / count * 1000, 3) if count else 0.0,
+            "stalls_total": int(LOOP_STALLS.value()),
+            "recent_stalls": list(self.stalls),
+        }
+
+
+loop_monitor = LoopMonitor(settings.LOOP_MONITOR_INTERVAL, settings.LOOP_STALL_THRESHOLD)
@@ -0,0 +1,199 @@
+"""
+运行中 worker 的按需性能剖析。
+- cprofile: 在事件循环线程上启用 cProfile 持续 N 秒（所有协程都在该线程执行），导出 pstats 文件，
+  可用 snakeviz / `python -m pstats` 查看；确定性剖析开销较大，只适合短时间；
+- sampling: 后台线程按固定间隔采样事件循环线程的调用栈，输出 collapsed stack（flamegraph.pl / speedscope 可直接读取）；
+  include_tasks 时同时采样每个挂起任务的 await 链，按墙钟时间统计协程在哪里等待（I/O、锁、信号量等）。
+另提供 tracemalloc 快照与基线对比，用于排查长时间 SSE 会话中的内存增长。
+"""
+import asyncio
+import cProfile
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_MODE_SAMPLING = "sampling"
+PROFILE_MODE_CPROFILE = "cprofile"
+
+_profile_lock = asyncio.Lock()
+
+
+class ProfilerBusyError(Exception):
+    """同一 worker 上已有剖析在进行"""
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frames) -> str:
+    """frames 为从外到内的帧序列"""
+    return ";".join(_frame_label(frame.f_code) for frame in frames)
+
+
+def _thread_stack(frame) -> list:
+    stack = []
+    while frame is not None:
+        stack.append(frame)
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class _StackSampler:
+    def __init__(self, loop: asyncio.AbstractEventLoop, loop_thread_id: int, interval: float, include_tasks: bool):
+        self.loop = loop
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.include_tasks = include_tasks
+        self.counts: Counter[str] = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.samples += 1
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is not None:
+                self.counts["[loop];" + _collapse(_thread_stack(frame))] += 1
+            if self.include_tasks:
+                self._sample_tasks()
+
+    def _sample_tasks(self):
+        try:
+            tasks = asyncio.all_tasks(self.loop)
+        except RuntimeError:
+            # 集合在迭代期间被事件循环修改，跳过本次
+            return
+        for task in tasks:
+            if task.done():
+                continue
+            try:
+                frames = task.get_stack()
+            except Exception:
+                continue
+            if frames:
+                self.counts[f"[task] {task.get_name()};" + _collapse(frames)] += 1
+
+    def render(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+async def profile(seconds: float, mode: str, interval: float, include_tasks: bool) -> tuple[bytes, dict]:
+    """剖析当前 worker seconds 秒，返回 (文件内容, 摘要)"""
+    if _profile_lock.locked():
+        raise ProfilerBusyError("A profiling session is already running on this worker")
+
+    async with _profile_lock:
+        started = time.perf_counter()
+        if mode == PROFILE_MODE_CPROFILE:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # 其他剖析器（如调试器）已占用
+                raise ProfilerBusyError(str(e)) from e
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+            stats = pstats.Stats(profiler)
+            content = marshal.dumps(stats.stats)
+            summary = {"functions": len(stats.stats), "total_calls": stats.total_calls}
+        else:
+            sampler = _StackSampler(asyncio.get_running_loop(), threading.get_ident(), interval, include_tasks)
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                sampler.stop()
+            content = sampler.render().encode()
+            summary = {"samples": sampler.samples, "stacks": len(sampler.counts)}
+
+        summary.update(mode=mode, seconds=round(time.perf_counter() - started, 3))
+        logger.info("Profiling session finished: {}", summary)
+        return content, summary
+
+
+class MemoryTracker:
+    """tracemalloc 的开关、快照与基线对比；快照开销较大，调用方应在线程中执行"""
+
+    def __init__(self):
+        self._baseline: tracemalloc.Snapshot | None = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._baseline = None
+
+    def stop(self):
+        tracemalloc.stop()
+        self._baseline = None
+
+    def _take(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    @staticmethod
+    def _usage() -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {"traced_bytes": current, "peak_bytes": peak}
+
+    def snapshot(self, limit: int, key_type: str, set_baseline: bool) -> dict:
+        snapshot = self._take()
+        if set_baseline:
+            self._baseline = snapshot
+        top = snapshot.statistics(key_type)[:limit]
+        return {
+            **self._usage(),
+            "baseline_set": self._baseline is not None,
+            "top": [
+                {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in top
+            ],
+        }
+
+    def diff(self, limit: int, key_type: str) -> dict | None:
+        """与基线快照对比，按增长量排序；未设置基线时返回 None"""
+        if self._baseline is None:
+            return None
+        top = self._take().compare_to(self._baseline, key_type)[:limit]
+        return {
+            **self._usage(),
+            "top": [
+                {
+                    "location": str(stat.traceback),
+                    "size_bytes": stat.size,
+                    "size_diff_bytes": stat.size_diff,
+                    "count": stat.count,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in top
+            ],
+        }
+
+
+memory_tracker = MemoryTracker()
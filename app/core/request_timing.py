@@ -0,0 +1,134 @@
+"""
+请求计时（纯 ASGI 中间件）。
+与 @app.middleware("http") 只计到响应头返回不同，这里包装 send/receive，覆盖整个流式响应：
+首个响应体字节时间（TTFB）、完整响应时长、发送字节数以及客户端是否中途断开。
+同时为每个请求开始后端往返统计（见 app.core.backend_usage）。
+"""
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import backend_usage
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+REQUEST_TTFB = metrics.histogram(
+    "http_server_time_to_first_byte_seconds", "Time until the first response body byte was sent",
+    ("method", "route", "status")
+)
+REQUEST_DURATION = metrics.histogram(
+    "http_server_request_duration_seconds", "Time until the response body was fully sent (or the client left)",
+    ("method", "route", "status")
+)
+RESPONSE_BYTES = metrics.counter(
+    "http_server_response_bytes_total", "Response body bytes sent", ("method", "route")
+)
+CLIENT_DISCONNECTS = metrics.counter(
+    "http_server_client_disconnects_total", "Responses aborted because the client disconnected", ("method", "route")
+)
+
+_USAGE_HEADER = backend_usage.USAGE_HEADER.lower().encode("latin-1")
+
+
+class _RequestTiming:
+    """单个请求的计时状态；__slots__ 避免每个请求创建实例字典"""
+
+    __slots__ = ("receive", "send", "started", "first_byte_at", "status", "bytes_sent",
+                 "completed", "disconnected", "request_id", "usage")
+
+    def __init__(self, receive: Receive, send: Send, usage: backend_usage.BackendUsage):
+        self.receive = receive
+        self.send = send
+        self.started = time.perf_counter()
+        self.first_byte_at: float | None = None
+        self.status = 0
+        self.bytes_sent = 0
+        self.completed = False
+        self.disconnected = False
+        self.request_id: str | None = None
+        self.usage = usage
+
+    async def wrapped_receive(self) -> Message:
+        message = await self.receive()
+        if message["type"] == "http.disconnect" and not self.completed:
+            self.disconnected = True
+        return message
+
+    async def wrapped_send(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.status = message["status"]
+            for name, value in message.get("headers", ()):
+                if name == b"x-request-id":
+                    self.request_id = value.decode("latin-1")
+                    break
+            if settings.BACKEND_USAGE_HEADER:
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (_USAGE_HEADER, self.usage.header_value().encode("latin-1")),
+                ]
+        elif message_type == "http.response.body":
+            body = message.get("body", b"")
+            if body:
+                if self.first_byte_at is None:
+                    self.first_byte_at = time.perf_counter()
+                self.bytes_sent += len(body)
+            if not message.get("more_body", False):
+                self.completed = True
+        try:
+            await self.send(message)
+        except OSError:
+            # 客户端已断开，服务器写入失败
+            self.disconnected = True
+            raise
+
+
+class RequestTimingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = _RequestTiming(receive, send, backend_usage.start_request())
+        try:
+            await self.app(scope, timing.wrapped_receive, timing.wrapped_send)
+        finally:
+            self._record(scope, timing)
+
+    @staticmethod
+    def _record(scope: Scope, timing: _RequestTiming):
+        finished = time.perf_counter()
+        method = scope["method"]
+        # 使用路由模板（如 /conversations/{conversation_id}/messages）作为标签，避免基数爆炸
+        route = scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        status = str(timing.status or 500)
+        disconnected = timing.disconnected
+
+        REQUEST_DURATION.observe(finished - timing.started, method=method, route=route_path, status=status)
+        if timing.first_byte_at is not None:
+            REQUEST_TTFB.observe(timing.first_byte_at - timing.started, method=method, route=route_path, status=status)
+        RESPONSE_BYTES.inc(timing.bytes_sent, method=method, route=route_path)
+        if disconnected:
+            CLIENT_DISCONNECTS.inc(method=method, route=route_path)
+
+        usage = timing.usage
+        exceeded = backend_usage.observe(usage, route_path, settings.BACKEND_BUDGETS.get(route_path))
+        if exceeded:
+            logger.warning(
+                "rid={} {} exceeded backend round-trip budget (actual, budget): {}",
+                timing.request_id or "-", route_path, exceeded
+            )
+
+        ttfb_ms = (timing.first_byte_at - timing.started) * 1000 if timing.first_byte_at is not None else -1
+        logger.info(
+            "rid={} {} {} status_code={} ttfb={:.2f}ms completed_in={:.2f}ms bytes={} disconnected={} backend={}",
+            timing.request_id or "-", method, scope["path"], status, ttfb_ms,
+            (finished - timing.started) * 1000, timing.bytes_sent, disconnected, usage.header_value()
+        )
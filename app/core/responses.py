@@ -0,0 +1,15 @@
+"""
+默认 JSON 响应类：通过 app.utils.serialization 编码（orjson 快速路径，标准库兜底）。
+"""
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.utils import serialization
+
+
+class SerializedJSONResponse(JSONResponse):
+    """与 JSONResponse 相同的响应格式，仅替换编码实现"""
+
+    def render(self, content: Any) -> bytes:
+        return serialization.dumps(content)
@@ -69,3 +69,9 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+
+async def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+    if current_user.username not in settings.ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
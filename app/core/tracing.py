@@ -0,0 +1,311 @@
+"""
+轻量级请求内追踪。
+- span 通过 contextvars 传播：asyncio.gather / create_task 会复制上下文，并发阶段自动挂到正确的父 span；
+- 未开始追踪（没有 trace id）时 span() 只做一次 ContextVar 读取，几乎没有开销；
+- 结束的 span 写入进程内环形缓冲区（按请求ID保留最近 TRACE_BUFFER_SIZE 个请求），
+  可选地由后台线程以 OTLP/JSON 形式写入本地 JSONL 文件或发送到 OTLP HTTP 收集器。
+"""
+import functools
+import hashlib
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import aclosing, contextmanager
+from contextvars import ContextVar
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.utils import serialization
+
+logger = get_logger(__name__)
+
+_current_trace: ContextVar[str | None] = ContextVar("trace_id", default=None)
+_current_span: ContextVar["Span | None"] = ContextVar("span", default=None)
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace_id: str, parent_id: str | None, name: str, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = STATUS_OK
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class TraceStore:
+    """按 trace id（请求ID）保存最近的追踪数据，超出容量时淘汰最早的请求"""
+
+    def __init__(self, max_traces: int):
+        self.max_traces = max_traces
+        self._traces: OrderedDict[str, list[Span]] = OrderedDict()
+
+    def add(self, span: Span):
+        spans = self._traces.get(span.trace_id)
+        if spans is None:
+            spans = self._traces[span.trace_id] = []
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        spans.append(span)
+
+    def get(self, trace_id: str) -> list[Span]:
+        return list(self._traces.get(trace_id, ()))
+
+
+def _otlp_id(value: str, length: int) -> str:
+    """OTLP 要求十六进制 ID；请求ID不是十六进制时取哈希"""
+    if len(value) == length and all(c in "0123456789abcdef" for c in value):
+        return value
+    return hashlib.sha256(value.encode()).hexdigest()[:length]
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list[Span]) -> dict:
+    """转换为 OTLP/JSON 的 ExportTraceServiceRequest 结构"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": settings.PROJECT_NAME}},
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": "app.core.tracing"},
+                "spans": [
+                    {
+                        "traceId": _otlp_id(span.trace_id, 32),
+                        "spanId": span.span_id,
+                        "parentSpanId": span.parent_id or "",
+                        "name": span.name,
+                        "kind": 1,
+                        "startTimeUnixNano": str(span.start_ns),
+                        "endTimeUnixNano": str(span.end_ns),
+                        "attributes": [
+                            {"key": "request.id", "value": {"stringValue": span.trace_id}},
+                            *({"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()),
+                        ],
+                        "status": {"code": 2 if span.status == STATUS_ERROR else 1},
+                    }
+                    for span in spans
+                ],
+            }],
+        }]
+    }
+
+
+class SpanExporter:
+    """后台线程批量导出：事件循环只做一次 put_nowait"""
+
+    def __init__(self, file_path: str | None, otlp_endpoint: str | None, batch_size: int = 100,
+                 flush_interval: float = 2.0):
+        self.file_path = file_path
+        self.otlp_endpoint = otlp_endpoint
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.otlp_endpoint)
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def export(self, span: Span):
+        if self._thread is not None:
+            self._queue.put_nowait(span)
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put_nowait(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        client = None
+        if self.otlp_endpoint:
+            import httpx
+            client = httpx.Client(timeout=5.0)
+        batch: list[Span] = []
+        stopping = False
+        while not stopping:
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                self._flush(batch, client)
+                batch = []
+        if client is not None:
+            client.close()
+
+    def _flush(self, batch: list[Span], client):
+        payload = to_otlp(batch)
+        try:
+            if self.file_path:
+                with open(self.file_path, "ab") as f:
+                    f.write(serialization.dumps(payload) + b"\n")
+            if client is not None:
+                client.post(self.otlp_endpoint, content=serialization.dumps(payload),
+                            headers={"Content-Type": "application/json"})
+        except Exception as e:
+            logger.warning("Failed to export {} span(s): {}", len(batch), e)
+
+
+trace_store = TraceStore(settings.TRACE_BUFFER_SIZE)
+span_exporter = SpanExporter(settings.TRACE_EXPORT_FILE, settings.TRACE_OTLP_ENDPOINT)
+
+
+def start_trace(trace_id: str):
+    """在当前上下文（任务）中开始追踪，之后创建的 span 都归属该 trace"""
+    if settings.TRACING_ENABLED:
+        _current_trace.set(trace_id)
+        _current_span.set(None)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def is_active() -> bool:
+    """当前上下文是否在追踪中（用于避免在未追踪时构造 span 名称等开销）"""
+    return _current_trace.get() is not None
+
+
+def _finish(current: Span):
+    trace_store.add(current)
+    span_exporter.export(current)
+
+
+def record_span(name: str, start_ns: int, end_ns: int | None = None, **attributes):
+    """事后记录一个已经结束的阶段（适用于跨越多次 yield、不便用 with 包裹的流式阶段）"""
+    parent = _current_span.get()
+    trace_id = parent.trace_id if parent is not None else _current_trace.get()
+    if trace_id is None:
+        return
+    current = Span(trace_id, parent.span_id if parent is not None else None, name, attributes)
+    current.start_ns = start_ns
+    current.end_ns = end_ns or time.time_ns()
+    _finish(current)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """记录一个阶段；未在追踪中时直接执行，不创建 span"""
+    parent = _current_span.get()
+    trace_id = parent.trace_id if parent is not None else _current_trace.get()
+    if trace_id is None:
+        yield None
+        return
+
+    current = Span(trace_id, parent.span_id if parent is not None else None, name, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = STATUS_ERROR
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # 异步生成器在其他上下文中被关闭时无法重置，忽略
+            pass
+        _finish(current)
+
+
+def traced(name: str | None = None):
+    """为 async 函数创建 span 的装饰器"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def traced_stream(trace_id: str, name: str, stream: AsyncIterator, **attributes) -> AsyncIterator:
+    """
+    包装流式响应的异步生成器：在流式发送所在的任务中开始追踪，并用根 span 覆盖整个流。
+    """
+    start_trace(trace_id)
+    async with aclosing(stream):
+        with span(name, **attributes):
+            async for item in stream:
+                yield item
+
+
+def waterfall(trace_id: str) -> dict | None:
+    """按开始时间排列的 span 瀑布图数据"""
+    spans = sorted(trace_store.get(trace_id), key=lambda s: s.start_ns)
+    if not spans:
+        return None
+
+    origin = spans[0].start_ns
+    total_ns = max(s.end_ns for s in spans) - origin
+    depths: dict[str, int] = {}
+    rows = []
+    for s in spans:
+        depth = depths[s.span_id] = depths.get(s.parent_id, -1) + 1
+        offset_ms = (s.start_ns - origin) / 1e6
+        duration_ms = (s.end_ns - s.start_ns) / 1e6
+        start_col = int((s.start_ns - origin) / total_ns * 50) if total_ns else 0
+        width = max(1, int((s.end_ns - s.start_ns) / total_ns * 50)) if total_ns else 1
+        rows.append({
+            "name": s.name,
+            "depth": depth,
+            "offset_ms": round(offset_ms, 3),
+            "duration_ms": round(duration_ms, 3),
+            "status": s.status,
+            "attributes": s.attributes,
+            "bar": " " * start_col + "█" * width,
+            "span_id": s.span_id,
+            "parent_id": s.parent_id,
+        })
+    return {"request_id": trace_id, "total_ms": round(total_ns / 1e6, 3), "spans": rows}
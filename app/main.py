@@ -1,18 +1,25 @@
 # /app/main.py
-import time
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from fastapi_limiter import FastAPILimiter
 from loguru import logger
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.api import api_router
+from app.core.body_budget import BodyBudgetMiddleware
 from app.core.config import settings
+from app.core.executors import shutdown_executors
 from app.core.logging import setup_logging, get_logger
-from app.utils.http_client import AsyncHttpClient
+from app.core.request_timing import RequestTimingMiddleware
+from app.core.loop_monitor import loop_monitor
+from app.core.tracing import span_exporter
+from app.core.responses import SerializedJSONResponse
+from app.core.metrics import metrics, PROMETHEUS_CONTENT_TYPE
+from app.utils.http_client import http_clients
 from app.services.storage.redis_service import init_redis, close_redis
+from app.services.storage.mongo_service import init_mongo, close_mongo
 
 logger = get_logger(__name__)
 
@@ -31,6 +38,13 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to initialize Redis service: {e}")
         raise
 
+    # Initialize MongoDB service (ensures indexes)
+    try:
+        await init_mongo()
+    except Exception as e:
+        logger.error(f"Failed to initialize MongoDB service: {e}")
+        raise
+
     # Setup Redis for rate limiting
     try:
         redis_connection = redis.from_url(
@@ -46,18 +60,35 @@ async def lifespan(app: FastAPI):
         # 现在我们只记录错误
         raise
 
-    # Setup shared HTTP client
-    app.state.http_client = AsyncHttpClient()
-    logger.info("Async HTTP client created.")
+    # Setup per-upstream HTTP connection pools
+    await http_clients.start()
+    app.state.http_clients = http_clients
+    logger.info("Async HTTP client pools created.")
+
+    # Start span exporter (only when TRACE_EXPORT_FILE / TRACE_OTLP_ENDPOINT is configured)
+    span_exporter.start()
+
+    # Start event loop lag monitor and watchdog
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
 
     yield
 
     # --- Shutdown ---
     logger.info("Shutting down application...")
 
-    # Close HTTP client
-    await app.state.http_client.close()
-    logger.info("Async HTTP client closed.")
+    # Close HTTP client pools
+    await http_clients.close()
+    logger.info("Async HTTP client pools closed.")
+
+    # Stop event loop monitor
+    await loop_monitor.stop()
+
+    # Flush exported spans
+    span_exporter.stop()
+
+    # Release CPU offload executors
+    shutdown_executors()
 
     # Close Redis service
     try:
@@ -66,6 +97,12 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error closing Redis service: {e}")
 
+    # Close MongoDB service
+    try:
+        await close_mongo()
+    except Exception as e:
+        logger.error(f"Error closing MongoDB service: {e}")
+
     logger.info("Application shutdown complete.")
 
 
@@ -74,6 +111,7 @@ app = FastAPI(
     version=settings.VERSION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     lifespan=lifespan,
+    default_response_class=SerializedJSONResponse,
 )
 
 # 添加CORS中间件
@@ -86,22 +124,14 @@ app.add_middleware(
 )
 
 # --- Middleware ---
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """
-    Middleware to log incoming requests and their processing time.
-    """
-    request_id = f"{request.client.host}:{request.client.port}-{time.time_ns()}"
-    logger.info(f"rid={request_id} start request path={request.url.path} method={request.method}")
-    start_time = time.time()
-
-    response = await call_next(request)
-
-    process_time = (time.time() - start_time) * 1000
-    formatted_process_time = f'{process_time:.2f}'
-    logger.info(f"rid={request_id} completed_in={formatted_process_time}ms status_code={response.status_code}")
+# 图片端点的请求体内存预算，在读取请求体之前做准入控制
+app.add_middleware(
+    BodyBudgetMiddleware,
+    paths=[f"{settings.API_V1_STR}/chat/image", f"{settings.API_V1_STR}/analyze-image"],
+)
 
-    return response
+# 请求计时放在最外层（最后添加），覆盖完整的流式响应
+app.add_middleware(RequestTimingMiddleware)
 
 # --- Exception Handlers ---
 @app.exception_handler(RequestValidationError)
@@ -110,7 +140,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     Handler for Pydantic's validation errors.
     """
     logger.error(f"Validation error for request {request.url.path}: {exc.errors()}")
-    return JSONResponse(
+    return SerializedJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={
             "success": False,
@@ -125,7 +155,7 @@ async def global_exception_handler(request: Request, exc: Exception):
     Global handler for any unhandled exceptions.
     """
     logger.exception(f"Unhandled exception for request {request.url.path}: {exc}")
-    return JSONResponse(
+    return SerializedJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "success": False,
@@ -134,14 +164,6 @@ async def global_exception_handler(request: Request, exc: Exception):
         },
     )
 
-# --- Dependency Overrides for HTTP Client ---
-# This makes the shared httpx client available to dependencies
-async def get_http_client(request: Request) -> AsyncHttpClient:
-    return request.app.state.http_client
-
-from app.utils import http_client as http_client_module
-http_client_module.AsyncHttpClient = get_http_client
-
 # --- API Router ---
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -156,6 +178,13 @@ async def read_root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """
+    Prometheus metrics for this worker.
+    """
+    return Response(content=metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -57,6 +57,31 @@ class StreamChunk(BaseModel):
     timestamp: str
 
 
+class ImageAnalysisStatus(str, Enum):
+    COMPLETED = "completed"
+    FAILED = "failed"
+    TIMEOUT = "timeout"
+
+
+class ImageAnalysisEvent(BaseModel):
+    """图片咨询中单张图片分析完成时推送的SSE事件 (event: image_analysis)"""
+    conversation_id: str
+    image_index: int
+    status: ImageAnalysisStatus
+    text: str | None = None
+    error: str | None = None
+    timestamp: str
+
+
+class ConversationMessagesPage(BaseModel):
+    """键集分页的对话消息"""
+    conversation_id: str
+    messages: list[dict]
+    has_more: bool = Field(..., description="当前翻页方向上是否还有更多消息")
+    oldest_id: str | None = Field(None, description="本页最早消息ID，作为 before 游标向前翻页")
+    newest_id: str | None = Field(None, description="本页最新消息ID，作为 after 游标增量同步")
+
+
 class ConversationHistory(BaseModel):
     conversation_id: str
     messages: list[ChatMessage]
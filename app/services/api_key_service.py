@@ -3,7 +3,7 @@ from datetime import datetime, timedelta, timezone
 from app.models.api_key import APIKey, APIKeyCreate, APIKeyStatus
 from app.models.account import Account, UsageRecord, BillingRate
 from app.services.storage.mongo_service import MongoService
-from app.services.storage.redis_service import RedisService
+from app.services.storage.redis_service import get_redis_service
 from app.core.api_key_auth import APIKeyAuth
 
 logger = get_logger(__name__)
@@ -11,7 +11,7 @@ logger = get_logger(__name__)
 class APIKeyService:
     def __init__(self):
         self.mongo = MongoService()
-        self.redis = RedisService()
+        self.redis = get_redis_service()
         self.api_keys_collection = "api_keys"
         self.accounts_collection = "accounts"
         self.usage_records_collection = "usage_records"
@@ -49,16 +49,16 @@ class APIKeyService:
         api_key.id = key_id
 
         # 缓存到Redis
-        await self.redis.set_json(f"api_key:{key_hash}", api_key.model_dump(), ex=3600)
+        await self.redis.set_model(f"api_key:{key_hash}", api_key, ex=3600)
 
         return api_key, api_key_str
 
     async def get_by_hash(self, key_hash: str) -> APIKey | None:
         """根据哈希值获取API Key"""
         # 先从缓存获取
-        cached = await self.redis.get_json(f"api_key:{key_hash}")
+        cached = await self.redis.get_model(f"api_key:{key_hash}", APIKey)
         if cached:
-            return APIKey(**cached)
+            return cached
 
         # 从数据库获取
         key_doc = await self.mongo.find_one(self.api_keys_collection, {"key_hash": key_hash})
@@ -68,7 +68,7 @@ class APIKeyService:
         api_key = APIKey(**key_doc)
 
         # 更新缓存
-        await self.redis.set_json(f"api_key:{key_hash}", api_key.model_dump(), ex=3600)
+        await self.redis.set_model(f"api_key:{key_hash}", api_key, ex=3600)
 
         return api_key
 
@@ -1,28 +1,98 @@
 # /app/services/chat_service.py
-import json
 import asyncio
+import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from fastapi import Depends
 
-from app.models.chat import TextChatRequest, ImageChatRequest, StreamChunk, ChatRequest, ChatResponse, ChatMessage
+from app.models.chat import (
+    TextChatRequest, ImageChatRequest, StreamChunk, ChatRequest, ChatResponse, ChatMessage, ConversationMessagesPage,
+    ImageAnalysisEvent, ImageAnalysisStatus
+)
 from app.models.user import User
 from app.services.external.llm_service import LLMService
 from app.services.external.multimodal_service import MultiModalService
 from app.services.external.pet_info_service import PetInfoService
-from app.services.storage.mongo_service import MongoService
-from app.services.storage.redis_service import RedisService
+from app.services.storage.mongo_service import MongoService, get_mongo_service
+from app.services.storage.redis_service import RedisService, get_redis_service
+from app.core.config import settings
 from app.core.logging import get_logger
+from app.core.metrics import metrics
+from app.core import tracing
+from app.utils import serialization
 
 logger = get_logger(__name__)
 
+# 聊天流水线各阶段指标；标签取值有限: endpoint(text/image/completions)、stage、image_type、tier
+ENDPOINT_TEXT = "text"
+ENDPOINT_IMAGE = "image"
+ENDPOINT_COMPLETIONS = "completions"
+# tier 由端点按调用方传入：JWT 登录用户没有 API Key，归为 user 层级；未认证的请求为 anonymous；
+# API Key 请求使用 APIKeyType 的值
+TIER_USER = "user"
+TIER_ANONYMOUS = "anonymous"
+
+STAGE_DURATION = metrics.histogram(
+    "chat_stage_duration_seconds", "Duration of each chat pipeline stage", ("endpoint", "stage", "tier")
+)
+IMAGE_ANALYSIS_DURATION = metrics.histogram(
+    "chat_image_analysis_duration_seconds", "Per-image multimodal analysis duration", ("image_type", "status", "tier")
+)
+LLM_TIME_TO_FIRST_TOKEN = metrics.histogram(
+    "chat_llm_time_to_first_token_seconds", "Time from LLM call to the first streamed token", ("endpoint", "tier")
+)
+LLM_TOKENS_PER_SECOND = metrics.histogram(
+    "chat_llm_tokens_per_second", "Streamed tokens per second after the first token", ("endpoint", "tier"),
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+)
+
+# 正在进行中的历史缓存回填任务（按对话ID去重，保证同一对话同时只有一次MongoDB读取）
+_history_refills: dict[str, asyncio.Task] = {}
+
+@contextmanager
+def _stage(endpoint: str, stage: str, tier: str):
+    """一个流水线阶段：同时记录耗时直方图和追踪 span"""
+    with tracing.span(stage), STAGE_DURATION.time(endpoint=endpoint, stage=stage, tier=tier):
+        yield
+
+
+class _TokenTimer:
+    """记录 LLM 流式输出的首 token 延迟和首 token 之后的生成速度（每个非空增量计为一个 token）"""
+
+    def __init__(self, endpoint: str, tier: str):
+        self.endpoint = endpoint
+        self.tier = tier
+        self.started = time.perf_counter()
+        self.started_ns = time.time_ns()
+        self.first_token_at: float | None = None
+        self.tokens = 0
+
+    def token(self, content: str):
+        if not content:
+            return
+        self.tokens += 1
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            LLM_TIME_TO_FIRST_TOKEN.observe(self.first_token_at - self.started, endpoint=self.endpoint, tier=self.tier)
+
+    def finish(self):
+        ttft_ms = round((self.first_token_at - self.started) * 1000, 3) if self.first_token_at else None
+        tracing.record_span("llm_stream", self.started_ns, ttft_ms=ttft_ms, tokens=self.tokens)
+        if self.first_token_at is None or self.tokens < 2:
+            return
+        elapsed = time.perf_counter() - self.first_token_at
+        if elapsed > 0:
+            LLM_TOKENS_PER_SECOND.observe((self.tokens - 1) / elapsed, endpoint=self.endpoint, tier=self.tier)
+
+
 class ChatService:
     def __init__(
         self,
         llm_service: LLMService = Depends(),
         multimodal_service: MultiModalService = Depends(),
         pet_info_service: PetInfoService = Depends(),
-        mongo_service: MongoService = Depends(),
-        redis_service: RedisService = Depends(),
+        mongo_service: MongoService = Depends(get_mongo_service),
+        redis_service: RedisService = Depends(get_redis_service),
     ):
         self.llm_service = llm_service
         self.multimodal_service = multimodal_service
@@ -30,37 +100,41 @@ class ChatService:
         self.mongo_service = mongo_service
         self.redis_service = redis_service
 
-    async def process_text_chat(self, request: TextChatRequest, user: User, request_id: str):
+    async def process_text_chat(self, request: TextChatRequest, user: User, request_id: str, tier: str):
         """
-        处理文本咨询的核心逻辑
+        处理文本咨询的核心逻辑；tier 为调用方层级，用于指标标签
         1. 获取宠物信息和对话历史
         2. (模拟)RAG检索
         3. 构建Prompt
         4. 调用LLM
         5. 流式返回并保存历史
         """
-        logger.info(f"Request ID: {request_id} - Starting text chat process for conversation: {request.conversation_id}")
+        logger.info("Request ID: {} - Starting text chat process for conversation: {}", request_id, request.conversation_id)
         full_response_content = ""
         try:
             # 1. 获取宠物信息和对话历史
-            pet_info_task = self.pet_info_service.get_pet_info(request.pet_id)
-            history_task = self.mongo_service.get_conversation_history(request.conversation_id)
+            pet_info_task = self._timed(self.pet_info_service.get_pet_info(request.pet_id), ENDPOINT_TEXT, "pet_info", tier)
+            history_task = self._timed(self._load_history(request.conversation_id), ENDPOINT_TEXT, "history", tier)
             pet_info, history = await asyncio.gather(pet_info_task, history_task)
 
             # 2. (模拟)RAG检索
-            rag_knowledge = self._rag_retrieval(request.question)
+            with _stage(ENDPOINT_TEXT, "rag", tier):
+                rag_knowledge = self._rag_retrieval(request.question)
 
             # 3. 构建Prompt
-            prompt = self._build_prompt(request.question, pet_info, history, rag_knowledge)
+            with _stage(ENDPOINT_TEXT, "prompt", tier):
+                prompt = self._build_prompt(request.question, pet_info, history, rag_knowledge)
 
             # 4. 调用LLM
-            logger.info(f"Request ID: {request_id} - Calling LLM for conversation: {request.conversation_id}")
+            logger.debug("Request ID: {} - Calling LLM for conversation: {}", request_id, request.conversation_id)
             llm_stream = self.llm_service.stream_chat(prompt)
+            token_timer = _TokenTimer(ENDPOINT_TEXT, tier)
 
             # 5. 流式返回
             async for chunk in llm_stream:
                 content_piece = chunk.choices[0].delta.content or ""
                 full_response_content += content_piece
+                token_timer.token(content_piece)
 
                 stream_chunk = StreamChunk(
                     conversation_id=request.conversation_id,
@@ -78,8 +152,9 @@ class ChatService:
                 is_final=True,
                 timestamp=datetime.now(timezone.utc).isoformat()
             )
+            token_timer.finish()
             yield f"data: {final_chunk.model_dump_json()}\n\n"
-            logger.info(f"Request ID: {request_id} - Finished streaming response for conversation: {request.conversation_id}")
+            logger.info("Request ID: {} - Finished streaming response for conversation: {}", request_id, request.conversation_id)
 
         except Exception as e:
             logger.error(f"Request ID: {request_id} - Exception during text chat: {e}")
@@ -89,63 +164,73 @@ class ChatService:
                 "error": "ChatProcessingError",
                 "detail": str(e)
             }
-            yield f"data: {json.dumps(error_message)}\n\n"
+            yield f"data: {serialization.dumps_str(error_message)}\n\n"
         finally:
             # 6. 保存对话历史
             if full_response_content:
-                await self.mongo_service.save_message(request.conversation_id, "user", request.question)
-                await self.mongo_service.save_message(request.conversation_id, "assistant", full_response_content)
-                logger.info(f"Request ID: {request_id} - Saved conversation history for: {request.conversation_id}")
+                with _stage(ENDPOINT_TEXT, "persistence", tier):
+                    await self._save_turn(
+                        request.conversation_id, request.question, full_response_content, has_history=bool(history)
+                    )
+                logger.debug("Request ID: {} - Saved conversation history for: {}", request_id, request.conversation_id)
 
 
-    async def process_image_chat(self, request: ImageChatRequest, user: User, request_id: str):
+    async def process_image_chat(self, request: ImageChatRequest, user: User, request_id: str, tier: str):
         """
-        处理图片咨询的核心逻辑
-        1. 解读图片
-        2. 获取宠物信息和对话历史
+        处理图片咨询的核心逻辑；tier 为调用方层级，用于指标标签
+        1. 获取宠物信息和对话历史
+        2. 解读图片（逐张推送分析事件）
         3. (模拟)RAG检索
         4. 整合信息构建Prompt
         5. 调用LLM
-        6. 流式返回并保存历史
+        6. 流式返回
+        7. 保存对话历史
         """
-        logger.info(f"Request ID: {request_id} - Starting image chat process for conversation: {request.conversation_id}")
+        logger.info("Request ID: {} - Starting image chat process for conversation: {}", request_id, request.conversation_id)
         full_response_content = ""
         try:
             # 1. 获取宠物信息和对话历史
-            pet_info_task = self.pet_info_service.get_pet_info(request.pet_id)
-            history_task = self.mongo_service.get_conversation_history(request.conversation_id)
+            pet_info_task = self._timed(self.pet_info_service.get_pet_info(request.pet_id), ENDPOINT_IMAGE, "pet_info", tier)
+            history_task = self._timed(self._load_history(request.conversation_id), ENDPOINT_IMAGE, "history", tier)
             pet_info, history = await asyncio.gather(pet_info_task, history_task)
 
-            # 2. 解读图片
-            logger.info(f"Request ID: {request_id} - Analyzing {len(request.images)} image(s) with type '{request.image_type.value}'")
-            image_analysis_tasks = [
-                self.multimodal_service.analyze_image(
-                    image_base64=img,
-                    image_type=request.image_type,
-                    pet_info=pet_info
-                ) for img in request.images
-            ]
-            analysis_results = await asyncio.gather(*image_analysis_tasks)
-            image_descriptions = "\n".join([res['data'][0]['text'] for res in analysis_results if res and res.get('data')])
-
+            # 2. 解读图片：每张图片分析完成即推送事件，失败或超时的图片不影响其余图片
+            logger.info("Request ID: {} - Analyzing {} image(s) with type '{}'", request_id, len(request.images), request.image_type.value)
+            image_texts: list[str | None] = [None] * len(request.images)
+            images_started = time.perf_counter()
+            async for event in self._analyze_images(request, pet_info, request_id, tier):
+                if event.status == ImageAnalysisStatus.COMPLETED:
+                    image_texts[event.image_index] = event.text
+                yield f"event: image_analysis\ndata: {event.model_dump_json()}\n\n"
+
+            STAGE_DURATION.observe(time.perf_counter() - images_started, endpoint=ENDPOINT_IMAGE, stage="images", tier=tier)
+            image_descriptions = "\n".join(text for text in image_texts if text)
             if not image_descriptions:
                 raise Exception("Failed to analyze images or got empty results.")
-            logger.info(f"Request ID: {request_id} - Image analysis complete.")
+
+            analyzed = sum(1 for text in image_texts if text)
+            if analyzed < len(image_texts):
+                image_descriptions += f"\n（共{len(image_texts)}张图片，其中{len(image_texts) - analyzed}张未能完成分析）"
+            logger.info("Request ID: {} - Image analysis complete ({}/{} succeeded).", request_id, analyzed, len(image_texts))
 
             # 3. (模拟)RAG检索
-            rag_knowledge = self._rag_retrieval(request.question + "\n" + image_descriptions)
+            with _stage(ENDPOINT_IMAGE, "rag", tier):
+                rag_knowledge = self._rag_retrieval(request.question + "\n" + image_descriptions)
 
             # 4. 整合信息构建Prompt
-            prompt = self._build_prompt(request.question, pet_info, history, rag_knowledge, image_descriptions)
+            with _stage(ENDPOINT_IMAGE, "prompt", tier):
+                prompt = self._build_prompt(request.question, pet_info, history, rag_knowledge, image_descriptions)
 
             # 5. 调用LLM
-            logger.info(f"Request ID: {request_id} - Calling LLM for conversation: {request.conversation_id}")
+            logger.debug("Request ID: {} - Calling LLM for conversation: {}", request_id, request.conversation_id)
             llm_stream = self.llm_service.stream_chat(prompt)
+            token_timer = _TokenTimer(ENDPOINT_IMAGE, tier)
 
             # 6. 流式返回
             async for chunk in llm_stream:
                 content_piece = chunk.choices[0].delta.content or ""
                 full_response_content += content_piece
+                token_timer.token(content_piece)
 
                 stream_chunk = StreamChunk(
                     conversation_id=request.conversation_id,
@@ -163,8 +248,9 @@ class ChatService:
                 is_final=True,
                 timestamp=datetime.now(timezone.utc).isoformat()
             )
+            token_timer.finish()
             yield f"data: {final_chunk.model_dump_json()}\n\n"
-            logger.info(f"Request ID: {request_id} - Finished streaming response for conversation: {request.conversation_id}")
+            logger.info("Request ID: {} - Finished streaming response for conversation: {}", request_id, request.conversation_id)
 
         except Exception as e:
             logger.error(f"Request ID: {request_id} - Exception during image chat: {e}")
@@ -173,42 +259,102 @@ class ChatService:
                 "error": "ImageChatProcessingError",
                 "detail": str(e)
             }
-            yield f"data: {json.dumps(error_message)}\n\n"
+            yield f"data: {serialization.dumps_str(error_message)}\n\n"
         finally:
             # 7. 保存对话历史
             if full_response_content:
                 # Combine original question and image type for history
                 user_message = f"[Image Analysis: {request.image_type.value}] {request.question}"
-                await self.mongo_service.save_message(request.conversation_id, "user", user_message)
-                await self.mongo_service.save_message(request.conversation_id, "assistant", full_response_content)
-                logger.info(f"Request ID: {request_id} - Saved conversation history for: {request.conversation_id}")
+                with _stage(ENDPOINT_IMAGE, "persistence", tier):
+                    await self._save_turn(
+                        request.conversation_id, user_message, full_response_content, has_history=bool(history)
+                    )
+                logger.debug("Request ID: {} - Saved conversation history for: {}", request_id, request.conversation_id)
 
-    async def process_chat_request(self, request: ChatRequest) -> ChatResponse:
-        """处理聊天请求"""
+    async def _analyze_images(self, request: ImageChatRequest, pet_info, request_id: str, tier: str):
+        """
+        并发分析所有图片，按完成顺序产出 ImageAnalysisEvent。
+        每张图片有各自的 MULTIMODAL_IMAGE_DEADLINE，超时的图片报告为超时，不影响其余图片。
+        """
+        async def analyze(index: int, image: str):
+            started = time.perf_counter()
+            status = ImageAnalysisStatus.FAILED
+            text = error = None
+            try:
+                async with asyncio.timeout(settings.MULTIMODAL_IMAGE_DEADLINE):
+                    result = await self.multimodal_service.analyze_image(
+                        image_base64=image,
+                        image_type=request.image_type,
+                        pet_info=pet_info
+                    )
+                if not result or not result.get('data'):
+                    error = "Empty analysis result"
+                else:
+                    status = ImageAnalysisStatus.COMPLETED
+                    text = result['data'][0]['text']
+            except TimeoutError:
+                status = ImageAnalysisStatus.TIMEOUT
+                error = "Image analysis deadline exceeded"
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                error = str(detail)
+            finally:
+                IMAGE_ANALYSIS_DURATION.observe(
+                    time.perf_counter() - started,
+                    image_type=request.image_type.value, status=status.value, tier=tier
+                )
+            return index, status, text, error
+
+        tasks = [asyncio.ensure_future(analyze(index, image)) for index, image in enumerate(request.images)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, status, text, error = await next_done
+                if error:
+                    logger.warning(f"Request ID: {request_id} - Image {index} analysis {status.value}: {error}")
+                yield ImageAnalysisEvent(
+                    conversation_id=request.conversation_id,
+                    image_index=index,
+                    status=status,
+                    text=text,
+                    error=error,
+                    timestamp=datetime.now(timezone.utc).isoformat()
+                )
+        finally:
+            # 客户端断开等情况下生成器提前关闭，取消尚未完成的分析
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def process_chat_request(self, request: ChatRequest, tier: str) -> ChatResponse:
+        """处理聊天请求；tier 为调用方层级（API Key 类型，或 TIER_USER / TIER_ANONYMOUS），用于指标标签"""
         try:
             # 生成对话ID（如果没有提供）
             conversation_id = request.conversation_id or self._generate_conversation_id()
 
-            # 异步获取对话历史
-            history_task = self.mongo_service.get_conversation_history(conversation_id)
+            # 获取对话历史（优先读取Redis缓存）
+            with _stage(ENDPOINT_COMPLETIONS, "history", tier):
+                history = await self._load_history(conversation_id)
 
             # 保存用户消息
-            await self.mongo_service.save_message(conversation_id, "user", request.question)
-
-            # 获取历史对话
-            history = await history_task
+            with _stage(ENDPOINT_COMPLETIONS, "persistence", tier):
+                saved = await self.mongo_service.save_messages(
+                    conversation_id, [("user", request.question)], has_history=bool(history)
+                )
 
             # 构建对话上下文
             context = self._build_context(history, request.question)
 
             # 调用LLM服务
-            llm_response = await self.llm_service.generate_response(context)
+            with _stage(ENDPOINT_COMPLETIONS, "llm", tier):
+                llm_response = await self.llm_service.generate_response(context)
 
-            # 保存助手回复
-            await self.mongo_service.save_message(conversation_id, "assistant", llm_response)
-
-            # 缓存最新对话
-            await self._cache_conversation(conversation_id)
+            # 保存助手回复并写穿缓存最新一轮对话
+            with _stage(ENDPOINT_COMPLETIONS, "persistence", tier):
+                saved += await self.mongo_service.save_messages(
+                    conversation_id, [("assistant", llm_response)], has_history=bool(history or saved)
+                )
+                if saved:
+                    await self._append_to_cache(conversation_id, saved)
 
             return ChatResponse(
                 success=True,
@@ -223,6 +369,12 @@ class ChatService:
                 conversation_id=request.conversation_id
             )
 
+    @staticmethod
+    async def _timed(awaitable, endpoint: str, stage: str, tier: str):
+        """等待并记录一个阶段的耗时（用于 gather 中并发执行的阶段）"""
+        with _stage(endpoint, stage, tier):
+            return await awaitable
+
     def _build_context(self, history: list[dict], current_question: str) -> str:
         """构建对话上下文"""
         context_parts = []
@@ -243,50 +395,89 @@ class ChatService:
         import uuid
         return str(uuid.uuid4())
 
-    async def _cache_conversation(self, conversation_id: str):
-        """缓存对话历史"""
-        try:
-            # 获取最新对话历史
-            history = await self.mongo_service.get_conversation_history(conversation_id, limit=20)
-
-            # 转换为缓存格式
-            cache_messages = []
-            for msg in history:
-                cache_messages.append({
-                    "role": msg.get("role"),
-                    "content": msg.get("content"),
-                    "timestamp": msg.get("timestamp", datetime.now(timezone.utc)).isoformat()
-                })
-
-            # 缓存到Redis
+    @staticmethod
+    def _to_cache_message(msg: dict) -> dict:
+        """转换为缓存格式（id 用于追加时去重）"""
+        timestamp = msg.get("timestamp") or datetime.now(timezone.utc)
+        message_id = msg.get("id") or msg.get("_id")
+        return {
+            "id": str(message_id) if message_id else None,
+            "role": msg.get("role"),
+            "content": msg.get("content"),
+            "timestamp": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+        }
+
+    async def _load_history(self, conversation_id: str, limit: int = 10) -> list[dict]:
+        """
+        读取最近的对话历史：先读Redis，未命中时单飞回填。
+        同一对话的并发未命中只会触发一次MongoDB查询。
+        """
+        cached_history = await self.redis_service.get_cached_conversation_history(conversation_id, limit)
+        if cached_history:
+            return cached_history
+
+        task = _history_refills.get(conversation_id)
+        if task is None:
+            task = asyncio.ensure_future(self._refill_history_cache(conversation_id))
+            _history_refills[conversation_id] = task
+            task.add_done_callback(lambda _: _history_refills.pop(conversation_id, None))
+
+        # shield: 某个等待者被取消（如客户端断开）时不影响共享的回填任务
+        history = await asyncio.shield(task)
+        return history[-limit:]
+
+    async def _refill_history_cache(self, conversation_id: str) -> list[dict]:
+        """
+        从MongoDB读取最近的对话历史并整体写入缓存。
+        读取前记录缓存版本号，期间有追加时放弃写入，避免旧快照覆盖刚追加的消息。
+        """
+        version = await self.redis_service.get_conversation_cache_version(conversation_id)
+        history = await self.mongo_service.get_conversation_history(
+            conversation_id, limit=settings.CHAT_HISTORY_CACHE_SIZE
+        )
+        cache_messages = [self._to_cache_message(msg) for msg in history]
+        if cache_messages:
             await self.redis_service.cache_conversation_history(
                 conversation_id,
                 cache_messages,
-                max_messages=20,
-                expire_seconds=3600
+                max_messages=settings.CHAT_HISTORY_CACHE_SIZE,
+                expire_seconds=settings.CHAT_HISTORY_CACHE_TTL,
+                version=version
+            )
+        return cache_messages
+
+    async def _append_to_cache(self, conversation_id: str, messages: list[dict]):
+        """写穿追加消息到对话历史缓存"""
+        try:
+            await self.redis_service.append_conversation_messages(
+                conversation_id,
+                [self._to_cache_message(msg) for msg in messages],
+                max_messages=settings.CHAT_HISTORY_CACHE_SIZE,
+                expire_seconds=settings.CHAT_HISTORY_CACHE_TTL
             )
         except Exception as e:
             # 缓存失败不影响主流程
-            pass
+            logger.warning(f"Failed to append history cache for {conversation_id}: {e}")
+
+    async def _save_turn(self, conversation_id: str, question: str, answer: str, has_history: bool):
+        """
+        持久化一轮问答，并用实际写入的文档写穿缓存。
+        has_history: 本轮开始时是否读到了历史，读到时存储层无需再检查归档
+        """
+        saved = await self.mongo_service.save_turn(conversation_id, question, answer, has_history=has_history)
+        if saved:
+            await self._append_to_cache(conversation_id, saved)
 
     async def get_conversation_history(self, conversation_id: str, limit: int = 10) -> list[ChatMessage]:
         """获取对话历史"""
         try:
             # 先尝试从缓存获取
-            cached_history = await self.redis_service.get_cached_conversation_history(
-                conversation_id, limit
+            cached_history = await self.redis_service.get_cached_conversation_models(
+                conversation_id, ChatMessage, limit
             )
 
             if cached_history:
-                return [
-                    ChatMessage(
-                        role=msg["role"],
-                        content=msg["content"],
-                        timestamp=datetime.fromisoformat(msg["timestamp"]),
-                        metadata=msg.get("metadata")
-                    )
-                    for msg in cached_history
-                ]
+                return cached_history
 
             # 从数据库获取
             history = await self.mongo_service.get_conversation_history(conversation_id, limit)
@@ -304,9 +495,29 @@ class ChatService:
         except Exception as e:
             return []
 
+    async def get_conversation_messages(
+        self,
+        conversation_id: str,
+        limit: int = 20,
+        before: str | None = None,
+        after: str | None = None,
+        fields: list[str] | None = None,
+    ) -> ConversationMessagesPage:
+        """键集分页获取对话消息（直接读取MongoDB，不经过历史缓存）"""
+        messages, has_more = await self.mongo_service.get_conversation_messages(
+            conversation_id, limit=limit, before=before, after=after, fields=fields
+        )
+        return ConversationMessagesPage(
+            conversation_id=conversation_id,
+            messages=messages,
+            has_more=has_more,
+            oldest_id=messages[0]["id"] if messages else None,
+            newest_id=messages[-1]["id"] if messages else None,
+        )
+
     def _rag_retrieval(self, query: str) -> str:
         """模拟RAG知识检索"""
-        logger.info(f"Performing RAG retrieval for query: '{query[:50]}...'")
+        logger.opt(lazy=True).debug("Performing RAG retrieval for query: '{}...'", lambda: query[:50])
         # In a real application, this would query a vector database.
         return "RAG Knowledge: 狗狗在呕吐黄色泡沫时，通常建议禁食12小时，并观察精神状态。如果持续呕吐或精神萎靡，应立即就医。"
 
@@ -317,7 +528,7 @@ class ChatService:
         prompt = f"""你是一个专业的宠物医生。请根据以下信息，用中文回答用户的问题。
 
 [宠物信息]
-{json.dumps(pet_info.model_dump(), indent=2, ensure_ascii=False)}
+{serialization.dumps_str(pet_info.model_dump(), indent=True)}
 
 [对话历史]
 {history_str}
@@ -336,5 +547,5 @@ class ChatService:
 
 请根据以上所有信息，提供专业、详细的回答。
 """
-        logger.info(f"Built prompt: {prompt[:300]}...")
+        logger.opt(lazy=True).debug("Built prompt: {}...", lambda: prompt[:300])
         return prompt
@@ -0,0 +1,110 @@
+import zlib
+from collections.abc import AsyncIterator
+from datetime import date, datetime
+from bson import Binary, ObjectId
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.utils import serialization
+from app.services.storage.mongo_service import MongoService, STORAGE_LAYOUT_BUCKET
+
+logger = get_logger(__name__)
+
+# 对外的导出名称 -> MongoDB 集合
+# 冷数据归档的对话不在 conversations 中，需要另外导出 conversations-archive
+EXPORTABLE_COLLECTIONS = {
+    "conversations": "conversations",
+    "conversations-archive": "conversations_archive",
+    "usage-records": "usage_records",
+}
+
+
+def _json_default(value):
+    """序列化 MongoDB 特有类型"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Binary):
+        return None
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_ndjson_line(doc: dict) -> bytes:
+    """将单个文档编码为一行 NDJSON"""
+    return serialization.dumps(doc, default=_json_default) + b"\n"
+
+
+class ExportService:
+    def __init__(self, mongo_service: MongoService | None = None):
+        self.mongo = mongo_service or MongoService()
+
+    def resolve_collection(self, name: str) -> str:
+        """解析导出名称对应的集合，桶存储布局下导出桶集合"""
+        if name not in EXPORTABLE_COLLECTIONS:
+            raise ValueError(f"Unknown export collection: {name}")
+        collection = EXPORTABLE_COLLECTIONS[name]
+        if collection == "conversations" and self.mongo.storage_layout == STORAGE_LAYOUT_BUCKET:
+            return "conversation_buckets"
+        return collection
+
+    async def iter_records(
+        self,
+        name: str,
+        after_id: str | None = None,
+        filter_dict: dict | None = None,
+    ) -> AsyncIterator[tuple[ObjectId, list[dict]]]:
+        """
+        按 _id 顺序遍历导出的集合，返回 (续传用的 _id, 输出的文档列表)。
+        归档集合中每个文档是一个压缩的对话，解压为逐条消息输出（带 conversation_id 与 archive_id），
+        续传以归档文档为单位。
+        """
+        collection = self.resolve_collection(name)
+        async for doc in self.mongo.iter_documents(
+            collection, filter_dict, after_id=after_id, batch_size=settings.EXPORT_BATCH_SIZE
+        ):
+            if collection != "conversations_archive":
+                yield doc["_id"], [doc]
+                continue
+            yield doc["_id"], [
+                {**msg, "conversation_id": doc["conversation_id"], "archive_id": doc["_id"]}
+                for msg in self.mongo.decode_archive(doc)
+            ]
+
+    async def iter_ndjson(
+        self,
+        name: str,
+        after_id: str | None = None,
+        limit: int | None = None,
+        filter_dict: dict | None = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        以约 EXPORT_CHUNK_BYTES 大小的块流式输出 NDJSON。
+        每行都包含 `_id`，客户端可用最后一行的 `_id` 作为 after_id 续传；
+        归档导出每行是一条消息，续传使用 `archive_id`（limit 按整个对话截断）。
+        """
+        buffer = bytearray()
+        exported = 0
+
+        async for _, docs in self.iter_records(name, after_id, filter_dict):
+            for doc in docs:
+                buffer += encode_ndjson_line(doc)
+            exported += len(docs)
+            if len(buffer) >= settings.EXPORT_CHUNK_BYTES:
+                yield bytes(buffer)
+                buffer.clear()
+            if limit and exported >= limit:
+                break
+
+        if buffer:
+            yield bytes(buffer)
+        logger.info(f"Exported {exported} documents from {self.resolve_collection(name)}")
+
+    async def iter_gzip(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """将字节块流式压缩为 gzip"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 生成 gzip 格式
+        async for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
@@ -2,12 +2,14 @@
 from openai import AsyncOpenAI
 from fastapi import Depends
 from app.core.config import Settings, get_settings
+from app.utils.http_client import http_clients, UPSTREAM_LLM
 
 class LLMService:
     def __init__(self, settings: Settings = Depends(get_settings)):
         self.client = AsyncOpenAI(
             api_key=settings.LLM_OPENAI_API_KEY,
             base_url=settings.LLM_OPENAI_BASE_URL,
+            http_client=http_clients.get(UPSTREAM_LLM).client,
         )
         self.model_name = settings.LLM_MODEL_NAME
 
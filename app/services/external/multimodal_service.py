@@ -1,4 +1,6 @@
 # /app/services/external/multimodal_service.py
+import base64
+import binascii
 import json
 import os
 from pathlib import Path
@@ -6,14 +8,52 @@ from datetime import date, timedelta
 from fastapi import HTTPException
 
 from app.core.config import Settings, get_settings
+from app.core.executors import offload
 from app.models.chat import ImageType
 from app.models.pet import PetInfo
-from app.utils.http_client import AsyncHttpClient
-from app.utils.signature import generate_signature
+from app.utils.http_client import (
+    AsyncHttpClient, CircuitOpenError, HedgePolicy, hedged, http_clients, UPSTREAM_MULTIMODAL
+)
+from app.utils.bulkhead import Bulkhead, BulkheadFullError
+from app.utils.signature import SignedPayload
 from app.core.logging import get_logger
+from app.core.tracing import traced
 
 logger = get_logger(__name__)
 
+# 多模态请求对冲策略（进程内共享延迟统计与对冲预算）
+hedge_policy = HedgePolicy(
+    UPSTREAM_MULTIMODAL,
+    percentile=get_settings().MULTIMODAL_HEDGE_PERCENTILE,
+    max_ratio=get_settings().MULTIMODAL_HEDGE_MAX_RATIO,
+    min_delay=get_settings().MULTIMODAL_HEDGE_MIN_DELAY,
+)
+
+# 舱壁: 先按图片类型限流，再按整个上游限流，避免某一类图片突发占满共享连接池
+image_type_bulkheads = {
+    image_type: Bulkhead(
+        f"{UPSTREAM_MULTIMODAL}:{image_type.value}",
+        max_concurrent=get_settings().MULTIMODAL_BULKHEAD_TYPE_CONCURRENCY.get(
+            image_type.value, get_settings().MULTIMODAL_BULKHEAD_CONCURRENCY
+        ),
+        max_queue=get_settings().MULTIMODAL_BULKHEAD_QUEUE_SIZE,
+        queue_timeout=get_settings().MULTIMODAL_BULKHEAD_QUEUE_TIMEOUT,
+    )
+    for image_type in ImageType
+}
+upstream_bulkhead = Bulkhead(
+    UPSTREAM_MULTIMODAL,
+    max_concurrent=get_settings().MULTIMODAL_BULKHEAD_UPSTREAM_CONCURRENCY,
+    max_queue=get_settings().MULTIMODAL_BULKHEAD_QUEUE_SIZE,
+    queue_timeout=get_settings().MULTIMODAL_BULKHEAD_QUEUE_TIMEOUT,
+)
+
+
+def _validate_image(image_base64: str) -> int:
+    """校验 base64 图片数据，返回解码后的字节数；非法数据抛出 binascii.Error"""
+    return len(base64.b64decode(image_base64, validate=True))
+
+
 class MultiModalService:
     def __init__(
         self,
@@ -23,8 +63,8 @@ class MultiModalService:
         # 如果没有传入 settings，则获取默认配置
         self.settings = settings or get_settings()
 
-        # 如果没有传入 http_client，则创建默认实例
-        self.http_client = http_client or AsyncHttpClient()
+        # 如果没有传入 http_client，则使用多模态上游的共享连接池
+        self.http_client = http_client or http_clients.get(UPSTREAM_MULTIMODAL)
 
         self.breed_map = self._load_breed_map()
 
@@ -88,6 +128,7 @@ class MultiModalService:
         """将绝育状态转换为API需要的代码"""
         return 2 if is_neutered else 1  # 2=已绝育, 1=未绝育
 
+    @traced("multimodal.analyze_image")
     async def analyze_image(self, image_base64: str, image_type: ImageType, pet_info: PetInfo) -> dict:
         """
         调用相应的多模态API端点分析图像
@@ -99,6 +140,14 @@ class MultiModalService:
         if "," in image_base64:
             image_base64 = image_base64.split(",")[1]
 
+        # base64 解码全程持有 GIL，放到线程池只会增加切换延迟；送进程池又要 pickle 整张图片，
+        # 代价与解码本身相当，因此校验直接在事件循环上执行
+        image_size = len(image_base64)
+        try:
+            _validate_image(image_base64)
+        except (binascii.Error, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid base64 image data")
+
         body = {"image": image_base64}
 
         # 为相关端点添加宠物特定信息
@@ -116,23 +165,45 @@ class MultiModalService:
                 "fertility": self._get_fertility_code(getattr(pet_info, 'is_neutered', False))
             })
 
-        # 生成签名和请求头
-        headers, body_str = generate_signature(
+        # 请求体只序列化一次，签名与发送共用同一份字节；
+        # 大图片的签名放到线程池（hashlib/HMAC 处理大缓冲区时释放 GIL，事件循环可继续调度其他流）
+        payload = await offload(
+            SignedPayload,
             api_key=self.settings.MULTIMODAL_API_KEY,
             api_secret=self.settings.MULTIMODAL_API_SECRET,
             path=api_path,
-            body=body
+            body=body,
+            size=image_size
         )
 
-        logger.info(f"Calling multimodal API: {url} with body: {body_str[:100]}...")
-
-        try:
-            response = await self.http_client.post(
+        async def send():
+            # 每次尝试重新生成签名，避免重试时复用 nonce
+            headers = payload.headers()
+            logger.opt(lazy=True).debug(
+                "Calling multimodal API: {} with body: {}...", lambda: url, lambda: payload.content[:100].decode()
+            )
+            return await self.http_client.request_once(
+                "POST",
                 url,
-                data=body_str,
+                content=payload.content,
                 headers=headers,
                 timeout=self.settings.MULTIMODAL_TIMEOUT
             )
+
+        attempts = 0
+
+        async def send_attempt():
+            # 只对冲首次尝试：对冲请求是单次请求（重试由 execute 负责），并占用自己的上游舱位
+            nonlocal attempts
+            attempts += 1
+            if self.settings.MULTIMODAL_HEDGE_ENABLED and attempts == 1:
+                return await hedged(send, hedge_policy, slot=upstream_bulkhead)
+            return await send()
+
+        try:
+            async with image_type_bulkheads[image_type].acquire(), upstream_bulkhead.acquire():
+                # 图片分析是幂等的，按 HTTP_MAX_RETRIES 重试；开启对冲时慢的首次尝试会被复制一份
+                response = await self.http_client.execute(send_attempt)
             response.raise_for_status()
             result = response.json()
 
@@ -143,11 +214,25 @@ class MultiModalService:
                     detail=f"Multimodal API Error: {result.get('message', 'Unknown error')}"
                 )
 
-            logger.info(f"Multimodal API call successful for path: {api_path}")
+            logger.info("Multimodal API call successful for path: {}", api_path)
             return result
 
         except HTTPException:
             raise
+        except BulkheadFullError as e:
+            logger.warning(f"Multimodal API call shed: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail="Multimodal Service is overloaded, please retry later",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        except CircuitOpenError as e:
+            logger.warning(f"Multimodal API call rejected: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail="Multimodal Service is temporarily unavailable",
+                headers={"Retry-After": str(max(1, int(e.retry_after)))}
+            )
         except Exception as e:
             logger.error(f"Error calling multimodal API at {url}: {e}")
             raise HTTPException(
@@ -1,53 +1,595 @@
 # /app/services/storage/mongo_service.py
+import threading
 from datetime import datetime, timezone
+from collections.abc import AsyncIterator
+import bson
+from bson import Binary, ObjectId
+from pymongo import monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from motor.motor_asyncio import AsyncIOMotorClient
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.core import backend_usage
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.core.metrics import metrics
+from app.core.tracing import traced
+from app.utils.compression import compress, decompress
 
 logger = get_logger(__name__)
 
+STORAGE_LAYOUT_MESSAGE = "message"
+STORAGE_LAYOUT_BUCKET = "bucket"
+
+# 同一毫秒内写入的消息时间戳相同（BSON 时间精度为毫秒），以 _id 作为次级排序键保证顺序稳定
+MESSAGE_ORDER_DESC = [("timestamp", -1), ("_id", -1)]
+MESSAGE_ORDER_ASC = [("timestamp", 1), ("_id", 1)]
+BUCKET_ORDER_DESC = [("first_ts", -1), ("_id", -1)]
+BUCKET_ORDER_ASC = [("first_ts", 1), ("_id", 1)]
+
+COMMAND_DURATION = metrics.histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency reported by the driver", ("command", "status"),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    按命令名记录 MongoDB 命令耗时；回调运行在驱动的工作线程中，用锁串行化写入。
+    motor 在线程池中执行时会复制调用方的上下文，因此也能计入发起命令的请求。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1_000_000
+        with self._lock:
+            COMMAND_DURATION.observe(seconds, command=event.command_name, status="ok")
+            backend_usage.record(backend_usage.BACKEND_MONGO, seconds)
+
+    def failed(self, event):
+        seconds = event.duration_micros / 1_000_000
+        with self._lock:
+            COMMAND_DURATION.observe(seconds, command=event.command_name, status="error")
+            backend_usage.record(backend_usage.BACKEND_MONGO, seconds)
+
+
+command_metrics_listener = CommandMetricsListener()
+
+
 class MongoService:
     def __init__(self):
-        self.client = AsyncIOMotorClient(settings.MONGODB_URL)
-        self.db = self.client[settings.MONGODB_DB_NAME]
+        self.client = AsyncIOMotorClient(settings.MONGODB_URL, event_listeners=[command_metrics_listener])
+        self._use_database(settings.MONGODB_DB_NAME)
+        self.storage_layout = settings.CONVERSATION_STORAGE_LAYOUT
+        self.bucket_size = settings.CONVERSATION_BUCKET_SIZE
+        logger.info("MongoDB connection established.")
+
+    def _use_database(self, db_name: str):
+        self.db = self.client[db_name]
         self.conversations = self.db["conversations"]
+        self.conversation_buckets = self.db["conversation_buckets"]
+        self.conversations_archive = self.db["conversations_archive"]
         self.users = self.db["users"]
-        logger.info("MongoDB connection established.")
 
+    @classmethod
+    def for_layout(cls, storage_layout: str | None = None, db_name: str | None = None) -> "MongoService":
+        """
+        供迁移、基准等工具脚本使用：指定存储布局和数据库。
+        构造函数保持无参数，避免经 Depends() 注入时被暴露为请求的查询参数。
+        """
+        service = cls()
+        if db_name:
+            service._use_database(db_name)
+        if storage_layout:
+            service.storage_layout = storage_layout
+        return service
+
+    async def ensure_indexes(self):
+        """创建对话存储所需的索引"""
+        await self.conversations.create_index([("conversation_id", 1), *MESSAGE_ORDER_DESC])
+        await self.conversations.create_index([("conversation_id", 1), ("_id", 1)])
+        await self.conversation_buckets.create_index([("conversation_id", 1), *BUCKET_ORDER_DESC])
+        # 每个序号只有一个桶，并发新建桶时只有一个成功；迁移前写入的旧桶没有 seq，不参与唯一约束
+        await self.conversation_buckets.create_index(
+            [("conversation_id", 1), ("seq", 1)], unique=True, partialFilterExpression={"seq": {"$exists": True}}
+        )
+        await self.conversations_archive.create_index("conversation_id", unique=True)
+
+    @staticmethod
+    def _new_message(role: str, content: str) -> dict:
+        """构建单条消息文档"""
+        return {
+            "_id": ObjectId(),
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now(timezone.utc),
+            "metadata": {}
+        }
+
+    @traced("mongo.get_conversation_history")
     async def get_conversation_history(self, conversation_id: str, limit: int = 10) -> list[dict]:
         """
         Retrieves the last `limit` messages for a given conversation_id.
         """
-        logger.info(f"Fetching history for conversation_id: {conversation_id}")
+        logger.debug("Fetching history for conversation_id: {}", conversation_id)
+        history = await self._read_recent_messages(conversation_id, limit)
+        # 归档的对话在热数据中没有任何消息（写入前会先恢复），只有此时才需要检查归档
+        if not history and await self.rehydrate_conversation(conversation_id):
+            history = await self._read_recent_messages(conversation_id, limit)
+
+        # Format to match LangChain's expected message format
+        formatted_history = [
+            {"id": str(msg["_id"]), "role": msg["role"], "content": msg["content"], "timestamp": msg.get("timestamp")}
+            for msg in history
+        ]
+        return formatted_history
+
+    async def _read_recent_messages(self, conversation_id: str, limit: int) -> list[dict]:
+        """按当前存储布局读取最近 `limit` 条消息（按时间正序）"""
+        if self.storage_layout == STORAGE_LAYOUT_BUCKET:
+            return await self._get_bucketed_history(conversation_id, limit)
+
         cursor = self.conversations.find(
             {"conversation_id": conversation_id}
-        ).sort("timestamp", -1).limit(limit)
+        ).sort(MESSAGE_ORDER_DESC).limit(limit)
 
         history = await cursor.to_list(length=limit)
         history.reverse() # To get chronological order
+        return history
 
-        # Format to match LangChain's expected message format
-        formatted_history = [
-            {"role": msg["role"], "content": msg["content"]} for msg in history
+    async def _get_bucketed_history(self, conversation_id: str, limit: int) -> list[dict]:
+        """
+        从桶文档中读取最近 `limit` 条消息。
+        最新的桶可能未满，因此最多多读一个桶；所有桶在一次索引查询中返回。
+        """
+        bucket_count = -(-limit // self.bucket_size) + 1
+        cursor = self.conversation_buckets.find(
+            {"conversation_id": conversation_id},
+            {"messages": {"$slice": -limit}, "_id": 0}
+        ).sort(BUCKET_ORDER_DESC).limit(bucket_count)
+
+        buckets = await cursor.to_list(length=bucket_count)
+        history: list[dict] = []
+        for bucket in reversed(buckets):
+            history.extend(bucket.get("messages", []))
+        return history[-limit:]
+
+    @staticmethod
+    def parse_message_cursor(value: str) -> tuple[str, ObjectId | datetime]:
+        """
+        解析分页游标：合法的 ObjectId 按消息ID比较，否则按 ISO 时间戳比较。
+        无法解析时抛出 ValueError。
+        """
+        if ObjectId.is_valid(value):
+            return "_id", ObjectId(value)
+        timestamp = datetime.fromisoformat(value)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return "timestamp", timestamp
+
+    async def _resolve_cursor(self, conversation_id: str, value: str) -> tuple[datetime, ObjectId | None]:
+        """
+        将游标解析为 (timestamp, _id) 键。消息ID游标需要查出该消息的时间戳，
+        时间戳游标只比较时间（_id 为 None）。热数据中没有该消息时检查归档，仍不存在则抛出 ValueError。
+        """
+        field, cursor = self.parse_message_cursor(value)
+        if field == "timestamp":
+            return cursor, None
+
+        message = await self._find_cursor_message(conversation_id, cursor)
+        if not message and await self.rehydrate_conversation(conversation_id):
+            message = await self._find_cursor_message(conversation_id, cursor)
+        if not message:
+            raise ValueError(f"message {value} not found")
+        return message["timestamp"], cursor
+
+    async def _find_cursor_message(self, conversation_id: str, message_id: ObjectId) -> dict | None:
+        """读取游标消息的时间戳"""
+        if self.storage_layout == STORAGE_LAYOUT_BUCKET:
+            bucket = await self.conversation_buckets.find_one(
+                {"conversation_id": conversation_id, "messages._id": message_id},
+                {"messages.$": 1, "_id": 0}
+            )
+            return bucket["messages"][0] if bucket else None
+        return await self.conversations.find_one(
+            {"conversation_id": conversation_id, "_id": message_id}, {"timestamp": 1}
+        )
+
+    @staticmethod
+    def _keyset_condition(key: tuple[datetime, ObjectId | None], op: str) -> dict:
+        """
+        (timestamp, _id) 复合键集条件，op 为 $lt 或 $gt。
+        同一毫秒内的消息时间戳相同，只比较时间戳会跳过与游标同一时刻的消息。
+        外层的时间戳范围让查询仍然走 (conversation_id, timestamp, _id) 索引。
+        """
+        timestamp, message_id = key
+        if message_id is None:
+            return {"timestamp": {op: timestamp}}
+        return {
+            "timestamp": {f"{op}e": timestamp},
+            "$or": [{"timestamp": {op: timestamp}}, {"_id": {op: message_id}}],
+        }
+
+    @traced("mongo.get_conversation_messages")
+    async def get_conversation_messages(
+        self,
+        conversation_id: str,
+        limit: int = 20,
+        before: str | None = None,
+        after: str | None = None,
+        fields: list[str] | None = None,
+    ) -> tuple[list[dict], bool]:
+        """
+        基于游标（消息ID或时间戳）的键集分页读取对话消息，按 (timestamp, _id) 排序。
+        - 只传 before: 返回 before 之前最近的 `limit` 条
+        - 传 after: 返回 after 之后最早的 `limit` 条（增量同步）
+        - 都不传: 返回最近的 `limit` 条
+        返回按时间正序的消息列表，以及该方向上是否还有更多消息。
+        """
+        before_key = await self._resolve_cursor(conversation_id, before) if before else None
+        after_key = await self._resolve_cursor(conversation_id, after) if after else None
+
+        # 向后翻页与最新一页按倒序取，增量同步按正序取
+        direction = 1 if after else -1
+        projection = {name: 1 for name in (fields or ["role", "content", "timestamp", "metadata"])}
+
+        messages = await self._find_messages(conversation_id, before_key, after_key, direction, limit + 1, projection)
+        # 带游标的查询（如增量同步轮询）结果为空是常态，不检查归档；消息ID游标在解析时已经处理了归档
+        if not messages and not (before or after) and await self.rehydrate_conversation(conversation_id):
+            messages = await self._find_messages(conversation_id, before_key, after_key, direction, limit + 1, projection)
+
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if direction < 0:
+            messages.reverse()
+        for msg in messages:
+            msg["id"] = str(msg.pop("_id"))
+        return messages, has_more
+
+    async def _find_messages(
+        self,
+        conversation_id: str,
+        before_key: tuple[datetime, ObjectId | None] | None,
+        after_key: tuple[datetime, ObjectId | None] | None,
+        direction: int,
+        limit: int,
+        projection: dict,
+    ) -> list[dict]:
+        """按当前存储布局执行分页查询"""
+        conditions = [
+            self._keyset_condition(key, op)
+            for key, op in ((before_key, "$lt"), (after_key, "$gt")) if key
         ]
-        return formatted_history
+        query = conditions[0] if len(conditions) == 1 else ({"$and": conditions} if conditions else {})
+        order = [("timestamp", direction), ("_id", direction)]
 
+        if self.storage_layout == STORAGE_LAYOUT_BUCKET:
+            return await self._get_bucketed_messages(
+                conversation_id, before_key, after_key, query, order, limit, projection
+            )
+        cursor = self.conversations.find(
+            {"conversation_id": conversation_id, **query},
+            projection
+        ).sort(order).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def _get_bucketed_messages(
+        self,
+        conversation_id: str,
+        before_key: tuple[datetime, ObjectId | None] | None,
+        after_key: tuple[datetime, ObjectId | None] | None,
+        query: dict,
+        order: list[tuple[str, int]],
+        limit: int,
+        projection: dict,
+    ) -> list[dict]:
+        """
+        在桶文档中展开消息并按游标条件分页。
+        先按桶的时间范围裁剪并只取翻页方向上最近的若干个桶，再展开消息，
+        避免每页都展开对话的全部桶。
+        """
+        bucket_match: dict = {"conversation_id": conversation_id}
+        # 消息ID游标包含与游标同一时刻的消息，桶范围取闭区间
+        if before_key:
+            timestamp, message_id = before_key
+            bucket_match["first_ts"] = {"$lte" if message_id else "$lt": timestamp}
+        if after_key:
+            timestamp, message_id = after_key
+            bucket_match["last_ts"] = {"$gte" if message_id else "$gt": timestamp}
+
+        direction = order[0][1]
+        # 每个桶至少有一条消息，只有游标所在的桶可能没有满足条件的消息，
+        # 因此 limit + 1 个桶一定足够（不依赖桶大小，桶大小调整过的旧数据也适用）
+        bucket_count = limit + 1
+        pipeline = [
+            {"$match": bucket_match},
+            {"$sort": {"first_ts": direction, "_id": direction}},
+            {"$limit": bucket_count},
+            {"$unwind": "$messages"},
+            {"$replaceRoot": {"newRoot": "$messages"}},
+            {"$match": query},
+            {"$sort": dict(order)},
+            {"$limit": limit},
+            {"$project": projection},
+        ]
+        cursor = self.conversation_buckets.aggregate(pipeline)
+        return await cursor.to_list(length=limit)
+
+    @staticmethod
+    def _new_bucket(conversation_id: str, seq: int, messages: list[dict]) -> dict:
+        """构建桶文档；桶的 _id 取自桶内第一条消息的 _id"""
+        return {
+            "_id": messages[0]["_id"],
+            "conversation_id": conversation_id,
+            "seq": seq,
+            "count": len(messages),
+            "first_ts": messages[0]["timestamp"],
+            "last_ts": messages[-1]["timestamp"],
+            "messages": messages
+        }
+
+    async def _push_to_bucket(self, conversation_id: str, messages: list[dict], check_archive: bool):
+        """
+        将消息追加到对话最新的桶中，最新的桶已满或还没有桶时新建一个序号加一的桶。
+        - (conversation_id, seq) 唯一索引保证并发新建时只有一个成功，失败的一方重新追加到胜出者的桶，
+          因此同一时间只有最新的桶未满，各桶的时间范围不重叠（读取时的范围剪枝依赖这一点）；
+        - 负序号的桶是恢复归档时插入到已有桶之前的旧消息，不再追加；
+        - check_archive 为真时，新建桶之前先检查并恢复归档（见 save_messages）。
+        一次追加多条消息时桶可能略超过 bucket_size，这是可接受的软上限。
+        """
+        now = messages[-1]["timestamp"]
+        while True:
+            result = await self.conversation_buckets.update_one(
+                {"conversation_id": conversation_id, "seq": {"$gte": 0}, "count": {"$lt": self.bucket_size}},
+                {
+                    "$push": {"messages": {"$each": messages}},
+                    "$inc": {"count": len(messages)},
+                    "$set": {"last_ts": now},
+                }
+            )
+            if result.matched_count:
+                return
+
+            if check_archive:
+                check_archive = False
+                if await self.rehydrate_conversation(conversation_id):
+                    continue
+
+            latest = await self.conversation_buckets.find_one(
+                {"conversation_id": conversation_id, "seq": {"$gte": 0}}, {"seq": 1}, sort=[("seq", -1)]
+            )
+            seq = latest["seq"] + 1 if latest else 0
+            try:
+                await self.conversation_buckets.insert_one(self._new_bucket(conversation_id, seq, messages))
+                return
+            except DuplicateKeyError:
+                # 并发写入者已新建了这个序号的桶，重新追加到该桶
+                logger.debug("Bucket {} of conversation {} created concurrently, retrying", seq, conversation_id)
+
+    @traced("mongo.save_message")
     async def save_message(self, conversation_id: str, role: str, content: str) -> str | None:
         """保存聊天消息"""
+        saved = await self.save_messages(conversation_id, [(role, content)])
+        return str(saved[0]["_id"]) if saved else None
+
+    @traced("mongo.save_turn")
+    async def save_turn(
+        self, conversation_id: str, user_content: str, assistant_content: str, has_history: bool = False
+    ) -> list[dict]:
+        """保存一轮问答（用户消息 + 助手回复），桶模式下只需一次更新"""
+        return await self.save_messages(
+            conversation_id, [("user", user_content), ("assistant", assistant_content)], has_history=has_history
+        )
+
+    async def save_messages(
+        self, conversation_id: str, messages: list[tuple[str, str]], has_history: bool = False
+    ) -> list[dict]:
+        """
+        按顺序保存 (role, content) 消息，返回实际写入的消息文档（含 _id 与 timestamp），
+        供调用方据此写穿缓存；失败时返回空列表。
+        已归档的对话需要先恢复，否则新消息写入后热数据不为空，读取时不会再检查归档。
+        归档只删除热数据，因此只在新消息可能是热数据中第一批时才查询归档：
+        - has_history 表示调用方写入前已读到该对话的历史，对话一定在热数据中，不再检查；
+        - 桶模式下只有需要新建桶（首次写入、上一个桶已满或对话已归档）时才检查。
+        """
         try:
-            message_doc = {
-                "conversation_id": conversation_id,
-                "role": role,
-                "content": content,
-                "timestamp": datetime.now(timezone.utc),
-                "metadata": {}
-            }
-            result = await self.conversations.insert_one(message_doc)
-            return str(result.inserted_id)
+            docs = [self._new_message(role, content) for role, content in messages]
+            if self.storage_layout == STORAGE_LAYOUT_BUCKET:
+                await self._push_to_bucket(conversation_id, docs, check_archive=not has_history)
+            else:
+                if not has_history:
+                    await self.rehydrate_conversation(conversation_id)
+                await self.conversations.insert_many(
+                    [{**doc, "conversation_id": conversation_id} for doc in docs], ordered=True
+                )
+            return docs
         except Exception as e:
-            logger.error(f"Error saving message: {e}")
+            logger.error(f"Error saving messages: {e}")
+            return []
+
+    # ==================== 冷数据归档 ====================
+
+    def build_buckets(self, conversation_id: str, messages: list[dict], start_seq: int = 0) -> list[dict]:
+        """
+        将一个对话的消息（按时间正序）切分为桶文档，序号从 start_seq 开始。
+        桶的 _id 取自桶内第一条消息的 _id，重复写入同一批消息时会被唯一键拒绝。
+        """
+        buckets = []
+        for start in range(0, len(messages), self.bucket_size):
+            chunk = [
+                {
+                    "_id": msg["_id"],
+                    "role": msg["role"],
+                    "content": msg["content"],
+                    "timestamp": msg["timestamp"],
+                    "metadata": msg.get("metadata", {})
+                }
+                for msg in messages[start:start + self.bucket_size]
+            ]
+            buckets.append(self._new_bucket(conversation_id, start_seq + len(buckets), chunk))
+        return buckets
+
+    async def _read_all_messages(self, conversation_id: str) -> list[dict]:
+        """读取对话在热数据中的全部消息（按时间正序）"""
+        if self.storage_layout == STORAGE_LAYOUT_BUCKET:
+            cursor = self.conversation_buckets.find({"conversation_id": conversation_id}).sort(BUCKET_ORDER_ASC)
+            messages = []
+            async for bucket in cursor:
+                messages.extend(bucket.get("messages", []))
+            return messages
+
+        cursor = self.conversations.find(
+            {"conversation_id": conversation_id},
+            {"conversation_id": 0}
+        ).sort(MESSAGE_ORDER_ASC)
+        return await cursor.to_list(length=None)
+
+    async def _insert_hot_messages(self, conversation_id: str, messages: list[dict]):
+        """
+        将消息写回热数据；已存在的文档（相同 _id）会被跳过，保证重复恢复是幂等的。
+        桶模式下对话已有桶时（如归档期间写入了新消息），恢复的旧消息使用负序号排在已有桶之前，不再接收追加。
+        """
+        if self.storage_layout == STORAGE_LAYOUT_BUCKET:
+            start_seq = 0
+            lowest = await self.conversation_buckets.find_one(
+                {"conversation_id": conversation_id}, {"seq": 1}, sort=[("seq", 1)]
+            )
+            if lowest:
+                bucket_count = -(-len(messages) // self.bucket_size)
+                start_seq = min(lowest.get("seq") or 0, 0) - bucket_count
+            documents = self.build_buckets(conversation_id, messages, start_seq=start_seq)
+            collection = self.conversation_buckets
+        else:
+            documents = [{**msg, "conversation_id": conversation_id} for msg in messages]
+            collection = self.conversations
+
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+    async def iter_idle_conversations(self, idle_before: datetime) -> AsyncIterator[str]:
+        """流式返回最后一条消息早于 `idle_before` 的对话ID"""
+        if self.storage_layout == STORAGE_LAYOUT_BUCKET:
+            collection = self.conversation_buckets
+            pipeline = [{"$group": {"_id": "$conversation_id", "last_ts": {"$max": "$last_ts"}}}]
+        else:
+            collection = self.conversations
+            pipeline = [
+                {"$sort": {"conversation_id": 1, "timestamp": -1, "_id": -1}},
+                {"$group": {"_id": "$conversation_id", "last_ts": {"$first": "$timestamp"}}},
+            ]
+        pipeline.append({"$match": {"last_ts": {"$lt": idle_before}}})
+
+        async for doc in collection.aggregate(pipeline, allowDiskUse=True):
+            yield doc["_id"]
+
+    @staticmethod
+    def decode_archive(archive_doc: dict) -> list[dict]:
+        """解压归档文档中的消息（按时间正序）"""
+        raw = decompress(archive_doc["codec"], archive_doc["blob"])
+        return bson.decode(raw)["messages"]
+
+    async def _delete_hot_messages(self, conversation_id: str, message_ids: list[ObjectId]):
+        """
+        只删除已读取（已写入归档）的消息，读取之后新写入的消息保留在热数据中。
+        桶模式下从桶中移除这些消息并重算 count / first_ts，再删除已清空的桶；单个桶的更新是原子的。
+        """
+        if self.storage_layout != STORAGE_LAYOUT_BUCKET:
+            await self.conversations.delete_many({"conversation_id": conversation_id, "_id": {"$in": message_ids}})
+            return
+
+        await self.conversation_buckets.update_many(
+            {"conversation_id": conversation_id, "messages._id": {"$in": message_ids}},
+            [
+                {"$set": {"messages": {"$filter": {
+                    "input": "$messages", "cond": {"$not": [{"$in": ["$$this._id", message_ids]}]}
+                }}}},
+                {"$set": {"count": {"$size": "$messages"}, "first_ts": {"$min": "$messages.timestamp"}}},
+            ]
+        )
+        await self.conversation_buckets.delete_many({"conversation_id": conversation_id, "count": 0})
+
+    async def archive_conversation(self, conversation_id: str) -> dict | None:
+        """
+        将对话的全部消息以 BSON 序列化并压缩后写入归档集合，再从热数据中删除。
+        - 先写归档再删除，中途失败时数据仍然完整；
+        - 已有归档时与其合并（按 _id 去重），不会覆盖更早归档的消息；
+        - 只删除本次读取的消息。删除后对话仍有新消息时说明对话又活跃了，立即恢复归档，返回 None。
+        """
+        messages = await self._read_all_messages(conversation_id)
+        if not messages:
             return None
+        message_ids = [msg["_id"] for msg in messages]
+
+        existing = await self.conversations_archive.find_one({"conversation_id": conversation_id})
+        if existing:
+            merged = {msg["_id"]: msg for msg in self.decode_archive(existing)}
+            merged.update((msg["_id"], msg) for msg in messages)
+            messages = sorted(merged.values(), key=lambda msg: (msg["timestamp"], msg["_id"]))
+
+        raw = bson.encode({"messages": messages})
+        codec, blob = compress(raw, level=settings.CONVERSATION_ARCHIVE_COMPRESSION_LEVEL)
+        archive_doc = {
+            "conversation_id": conversation_id,
+            "codec": codec,
+            "message_count": len(messages),
+            "first_ts": messages[0]["timestamp"],
+            "last_ts": messages[-1]["timestamp"],
+            "raw_size": len(raw),
+            "compressed_size": len(blob),
+            "archived_at": datetime.now(timezone.utc),
+            "blob": Binary(blob),
+        }
+        if existing:
+            # 只替换读取到的那个版本；期间归档被恢复或改写时放弃本次归档
+            result = await self.conversations_archive.replace_one(
+                {"_id": existing["_id"], "archived_at": existing["archived_at"]}, archive_doc
+            )
+            if not result.matched_count:
+                logger.warning(f"Archive of conversation {conversation_id} changed concurrently, skipped")
+                return None
+        else:
+            # conversation_id 唯一索引保证并发归档时只有一个插入成功
+            try:
+                await self.conversations_archive.insert_one(archive_doc)
+            except DuplicateKeyError:
+                logger.warning(f"Conversation {conversation_id} was archived concurrently, skipped")
+                return None
+
+        await self._delete_hot_messages(conversation_id, message_ids)
+
+        hot = self.conversation_buckets if self.storage_layout == STORAGE_LAYOUT_BUCKET else self.conversations
+        if await hot.find_one({"conversation_id": conversation_id}, {"_id": 1}):
+            logger.info(f"Conversation {conversation_id} received new messages while archiving, rehydrating")
+            await self.rehydrate_conversation(conversation_id)
+            return None
+
+        archive_doc.pop("_id", None)
+        archive_doc.pop("blob")
+        return archive_doc
+
+    @traced("mongo.rehydrate_conversation")
+    async def rehydrate_conversation(self, conversation_id: str) -> bool:
+        """如果对话已归档，解压并写回热数据，然后删除归档文档"""
+        try:
+            archive_doc = await self.conversations_archive.find_one({"conversation_id": conversation_id})
+            if not archive_doc:
+                return False
+
+            messages = self.decode_archive(archive_doc)
+            await self._insert_hot_messages(conversation_id, messages)
+            await self.conversations_archive.delete_one({"_id": archive_doc["_id"]})
+            logger.info(f"Rehydrated {len(messages)} archived messages for conversation_id: {conversation_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error rehydrating archived conversation {conversation_id}: {e}")
+            return False
 
     async def find_one(self, collection_name: str, filter_dict: dict) -> dict | None:
         """查找单个文档"""
@@ -86,6 +628,28 @@ class MongoService:
             logger.error(f"MongoDB find_many error in {collection_name}: {e}")
             return []
 
+    async def iter_documents(
+        self,
+        collection_name: str,
+        filter_dict: dict | None = None,
+        after_id: ObjectId | str | None = None,
+        projection: dict | None = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[dict]:
+        """
+        按 _id 升序流式遍历集合，内存中只保留一个游标批次。
+        传入 after_id 时从该文档之后继续，用于断点续传。
+        """
+        query = dict(filter_dict or {})
+        if after_id is not None:
+            if isinstance(after_id, str) and ObjectId.is_valid(after_id):
+                after_id = ObjectId(after_id)
+            query["_id"] = {"$gt": after_id}
+
+        cursor = self.db[collection_name].find(query, projection).sort("_id", 1).batch_size(batch_size)
+        async for doc in cursor:
+            yield doc
+
     async def update_one(self, collection_name: str, filter_dict: dict, update_dict: dict) -> bool:
         """更新单个文档"""
         try:
@@ -136,6 +700,7 @@ def get_mongo_db() -> AsyncIOMotorDatabase:
 async def init_mongo():
     """初始化MongoDB连接"""
     # MongoDB连接在实例化时就建立了
+    await mongo_service.ensure_indexes()
     logger.info("MongoDB service initialized")
 
 async def close_mongo():
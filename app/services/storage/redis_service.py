@@ -1,19 +1,126 @@
 import asyncio
-import json
+import time
+from functools import lru_cache
+from typing import Any, TypeVar
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from redis.asyncio import Redis, ConnectionPool
+from redis.asyncio.client import Pipeline
 from redis.exceptions import RedisError, ConnectionError
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.core.metrics import metrics
+from app.core import backend_usage, tracing
+from app.utils import serialization
 from urllib.parse import urlparse
 
 logger = get_logger(__name__)
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+COMMAND_DURATION = metrics.histogram(
+    "redis_command_duration_seconds", "Redis command latency (pipelines as one PIPELINE/MULTI sample)", ("command",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+
+class InstrumentedPipeline(Pipeline):
+    """整个管道的往返耗时计为一次 PIPELINE/MULTI"""
+
+    async def execute(self, raise_on_error: bool = True):
+        command = "MULTI" if self.is_transaction else "PIPELINE"
+        started = time.perf_counter()
+        try:
+            if tracing.is_active():
+                with tracing.span(f"redis {command}", commands=len(self.command_stack)):
+                    return await super().execute(raise_on_error)
+            return await super().execute(raise_on_error)
+        finally:
+            elapsed = time.perf_counter() - started
+            COMMAND_DURATION.observe(elapsed, command=command)
+            backend_usage.record(backend_usage.BACKEND_REDIS, elapsed)
+
+
+class InstrumentedRedis(Redis):
+    """按命令名记录每条 Redis 命令的耗时"""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper() if args else ""
+        started = time.perf_counter()
+        try:
+            if tracing.is_active():
+                with tracing.span(f"redis {command}"):
+                    return await super().execute_command(*args, **options)
+            return await super().execute_command(*args, **options)
+        finally:
+            elapsed = time.perf_counter() - started
+            COMMAND_DURATION.observe(elapsed, command=command)
+            backend_usage.record(backend_usage.BACKEND_REDIS, elapsed)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+
+# 版本号未变化时整体替换对话历史缓存（回填用）
+# KEYS: 历史列表, 版本号; ARGV: 期望版本号, 最大条数, 过期秒数, 消息...
+_CACHE_HISTORY_IF_VERSION_LUA = """
+if (redis.call("get", KEYS[2]) or "0") ~= ARGV[1] then
+    return 0
+end
+redis.call("del", KEYS[1])
+if #ARGV >= 4 then
+    redis.call("rpush", KEYS[1], unpack(ARGV, 4))
+    redis.call("ltrim", KEYS[1], -tonumber(ARGV[2]), -1)
+    redis.call("expire", KEYS[1], ARGV[3])
+end
+return 1
+"""
+
+# 递增版本号并追加缓存中尚不存在的消息（写穿用），按 id 精确去重，只解码列表末尾的 ARGV[3] 条
+# KEYS: 历史列表, 版本号; ARGV: 最大条数, 过期秒数, 去重窗口, 交替的 id 与消息...
+_APPEND_HISTORY_LUA = """
+redis.call("incr", KEYS[2])
+redis.call("expire", KEYS[2], ARGV[2])
+if redis.call("exists", KEYS[1]) == 0 then
+    return 0
+end
+local seen = {}
+for _, item in ipairs(redis.call("lrange", KEYS[1], -tonumber(ARGV[3]), -1)) do
+    local ok, message = pcall(cjson.decode, item)
+    if ok and type(message) == "table" and type(message.id) == "string" then
+        seen[message.id] = true
+    end
+end
+local added = 0
+for i = 4, #ARGV, 2 do
+    if ARGV[i] == "" or not seen[ARGV[i]] then
+        redis.call("rpush", KEYS[1], ARGV[i + 1])
+        added = added + 1
+    end
+end
+redis.call("ltrim", KEYS[1], -tonumber(ARGV[1]), -1)
+redis.call("expire", KEYS[1], ARGV[2])
+return added
+"""
+
+# 回填快照若已包含正在追加的消息，它们只会位于列表末尾，之后最多还有同一对话并发轮次写入的少量消息
+_APPEND_DEDUPE_EXTRA = 8
+
+
+@lru_cache(maxsize=128)
+def _type_adapter(tp: Any) -> TypeAdapter:
+    """按类型缓存 TypeAdapter（构建校验器的开销只付一次）"""
+    return TypeAdapter(tp)
+
+
 class RedisService:
     """Redis异步服务类，提供缓存、会话管理、速率限制等功能"""
 
     def __init__(self):
         self._pool: ConnectionPool | None = None
         self._redis: Redis | None = None
+        self._cache_history_script = None
+        self._append_history_script = None
 
     async def connect(self):
         """连接到Redis"""
@@ -43,7 +150,10 @@ class RedisService:
                 socket_keepalive_options={},
                 health_check_interval=30
             )
-            self._redis = Redis(connection_pool=self._pool)
+            self._redis = InstrumentedRedis(connection_pool=self._pool)
+            # 脚本只注册一次，之后以 EVALSHA 调用（服务端脚本缓存丢失时自动重新加载）
+            self._cache_history_script = self._redis.register_script(_CACHE_HISTORY_IF_VERSION_LUA)
+            self._append_history_script = self._redis.register_script(_APPEND_HISTORY_LUA)
 
             # 测试连接
             await self._redis.ping()
@@ -84,7 +194,7 @@ class RedisService:
             logger.error(f"Redis GET错误 {key}: {e}")
             return None
 
-    async def set(self, key: str, value: str, ex: int | None = None,
+    async def set(self, key: str, value: str | bytes, ex: int | None = None,
                   nx: bool = False) -> bool:
         """设置字符串值"""
         try:
@@ -299,21 +409,59 @@ class RedisService:
     async def get_json(self, key: str) -> dict | None:
         """获取JSON数据"""
         try:
-            data = await self.get(key)
-            return json.loads(data) if data else None
-        except json.JSONDecodeError as e:
+            data = await self._redis.get(key)
+            return serialization.loads(data) if data else None
+        except RedisError as e:
+            logger.error(f"Redis GET错误 {key}: {e}")
+            return None
+        except serialization.JSONDecodeError as e:
             logger.error(f"JSON解析错误 {key}: {e}")
             return None
 
     async def set_json(self, key: str, value: dict, ex: int | None = None) -> bool:
         """设置JSON数据"""
         try:
-            json_str = json.dumps(value, ensure_ascii=False)
-            return await self.set(key, json_str, ex=ex)
+            return await self.set(key, serialization.dumps(value), ex=ex)
         except (TypeError, ValueError) as e:
             logger.error(f"JSON序列化错误 {key}: {e}")
             return False
 
+    # ==================== 类型化模型操作 ====================
+    # 直接把 Redis 返回的原始 bytes 交给 pydantic 的 JSON 校验器，
+    # 省去 decode → json.loads → dict → Model(**dict) 的多次完整遍历
+
+    async def get_model(self, key: str, model: type[ModelT]) -> ModelT | None:
+        """获取并校验为 pydantic 模型"""
+        try:
+            data = await self._redis.get(key)
+            return model.model_validate_json(data) if data else None
+        except RedisError as e:
+            logger.error(f"Redis GET错误 {key}: {e}")
+            return None
+        except ValidationError as e:
+            logger.error(f"缓存数据校验失败 {key}: {e}")
+            return None
+
+    async def set_model(self, key: str, value: BaseModel, ex: int | None = None) -> bool:
+        """以 model_dump_json 序列化并写入"""
+        return await self.set(key, value.model_dump_json(), ex=ex)
+
+    async def get_typed(self, key: str, tp: Any) -> Any | None:
+        """获取并按任意类型（如 list[Model]、dict[str, int]）校验"""
+        try:
+            data = await self._redis.get(key)
+            return _type_adapter(tp).validate_json(data) if data else None
+        except RedisError as e:
+            logger.error(f"Redis GET错误 {key}: {e}")
+            return None
+        except ValidationError as e:
+            logger.error(f"缓存数据校验失败 {key}: {e}")
+            return None
+
+    async def set_typed(self, key: str, value: Any, tp: Any, ex: int | None = None) -> bool:
+        """按类型序列化为 JSON bytes 并写入"""
+        return await self.set(key, _type_adapter(tp).dump_json(value), ex=ex)
+
     # ==================== 分布式锁 ====================
 
     async def acquire_lock(self, lock_key: str, timeout: int = 30,
@@ -360,43 +508,117 @@ class RedisService:
         cache_key = f"user_cache:{user_id}"
         return await self.get_json(cache_key)
 
+    @staticmethod
+    def _conversation_version_key(conversation_id: str) -> str:
+        return f"chat_history_version:{conversation_id}"
+
+    async def get_conversation_cache_version(self, conversation_id: str) -> str:
+        """
+        读取对话历史缓存的版本号；每次追加都会递增。
+        回填前读取，写入时比较，用于发现回填期间发生的追加。
+        """
+        return await self.get(self._conversation_version_key(conversation_id)) or "0"
+
     async def cache_conversation_history(self, conversation_id: str,
                                        messages: list[dict],
                                        max_messages: int = 100,
-                                       expire_seconds: int = 3600) -> bool:
-        """缓存对话历史"""
+                                       expire_seconds: int = 3600,
+                                       version: str | None = None) -> bool:
+        """
+        缓存对话历史（按时间正序整体替换）。
+        传入 version（读取数据库前的版本号）时只在版本未变化时写入：回填期间有新消息追加时，
+        数据库快照可能缺少这些消息，此时放弃写入，下次读取再回填。返回是否写入。
+        """
         cache_key = f"chat_history:{conversation_id}"
-        try:
-            # 将消息序列化并推入列表
-            for message in messages:
-                message_json = json.dumps(message, ensure_ascii=False)
-                await self.lpush(cache_key, message_json)
-
-            # 保持最新的消息数量
-            await self.ltrim(cache_key, 0, max_messages - 1)
-            await self.expire(cache_key, expire_seconds)
+        entries = [serialization.dumps(message) for message in messages]
+        try:
+            if version is not None:
+                result = await self._cache_history_script(
+                    keys=[cache_key, self._conversation_version_key(conversation_id)],
+                    args=[version, max_messages, expire_seconds, *entries]
+                )
+                return result == 1
+
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.delete(cache_key)
+            if entries:
+                pipe.rpush(cache_key, *entries)
+                pipe.ltrim(cache_key, -max_messages, -1)
+                pipe.expire(cache_key, expire_seconds)
+            await pipe.execute()
             return True
         except Exception as e:
             logger.error(f"缓存对话历史失败 {conversation_id}: {e}")
             return False
 
+    async def append_conversation_messages(self, conversation_id: str,
+                                         messages: list[dict],
+                                         max_messages: int = 100,
+                                         expire_seconds: int = 3600) -> bool:
+        """
+        写穿追加新消息到已缓存的对话历史，并递增版本号使进行中的回填放弃写入。
+        与 RPUSHX 相同，缓存不存在时不创建，避免生成缺少旧消息的不完整列表，下次读取未命中时会从 MongoDB 整体回填。
+        消息带有 id 时跳过缓存中已有的消息（回填的数据库快照可能已经包含这一轮），
+        只比较列表末尾若干条的 id，不扫描整个列表。
+        """
+        cache_key = f"chat_history:{conversation_id}"
+        args = [max_messages, expire_seconds, len(messages) + _APPEND_DEDUPE_EXTRA]
+        for message in messages:
+            args.extend((message.get("id") or "", serialization.dumps(message)))
+        try:
+            await self._append_history_script(
+                keys=[cache_key, self._conversation_version_key(conversation_id)], args=args
+            )
+            return True
+        except Exception as e:
+            logger.error(f"追加对话历史缓存失败 {conversation_id}: {e}")
+            return False
+
     async def get_cached_conversation_history(self, conversation_id: str,
                                             limit: int = 50) -> list[dict]:
-        """获取缓存的对话历史"""
+        """获取缓存的对话历史（最近 `limit` 条，按时间正序）"""
         cache_key = f"chat_history:{conversation_id}"
         try:
-            messages_json = await self.lrange(cache_key, 0, limit - 1)
+            messages_json = await self._redis.lrange(cache_key, -limit, -1)
             messages = []
             for msg_json in messages_json:
                 try:
-                    messages.append(json.loads(msg_json))
-                except json.JSONDecodeError:
+                    messages.append(serialization.loads(msg_json))
+                except serialization.JSONDecodeError:
                     continue
             return messages
         except Exception as e:
             logger.error(f"获取缓存对话历史失败 {conversation_id}: {e}")
             return []
 
+    async def get_cached_conversation_models(self, conversation_id: str, model: type[ModelT],
+                                           limit: int = 50) -> list[ModelT]:
+        """
+        获取缓存的对话历史并校验为模型列表（最近 `limit` 条，按时间正序）。
+        列表元素本身是 JSON 文档，拼成一个 JSON 数组后一次校验完成。
+        """
+        cache_key = f"chat_history:{conversation_id}"
+        try:
+            items = await self._redis.lrange(cache_key, -limit, -1)
+        except RedisError as e:
+            logger.error(f"获取缓存对话历史失败 {conversation_id}: {e}")
+            return []
+        if not items:
+            return []
+
+        adapter = _type_adapter(list[model])
+        try:
+            return adapter.validate_json(b"[" + b",".join(items) + b"]")
+        except ValidationError:
+            # 个别元素损坏时逐条校验，跳过无效元素
+            messages = []
+            for item in items:
+                try:
+                    messages.append(model.model_validate_json(item))
+                except ValidationError:
+                    continue
+            return messages
+
     # ==================== 统计功能 ====================
 
     async def record_api_call(self, endpoint: str, user_id: str | None = None) -> bool:
@@ -489,6 +711,11 @@ class RedisService:
 # 全局Redis服务实例
 redis_service = RedisService()
 
+# 依赖注入函数 - 获取已连接的Redis服务实例
+def get_redis_service() -> RedisService:
+    """获取Redis服务实例"""
+    return redis_service
+
 # 生命周期管理
 async def init_redis():
     """初始化Redis连接"""
@@ -0,0 +1,107 @@
+"""
+舱壁隔离（Bulkhead）：按资源划分并发上限和有界等待队列。
+某一类请求突发时只会占满自己的舱位；队列满了立即拒绝，而不是在共享连接池里排队直到超时。
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+from app.core.metrics import metrics
+
+QUEUE_TIME = metrics.histogram(
+    "bulkhead_queue_seconds", "Time spent waiting for a bulkhead slot", ("bulkhead",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+ACTIVE = metrics.gauge(
+    "bulkhead_active", "Calls currently holding a bulkhead slot", ("bulkhead",)
+)
+QUEUED = metrics.gauge(
+    "bulkhead_queued", "Calls currently waiting for a bulkhead slot", ("bulkhead",)
+)
+REJECTIONS = metrics.counter(
+    "bulkhead_rejections_total", "Calls rejected by a bulkhead", ("bulkhead", "reason")
+)
+
+
+class BulkheadFullError(Exception):
+    """舱壁已满（等待队列已满或排队超时）"""
+
+    def __init__(self, name: str, reason: str, retry_after: int):
+        super().__init__(f"Bulkhead '{name}' rejected the call: {reason}")
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    """
+    并发上限 + 有界等待队列。
+    - 有空位时直接进入；
+    - 无空位且排队数未达 max_queue 时排队，最多等待 queue_timeout 秒；
+    - 否则立即抛出 BulkheadFullError。
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._active = 0
+        self._queued = 0
+        # 占用时长的指数滑动平均，用于估算 Retry-After
+        self._avg_hold = 0.0
+        ACTIVE.set_function(lambda: self._active, bulkhead=name)
+        QUEUED.set_function(lambda: self._queued, bulkhead=name)
+
+    def retry_after(self) -> int:
+        """按平均占用时长估算排队者全部完成所需的秒数"""
+        estimate = self._avg_hold * (self._queued + 1) / self.max_concurrent
+        return max(1, math.ceil(estimate))
+
+    def _reject(self, reason: str) -> BulkheadFullError:
+        REJECTIONS.inc(bulkhead=self.name, reason=reason)
+        return BulkheadFullError(self.name, reason, self.retry_after())
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": self._queued,
+        }
+
+    def has_capacity(self) -> bool:
+        """当前是否有空位（不排队即可进入）"""
+        return not self._semaphore.locked()
+
+    @asynccontextmanager
+    async def acquire(self, wait: bool = True):
+        """占用一个舱位；wait=False 时没有空位立即拒绝（用于对冲等可选的额外请求）"""
+        started = time.perf_counter()
+        if self._semaphore.locked():
+            if not wait:
+                raise self._reject("no_slot")
+            if self._queued >= self.max_queue:
+                raise self._reject("queue_full")
+            self._queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("queue_timeout")
+            finally:
+                self._queued -= 1
+        else:
+            await self._semaphore.acquire()
+
+        acquired = time.perf_counter()
+        QUEUE_TIME.observe(acquired - started, bulkhead=self.name)
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+            hold = time.perf_counter() - acquired
+            self._avg_hold = hold if not self._avg_hold else 0.8 * self._avg_hold + 0.2 * hold
@@ -0,0 +1,37 @@
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstandard 未安装时退回 zlib
+    zstandard = None
+
+CODEC_ZSTD = "zstd"
+CODEC_ZLIB = "zlib"
+
+
+def default_codec() -> str:
+    """当前环境可用的首选压缩算法"""
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def compress(data: bytes, level: int = 10, codec: str | None = None) -> tuple[str, bytes]:
+    """压缩数据，返回 (算法名, 压缩后的字节)"""
+    codec = codec or default_codec()
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        return codec, zstandard.ZstdCompressor(level=level).compress(data)
+    if codec == CODEC_ZLIB:
+        return codec, zlib.compress(data, min(level, 9))
+    raise ValueError(f"Unsupported compression codec: {codec}")
+
+
+def decompress(codec: str, data: bytes) -> bytes:
+    """按算法名解压数据"""
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed, cannot decompress zstd data")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    raise ValueError(f"Unsupported compression codec: {codec}")
@@ -1,42 +1,618 @@
-# /app/utils/http_client.py
+import asyncio
+import importlib.util
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
 import httpx
-from contextlib import asynccontextmanager
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import metrics
+from app.utils.bulkhead import Bulkhead
+
+logger = get_logger(__name__)
+
+# httpx 的 HTTP/2 支持依赖可选的 h2 包（httpx[http2]），未安装时 http2=True 会在创建连接池时报 ImportError
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# 上游服务名称
+UPSTREAM_MULTIMODAL = "multimodal"
+UPSTREAM_PET_INFO = "pet_info"
+UPSTREAM_LLM = "llm"
+
+REQUEST_DURATION = metrics.histogram(
+    "http_client_request_duration_seconds", "Upstream HTTP request duration", ("upstream",)
+)
+POOL_WAIT = metrics.histogram(
+    "http_client_pool_wait_seconds", "Time spent waiting for a pooled connection", ("upstream",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+IN_FLIGHT = metrics.gauge(
+    "http_client_in_flight_requests", "Upstream requests currently in flight", ("upstream",)
+)
+POOL_UTILIZATION = metrics.gauge(
+    "http_client_pool_utilization", "In-flight requests divided by max connections", ("upstream",)
+)
+
+RETRIES = metrics.counter(
+    "http_client_retries_total", "Upstream request retries", ("upstream",)
+)
+RETRY_BUDGET_EXHAUSTED = metrics.counter(
+    "http_client_retry_budget_exhausted_total", "Retries skipped because the retry budget was empty", ("upstream",)
+)
+BREAKER_STATE = metrics.gauge(
+    "http_client_circuit_state", "Circuit breaker state (0=closed, 1=half-open, 2=open)", ("upstream",)
+)
+BREAKER_REJECTIONS = metrics.counter(
+    "http_client_circuit_rejections_total", "Requests rejected by an open circuit breaker", ("upstream",)
+)
+
+HEDGE_REQUESTS = metrics.counter(
+    "http_client_hedge_eligible_requests_total", "Requests eligible for hedging", ("upstream",)
+)
+HEDGES = metrics.counter(
+    "http_client_hedges_total", "Hedged (duplicate) requests sent", ("upstream",)
+)
+HEDGE_WINS = metrics.counter(
+    "http_client_hedge_wins_total", "Hedged requests that returned before the original", ("upstream",)
+)
+HEDGE_DELAY = metrics.gauge(
+    "http_client_hedge_delay_seconds", "Current hedge trigger delay (observed latency percentile)", ("upstream",)
+)
+
+T = TypeVar("T")
+
+# 可重试的上游状态码
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# httpcore trace 中表示请求已拿到连接的事件
+_CONNECTION_ACQUIRED_EVENTS = (
+    "connection.connect_tcp.started",
+    "connection.connect_unix_socket.started",
+    "http11.send_request_headers.started",
+    "http2.send_request_headers.started",
+)
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开时快速失败"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(f"Circuit breaker for upstream '{upstream}' is open, retry after {retry_after:.1f}s")
+
+
+def backoff_delay(attempt: int, base: float | None = None, cap: float | None = None) -> float:
+    """带完全抖动的指数退避: uniform(0, min(cap, base * 2^attempt))"""
+    base = settings.HTTP_RETRY_BACKOFF_BASE if base is None else base
+    cap = settings.HTTP_RETRY_BACKOFF_MAX if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RetryBudget:
+    """
+    全局重试预算（令牌桶）。
+    每个请求存入 `ratio` 个令牌，每次重试消耗 1 个，另外每秒保底补充 `min_per_second` 个。
+    上游整体故障时重试量被限制在正常流量的 `ratio` 比例内，避免重试放大故障。
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._last_refill = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._last_refill) * self.min_per_second)
+        self._last_refill = now
+
+    def record_request(self):
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class CircuitBreaker:
+    """
+    每个上游一个熔断器。
+    连续失败达到阈值后打开，打开期间请求直接抛出 CircuitOpenError（不占用连接、不等待超时）；
+    超过 reset_timeout 后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+    def __init__(self, upstream: str, failure_threshold: int, reset_timeout: float):
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        BREAKER_STATE.set(self.CLOSED, upstream=upstream)
+
+    def _set_state(self, state: int):
+        self.state = state
+        BREAKER_STATE.set(state, upstream=self.upstream)
+
+    def before_request(self):
+        """请求前检查，熔断时抛出 CircuitOpenError"""
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                BREAKER_REJECTIONS.inc(upstream=self.upstream)
+                raise CircuitOpenError(self.upstream, remaining)
+            self._set_state(self.HALF_OPEN)
+        # 半开状态只允许一个探测请求
+        if self._probe_in_flight:
+            BREAKER_REJECTIONS.inc(upstream=self.upstream)
+            raise CircuitOpenError(self.upstream, self.reset_timeout)
+        self._probe_in_flight = True
+
+    def release_probe(self):
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self._probe_in_flight = False
+        self.failures = 0
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit breaker for upstream '{self.upstream}' closed")
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit breaker for upstream '{self.upstream}' opened after {self.failures} failure(s)")
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+
+class LatencyTracker:
+    """滑动窗口内最近请求的延迟，用于估算分位数"""
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.samples: deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, pct: float) -> float | None:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class HedgePolicy:
+    """
+    请求对冲策略：请求在观测到的 p{percentile} 延迟内未返回时发送一个重复请求。
+    对冲次数由令牌桶限制为请求数的 `max_ratio` 比例，上游整体变慢时不会把流量翻倍。
+    """
+
+    def __init__(self, upstream: str, percentile: float, max_ratio: float, min_delay: float):
+        self.upstream = upstream
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.latency = LatencyTracker()
+        self.budget = RetryBudget(ratio=max_ratio, min_per_second=0.0, max_tokens=5.0)
+        HEDGE_DELAY.set_function(lambda: self.hedge_delay() or 0.0, upstream=upstream)
+
+    def hedge_delay(self) -> float | None:
+        observed = self.latency.percentile(self.percentile)
+        if observed is None:
+            return None
+        return max(self.min_delay, observed)
+
+    def stats(self) -> dict:
+        requests = HEDGE_REQUESTS.value(upstream=self.upstream)
+        hedges = HEDGES.value(upstream=self.upstream)
+        return {
+            "requests": requests,
+            "hedges": hedges,
+            "hedge_wins": HEDGE_WINS.value(upstream=self.upstream),
+            "hedge_rate": hedges / requests if requests else 0.0,
+            "hedge_delay": self.hedge_delay(),
+        }
+
+
+async def hedged(call: Callable[[], Awaitable[T]], policy: HedgePolicy, slot: Bulkhead | None = None) -> T:
+    """
+    执行 `call`，如果在对冲延迟内没有返回且预算允许，再并发执行一次 `call`，
+    返回先成功的结果并取消另一个。两次都失败时抛出原请求的异常。
+    `call` 应当是单次尝试（不含重试），否则一次对冲会复制整个重试过程。
+    传入 `slot` 时对冲请求需要在其中占用自己的舱位，没有空位时不发送对冲。
+    """
+    HEDGE_REQUESTS.inc(upstream=policy.upstream)
+    policy.budget.record_request()
+    delay = policy.hedge_delay()
+    started = time.perf_counter()
+
+    async def hedge_call() -> T:
+        if slot is None:
+            return await call()
+        async with slot.acquire(wait=False):
+            return await call()
+
+    primary = asyncio.ensure_future(call())
+    tasks = {primary}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and (slot is None or slot.has_capacity()):
+                if policy.budget.try_spend():
+                    HEDGES.inc(upstream=policy.upstream)
+                    tasks.add(asyncio.ensure_future(hedge_call()))
+
+        error: BaseException | None = None
+        pending = tasks
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    policy.latency.record(time.perf_counter() - started)
+                    if task is not primary:
+                        HEDGE_WINS.inc(upstream=policy.upstream)
+                    return task.result()
+                if task is primary or error is None:
+                    error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # 标记已读取，避免 "exception was never retrieved" 警告
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """响应体流关闭时回调一次（流式响应的请求到读完响应体才算结束）"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._on_close is not None:
+                on_close, self._on_close = self._on_close, None
+                on_close()
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    在传输层记录在途请求数、连接池利用率、连接等待与请求耗时（到响应体关闭为止），
+    因此直接使用底层 httpx 客户端的 SDK（如 OpenAI）也会被计入。
+    `use_breaker` 时同时经过熔断器：这类调用不走 execute，熔断只能在传输层执行。
+    """
+
+    def __init__(self, owner: "AsyncHttpClient", transport: httpx.AsyncBaseTransport, use_breaker: bool):
+        self._owner = owner
+        self._transport = transport
+        self._use_breaker = use_breaker
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        owner = self._owner
+        breaker = owner.breaker if self._use_breaker else None
+        if breaker:
+            breaker.before_request()
+        started = time.perf_counter()
+        request.extensions.setdefault("trace", owner._pool_wait_tracer(started))
+
+        owner._request_started()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError:
+            owner._request_finished(started)
+            if breaker:
+                breaker.record_failure()
+            raise
+        except BaseException:
+            owner._request_finished(started)
+            if breaker:
+                breaker.release_probe()
+            raise
+
+        if breaker:
+            # 与 execute 相同：只有可重试的 5xx 计为失败
+            if response.status_code in RETRYABLE_STATUS_CODES and response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        response.stream = _TrackedStream(response.stream, lambda: owner._request_finished(started))
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+# 全局重试预算，所有上游共享
+retry_budget = RetryBudget(
+    ratio=settings.HTTP_RETRY_BUDGET_RATIO,
+    min_per_second=settings.HTTP_RETRY_BUDGET_MIN_PER_SECOND,
+)
+
 
 class AsyncHttpClient:
     """
     A wrapper around httpx.AsyncClient to be used as a dependency.
-    This allows us to manage the client's lifecycle properly.
+    Each upstream gets its own tuned connection pool so that one slow
+    upstream cannot exhaust connections needed by the others.
     """
-    def __init__(self):
-        self._client = httpx.AsyncClient()
+    def __init__(
+        self,
+        name: str = "default",
+        base_url: str | None = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        write_timeout: float = 30.0,
+        pool_timeout: float = 5.0,
+        transport_breaker: bool = False,
+    ):
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning(f"HTTP/2 requested for upstream '{name}' but 'h2' is not installed "
+                           "(pip install 'httpx[http2]'); using HTTP/1.1")
+            http2 = False
+
+        self.name = name
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.in_flight = 0
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+        )
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+        )
+        self._client = httpx.AsyncClient(
+            transport=_InstrumentedTransport(self, transport, use_breaker=transport_breaker),
+            timeout=httpx.Timeout(
+                connect=connect_timeout,
+                read=read_timeout,
+                write=write_timeout,
+                pool=pool_timeout,
+            ),
+        )
+        POOL_UTILIZATION.set_function(lambda: self.in_flight / self.max_connections, upstream=name)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        底层 httpx 客户端（供 OpenAI SDK 等需要原生客户端的库使用）。
+        请求指标在传输层记录；以 transport_breaker 创建时也经过熔断器。
+        """
+        return self._client
+
+    def _request_started(self):
+        self.in_flight += 1
+        IN_FLIGHT.inc(upstream=self.name)
+
+    def _request_finished(self, started: float):
+        self.in_flight -= 1
+        IN_FLIGHT.dec(upstream=self.name)
+        REQUEST_DURATION.observe(time.perf_counter() - started, upstream=self.name)
+
+    def _pool_wait_tracer(self, started: float):
+        """返回一个 httpcore trace 回调，记录从发起请求到拿到连接的等待时间"""
+        recorded = False
+
+        async def trace(event_name: str, info: dict):
+            nonlocal recorded
+            if not recorded and event_name in _CONNECTION_ACQUIRED_EVENTS:
+                recorded = True
+                POOL_WAIT.observe(time.perf_counter() - started, upstream=self.name)
+
+        return trace
+
+    async def request_once(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """发送单次请求（不经过重试；熔断由 execute 负责）"""
+        return await self._client.request(method, url, **kwargs)
+
+    async def execute(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        retries: int | None = None,
+    ) -> httpx.Response:
+        """
+        通过熔断器执行请求，对连接错误/超时和 429/502/503/504 按抖动指数退避重试。
+        `send` 每次尝试都会被重新调用，需要每次签名的请求（nonce/时间戳）可以在其中重新生成。
+        重试受全局重试预算限制；熔断打开时立即抛出 CircuitOpenError。
+        """
+        retries = settings.HTTP_MAX_RETRIES if retries is None else retries
+        retry_budget.record_request()
+        attempt = 0
+        while True:
+            self.breaker.before_request()
+            response = None
+            error = None
+            try:
+                response = await send()
+            except httpx.TransportError as e:
+                error = e
+                self.breaker.record_failure()
+            except BaseException:
+                # 调用方取消等非上游错误：释放半开探测名额，不计入熔断统计
+                self.breaker.release_probe()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self.breaker.record_success()
+                    return response
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+
+            if attempt >= retries:
+                break
+            if not retry_budget.try_spend():
+                RETRY_BUDGET_EXHAUSTED.inc(upstream=self.name)
+                break
+
+            delay = backoff_delay(attempt)
+            attempt += 1
+            RETRIES.inc(upstream=self.name)
+            logger.warning(f"Retrying upstream '{self.name}' (attempt {attempt}/{retries}) in {delay:.3f}s: "
+                           f"{error or response.status_code}")
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(delay)
+
+        if response is not None:
+            return response
+        raise error
+
+    async def request(self, method: str, url: str, retries: int | None = None, **kwargs) -> httpx.Response:
+        """带熔断的请求；默认只对幂等方法重试"""
+        if retries is None and method.upper() not in IDEMPOTENT_METHODS:
+            retries = 0
+        return await self.execute(lambda: self.request_once(method, url, **kwargs), retries=retries)
 
     async def get(self, *args, **kwargs):
-        return await self._client.get(*args, **kwargs)
+        return await self.request("GET", *args, **kwargs)
 
     async def post(self, *args, **kwargs):
-        return await self._client.post(*args, **kwargs)
+        return await self.request("POST", *args, **kwargs)
+
+    async def warm_up(self, connections: int = 1):
+        """
+        预热连接池：并发发送 HEAD 请求建立 TCP/TLS（以及 HTTP/2）连接，
+        请求返回后连接保留在 keep-alive 池中。失败只记录日志。
+        """
+        if not self.base_url:
+            return
+        connections = max(1, min(connections, self.max_keepalive_connections))
+        results = await asyncio.gather(
+            *(self._client.head(self.base_url, timeout=5.0) for _ in range(connections)),
+            return_exceptions=True,
+        )
+        failures = [r for r in results if isinstance(r, Exception)]
+        if failures:
+            logger.warning(f"Pre-warming upstream '{self.name}' failed for {len(failures)}/{connections} connections: {failures[0]}")
+        else:
+            logger.info(f"Pre-warmed {connections} connection(s) for upstream '{self.name}'")
 
     async def close(self):
         await self._client.aclose()
 
-# This context manager will be used in the main application's lifespan
-@asynccontextmanager
-async def lifespan_http_client(app):
-    """
-    A lifespan context manager for the HTTP client.
-    It creates the client on startup and closes it on shutdown.
-    """
-    client = AsyncHttpClient()
-    yield {"http_client": client}
-    await client.close()
 
-# A simple dependency to get the client instance
-# This is a placeholder and will be replaced by a more robust solution
-# in the main.py file using the lifespan event handler.
-_http_client_instance = None
+def _upstream_settings(name: str) -> dict:
+    """从 Settings 读取各上游的连接池配置"""
+    common = {
+        "max_keepalive_connections": settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        "keepalive_expiry": settings.HTTP_KEEPALIVE_EXPIRY,
+        "http2": settings.HTTP2_ENABLED,
+        "connect_timeout": settings.HTTP_CONNECT_TIMEOUT,
+        "read_timeout": settings.HTTP_TIMEOUT,
+        "write_timeout": settings.HTTP_TIMEOUT,
+        "pool_timeout": settings.HTTP_POOL_TIMEOUT,
+    }
+    if name == UPSTREAM_MULTIMODAL:
+        return {
+            **common,
+            "base_url": settings.MULTIMODAL_BASE_URL,
+            "max_connections": settings.MULTIMODAL_MAX_CONNECTIONS,
+            "read_timeout": settings.MULTIMODAL_TIMEOUT,
+            "write_timeout": settings.MULTIMODAL_TIMEOUT,
+        }
+    if name == UPSTREAM_PET_INFO:
+        return {**common, "base_url": settings.PET_INFO_BASE_URL, "max_connections": settings.PET_INFO_MAX_CONNECTIONS}
+    if name == UPSTREAM_LLM:
+        # LLM 经由 OpenAI SDK 直接使用底层客户端，不走 execute，熔断放在传输层
+        return {
+            **common,
+            "base_url": settings.OPENAI_BASE_URL,
+            "max_connections": settings.LLM_MAX_CONNECTIONS,
+            "transport_breaker": True,
+        }
+    return {**common, "max_connections": settings.HTTP_MAX_CONNECTIONS}
+
+
+class HttpClientRegistry:
+    """每个上游一个连接池的客户端注册表，由应用 lifespan 统一创建、预热和关闭"""
+
+    UPSTREAMS = (UPSTREAM_MULTIMODAL, UPSTREAM_PET_INFO, UPSTREAM_LLM)
+
+    def __init__(self):
+        self._clients: dict[str, AsyncHttpClient] = {}
+
+    def get(self, name: str) -> AsyncHttpClient:
+        """获取上游客户端，未创建时按配置惰性创建"""
+        client = self._clients.get(name)
+        if client is None:
+            client = self._clients[name] = AsyncHttpClient(name=name, **_upstream_settings(name))
+        return client
+
+    async def start(self):
+        """创建所有上游连接池，并按配置预热"""
+        for name in self.UPSTREAMS:
+            self.get(name)
+        if settings.HTTP_PREWARM_CONNECTIONS > 0:
+            await asyncio.gather(
+                *(client.warm_up(settings.HTTP_PREWARM_CONNECTIONS) for client in self._clients.values())
+            )
+
+    def stats(self) -> dict[str, dict]:
+        """连接池使用情况"""
+        return {
+            name: {
+                "in_flight": client.in_flight,
+                "max_connections": client.max_connections,
+                "utilization": client.in_flight / client.max_connections,
+                "pool_wait_count": POOL_WAIT.count(upstream=name),
+                "pool_wait_seconds_total": POOL_WAIT.sum(upstream=name),
+                "circuit_state": client.breaker.state,
+            }
+            for name, client in self._clients.items()
+        }
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+
+
+# 全局客户端注册表
+http_clients = HttpClientRegistry()
+
 
-def get_http_client_instance():
-    global _http_client_instance
-    if _http_client_instance is None:
-        _http_client_instance = AsyncHttpClient()
-    return _http_client_instance
+def http_client_dependency(name: str):
+    """生成 FastAPI 依赖：获取指定上游的共享客户端"""
+    def _get_http_client() -> AsyncHttpClient:
+        return http_clients.get(name)
+    return _get_http_client
@@ -0,0 +1,102 @@
+"""
+JSON 序列化层：安装了 orjson 时走 orjson 快速路径，否则退回标准库 json。
+所有输出均为 UTF-8 bytes（dumps_str 返回 str），日期、ObjectId、枚举、pydantic 模型等类型统一处理。
+"""
+import json
+from collections.abc import Callable
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+from uuid import UUID
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类
+JSONDecodeError = json.JSONDecodeError
+
+
+def _default(value: Any):
+    """orjson/json 原生不支持的类型"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if type(value).__name__ == "ObjectId":
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any, *, indent: bool = False, sort_keys: bool = False,
+          default: Callable[[Any], Any] | None = None) -> bytes:
+    """序列化为 UTF-8 JSON bytes（非 ASCII 字符不转义）；default 可覆盖特殊类型的处理"""
+    default = default or _default
+    if orjson is not None:
+        option = 0
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(value, default=default, option=option)
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        default=default,
+        indent=2 if indent else None,
+        sort_keys=sort_keys,
+        separators=None if indent else (",", ":"),
+    ).encode("utf-8")
+
+
+def dumps_str(value: Any, *, indent: bool = False, sort_keys: bool = False) -> str:
+    """序列化为 JSON 字符串（用于拼接提示词、SSE 等文本场景）"""
+    return dumps(value, indent=indent, sort_keys=sort_keys).decode("utf-8")
+
+
+def loads(data: bytes | bytearray | memoryview | str) -> Any:
+    """反序列化 JSON（接受 bytes 或 str，无需先 decode）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _canonical_safe(value: Any) -> bool:
+    """
+    判断 orjson 输出是否与标准库的规范化输出逐字节一致：
+    只包含可打印 ASCII 字符串、整数、布尔和 None（浮点数格式和转义规则两者不同）。
+    """
+    if value is None or isinstance(value, bool):
+        return True
+    if isinstance(value, str):
+        return value.isascii() and value.isprintable()
+    if isinstance(value, int):
+        return -(2 ** 63) <= value < 2 ** 64
+    if isinstance(value, dict):
+        return all(isinstance(k, str) and _canonical_safe(k) and _canonical_safe(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return all(_canonical_safe(item) for item in value)
+    return False
+
+
+def dumps_canonical(value: Any) -> bytes:
+    """
+    紧凑、按键排序、纯 ASCII 的 JSON，与
+    json.dumps(value, separators=(',', ':'), sort_keys=True) 逐字节一致（用于请求签名）。
+    """
+    if orjson is not None and _canonical_safe(value):
+        try:
+            return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(value, separators=(',', ':'), sort_keys=True).encode('utf-8')
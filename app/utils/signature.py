@@ -5,35 +5,62 @@ import hashlib
 import time
 import random
 import string
-import json
+
+from app.utils.serialization import dumps_canonical
+
+
+def _generate_nonce() -> str:
+    return ''.join(random.choices(string.ascii_letters + string.digits, k=8))
+
+
+def serialize_body(body: dict) -> bytes:
+    """
+    Serializes the body once into the exact bytes that are signed and sent.
+    Compact, sorted, ASCII-only JSON, byte-identical to
+    json.dumps(body, separators=(',', ':'), sort_keys=True) (orjson fast path when safe).
+    """
+    return dumps_canonical(body)
+
+
+class SignedPayload:
+    """
+    A request body serialized once, with the HMAC state over path + body computed once.
+    Each call to headers() copies that state and only feeds nonce + timestamp, so retries
+    and hedged attempts neither re-serialize nor re-hash a multi-megabyte image body.
+    The signature equals HMAC-SHA256(secret, f"{path}{body}{nonce}{timestamp}").
+    """
+
+    def __init__(self, api_key: str, api_secret: str, path: str, body: dict):
+        self.api_key = api_key
+        self.path = path
+        self.content = serialize_body(body)
+        self._mac = hmac.new(api_secret.encode('utf-8'), digestmod=hashlib.sha256)
+        self._mac.update(path.encode('utf-8'))
+        self._mac.update(self.content)
+
+    def headers(self, nonce: str | None = None, timestamp: str | None = None) -> dict:
+        """Signs the payload with a fresh nonce and timestamp and returns the request headers."""
+        nonce = nonce or _generate_nonce()
+        timestamp = timestamp or str(int(time.time()))
+
+        mac = self._mac.copy()
+        mac.update(nonce.encode('utf-8'))
+        mac.update(timestamp.encode('utf-8'))
+        signature = base64.b64encode(mac.digest()).decode('utf-8')
+
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "X-OPENAPI-NONCE": nonce,
+            "X-OPENAPI-TIMESTAMP": timestamp,
+            "X-OPENAPI-SIGN": signature,
+            "Content-Type": "application/json"
+        }
+
 
 def generate_signature(api_key: str, api_secret: str, path: str, body: dict) -> tuple[dict, str]:
     """
     Generates the required signature and headers for the multimodal API.
+    Kept for compatibility; new callers should use SignedPayload and send payload.content as-is.
     """
-    nonce = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-    timestamp = str(int(time.time()))
-    
-    # The body must be a string for the signature.
-    # Ensure compact, sorted JSON for consistency.
-    body_str = json.dumps(body, separators=(',', ':'), sort_keys=True)
-
-    data_to_sign = f"{path}{body_str}{nonce}{timestamp}".encode('utf-8')
-    
-    signature_digest = hmac.new(
-        api_secret.encode('utf-8'),
-        data_to_sign,
-        hashlib.sha256
-    ).digest()
-    
-    signature = base64.b64encode(signature_digest).decode('utf-8')
-
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "X-OPENAPI-NONCE": nonce,
-        "X-OPENAPI-TIMESTAMP": timestamp,
-        "X-OPENAPI-SIGN": signature,
-        "Content-Type": "application/json"
-    }
-    
-    return headers, body_str
+    payload = SignedPayload(api_key, api_secret, path, body)
+    return payload.headers(), payload.content.decode('utf-8')
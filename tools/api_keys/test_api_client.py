@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 """
 API 客户端测试工具
-用于测试生成的 API Key
+用于测试生成的 API Key；--load 模式下以 N 个并发虚拟用户压测，统计 TTFT、tokens/s 和延迟分布
 """
+import argparse
+import asyncio
+import math
+import httpx
 import requests
 import json
 import time
-from typing import dict, Any
+from collections import Counter
+from typing import Any
 import os
 
 class APIClient:
@@ -228,6 +233,190 @@ class APIClient:
 
         print("🎉 测试完成")
 
+# 延迟直方图的桶上限（毫秒）
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, math.inf)
+
+RAMP_CONSTANT = "constant"
+RAMP_LINEAR = "linear"
+RAMP_STEP = "step"
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """最近秩法百分位"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+class LoadTester:
+    """
+    异步并发压测：每个虚拟用户循环发送请求直到测试结束。
+    流式响应（text/event-stream）逐行读取，兼容 OpenAI 格式（choices[0].delta.content）
+    和 /chat/text 的 text_chunk，记录首 token 时间（TTFT）和生成速度。
+    """
+
+    def __init__(self, base_url: str, endpoint: str, api_key: str = None, token: str = None,
+                 users: int = 10, duration: float = 60.0, ramp: str = RAMP_CONSTANT,
+                 ramp_up: float = 0.0, steps: int = 5, think_time: float = 0.0,
+                 stream: bool = True, timeout: float = 120.0):
+        self.base_url = base_url.rstrip('/')
+        self.endpoint = endpoint
+        self.credential = api_key if endpoint == "completions" else token
+        self.users = users
+        self.duration = duration
+        self.ramp = ramp
+        self.ramp_up = ramp_up
+        self.steps = max(1, steps)
+        self.think_time = think_time
+        self.stream = stream
+        self.timeout = timeout
+        self.samples: list[dict] = []
+        self.active_users = 0
+        self.peak_users = 0
+
+    def _start_delay(self, user: int) -> float:
+        """按爬坡方式计算第 user 个虚拟用户的启动延迟"""
+        if self.ramp == RAMP_LINEAR:
+            return self.ramp_up * user / self.users
+        if self.ramp == RAMP_STEP:
+            per_step = math.ceil(self.users / self.steps)
+            return self.ramp_up / self.steps * (user // per_step)
+        return 0.0
+
+    def _request_args(self, user: int, iteration: int) -> tuple[str, dict]:
+        if self.endpoint == "completions":
+            return "/api/v1/chat/completions", {
+                "model": "gpt-3.5-turbo",
+                "messages": [{"role": "user", "content": "我的狗狗最近食欲不振，可能是什么原因？"}],
+                "stream": self.stream,
+            }
+        return "/api/v1/chat/text", {
+            "user_id": f"load_user_{user}",
+            "conversation_id": f"load_{int(self._started)}_{user}",
+            "pet_id": "PET_1234567",
+            "question": f"第{iteration}次咨询：狗狗最近食欲不振，可能是什么原因？",
+        }
+
+    @staticmethod
+    def _token_text(payload: dict) -> str:
+        if "text_chunk" in payload:
+            return payload["text_chunk"]
+        choices = payload.get("choices") or [{}]
+        return (choices[0].get("delta") or {}).get("content") or ""
+
+    async def _consume_stream(self, response: httpx.Response, sample: dict, started: float):
+        last_token_at = None
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                payload = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            if not self._token_text(payload):
+                continue
+            now = time.perf_counter()
+            if last_token_at is None:
+                sample["ttft"] = now - started
+            last_token_at = now
+            sample["tokens"] += 1
+        if sample["tokens"] > 1 and last_token_at is not None:
+            generation_time = last_token_at - started - sample["ttft"]
+            if generation_time > 0:
+                sample["tokens_per_second"] = (sample["tokens"] - 1) / generation_time
+
+    async def _request(self, client: httpx.AsyncClient, user: int, iteration: int) -> dict:
+        path, payload = self._request_args(user, iteration)
+        sample = {"status": None, "latency": None, "ttft": None, "tokens": 0, "tokens_per_second": None}
+        started = time.perf_counter()
+        try:
+            async with client.stream("POST", f"{self.base_url}{path}", json=payload) as response:
+                sample["status"] = response.status_code
+                if response.status_code == 200 and response.headers.get("content-type", "").startswith("text/event-stream"):
+                    await self._consume_stream(response, sample, started)
+                else:
+                    await response.aread()
+        except httpx.HTTPError as e:
+            sample["status"] = type(e).__name__
+        sample["latency"] = time.perf_counter() - started
+        return sample
+
+    async def _virtual_user(self, client: httpx.AsyncClient, user: int):
+        await asyncio.sleep(self._start_delay(user))
+        self.active_users += 1
+        self.peak_users = max(self.peak_users, self.active_users)
+        iteration = 0
+        try:
+            while time.perf_counter() < self._deadline:
+                iteration += 1
+                sample = await self._request(client, user, iteration)
+                sample["active_users"] = self.active_users
+                self.samples.append(sample)
+                if self.think_time:
+                    await asyncio.sleep(self.think_time)
+        finally:
+            self.active_users -= 1
+
+    async def run(self) -> dict:
+        headers = {"Authorization": f"Bearer {self.credential}"} if self.credential else {}
+        limits = httpx.Limits(max_connections=self.users, max_keepalive_connections=self.users)
+        print(f"🚀 压测 {self.endpoint}: {self.users} 个虚拟用户, {self.duration:.0f}s, 爬坡 {self.ramp} ({self.ramp_up:.0f}s)")
+
+        self._started = time.time()
+        self._deadline = time.perf_counter() + self.duration
+        async with httpx.AsyncClient(headers=headers, timeout=self.timeout, limits=limits) as client:
+            await asyncio.gather(*(self._virtual_user(client, user) for user in range(self.users)))
+        return self.report(time.time() - self._started)
+
+    def report(self, elapsed: float) -> dict:
+        ok = [s for s in self.samples if s["status"] == 200]
+        latencies = [s["latency"] * 1000 for s in ok]
+        ttfts = [s["ttft"] * 1000 for s in ok if s["ttft"] is not None]
+        rates = [s["tokens_per_second"] for s in ok if s["tokens_per_second"] is not None]
+
+        def summary(values: list[float]) -> dict:
+            return {f"p{pct}": round(percentile(values, pct), 2) if values else None for pct in (50, 90, 95, 99)}
+
+        histogram = Counter(
+            next(bound for bound in LATENCY_BUCKETS_MS if latency <= bound) for latency in latencies
+        )
+        return {
+            "endpoint": self.endpoint,
+            "users": self.users,
+            "peak_users": self.peak_users,
+            "ramp": self.ramp,
+            "elapsed_s": round(elapsed, 2),
+            "requests": len(self.samples),
+            "succeeded": len(ok),
+            "status_codes": dict(Counter(str(s["status"]) for s in self.samples)),
+            "rps": round(len(ok) / elapsed, 2) if elapsed else None,
+            "latency_ms": summary(latencies),
+            "ttft_ms": summary(ttfts),
+            "tokens_per_second": summary(rates),
+            "latency_histogram_ms": {
+                ("+Inf" if bound == math.inf else f"<={bound}"): histogram.get(bound, 0) for bound in LATENCY_BUCKETS_MS
+            },
+        }
+
+
+def print_load_report(report: dict):
+    print("\n📊 压测结果")
+    print("=" * 50)
+    print(f"  请求: {report['succeeded']}/{report['requests']} 成功, RPS: {report['rps']}, 状态码: {report['status_codes']}")
+    print(f"  延迟(ms): {report['latency_ms']}")
+    print(f"  TTFT(ms): {report['ttft_ms']}")
+    print(f"  tokens/s: {report['tokens_per_second']}")
+    print("\n  延迟直方图:")
+    histogram = report["latency_histogram_ms"]
+    peak = max(histogram.values()) or 1
+    for bucket, count in histogram.items():
+        print(f"  {bucket:>9} | {'█' * round(count / peak * 40):<40} {count}")
+
+
 def load_api_key_from_file() -> str:
     """从文件加载API Key"""
     try:
@@ -239,17 +428,74 @@ def load_api_key_from_file() -> str:
         pass
     return None
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="API 客户端测试工具（不带参数时进入交互式综合测试）")
+    parser.add_argument("--base-url", default=None, help="API基础URL (默认: http://localhost:8000)")
+    parser.add_argument("--api-key", default=None, help="API Key（completions 端点使用）")
+    parser.add_argument("--load", action="store_true", help="异步并发压测模式")
+    parser.add_argument("--endpoint", choices=["completions", "text"], default="completions",
+                        help="压测端点：completions 使用 API Key，text 使用 --token 的 JWT")
+    parser.add_argument("--token", default=None, help="JWT访问令牌（text 端点使用）")
+    parser.add_argument("--users", type=int, default=10, help="并发虚拟用户数")
+    parser.add_argument("--duration", type=float, default=60.0, help="压测时长（秒）")
+    parser.add_argument("--ramp", choices=[RAMP_CONSTANT, RAMP_LINEAR, RAMP_STEP], default=RAMP_CONSTANT,
+                        help="爬坡方式：同时启动 / 线性增加 / 分阶梯增加")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="爬坡时长（秒）")
+    parser.add_argument("--steps", type=int, default=5, help="step 爬坡的阶梯数")
+    parser.add_argument("--think-time", type=float, default=0.0, help="每个虚拟用户两次请求之间的间隔（秒）")
+    parser.add_argument("--no-stream", action="store_true", help="completions 不请求流式响应")
+    parser.add_argument("--output", default=None, help="将压测结果写入JSON文件")
+    return parser.parse_args()
+
+
+def run_load_test(args):
+    api_key = args.api_key or load_api_key_from_file()
+    if args.endpoint == "completions" and not api_key:
+        print("❌ completions 压测需要 API Key (--api-key 或 tools/generated_api_key.txt)")
+        return
+    if args.endpoint == "text" and not args.token:
+        print("❌ text 压测需要 JWT 访问令牌 (--token)")
+        return
+
+    tester = LoadTester(
+        base_url=args.base_url or "http://localhost:8000",
+        endpoint=args.endpoint,
+        api_key=api_key,
+        token=args.token,
+        users=args.users,
+        duration=args.duration,
+        ramp=args.ramp,
+        ramp_up=args.ramp_up,
+        steps=args.steps,
+        think_time=args.think_time,
+        stream=not args.no_stream,
+    )
+    report = asyncio.run(tester.run())
+    print_load_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入: {args.output}")
+
+
 def main():
     """主函数"""
+    args = parse_args()
+    if args.load:
+        run_load_test(args)
+        return
+
     print("🧪 API 客户端测试工具")
     print("=" * 50)
 
     # 配置
-    base_url = input("请输入API基础URL (默认: http://localhost:8000): ").strip() or "http://localhost:8000"
+    base_url = args.base_url or input("请输入API基础URL (默认: http://localhost:8000): ").strip() or "http://localhost:8000"
 
     # 尝试从文件加载API Key
     saved_api_key = load_api_key_from_file()
-    if saved_api_key:
+    if args.api_key:
+        api_key = args.api_key
+    elif saved_api_key:
         print(f"发现保存的API Key: {saved_api_key[:20]}...")
         use_saved = input("使用保存的API Key? (y/n, 默认: y): ").strip().lower()
         if use_saved != 'n':
@@ -262,7 +508,7 @@ def main():
     # 创建客户端
     client = APIClient(base_url=base_url, api_key=api_key)
 
-    print(f"\n配置:")
+    print("\n配置:")
     print(f"  基础URL: {base_url}")
     print(f"  API Key: {'已设置' if api_key else '未设置'}")
     print()
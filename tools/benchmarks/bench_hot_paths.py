@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+纯 Python 热点路径微基准测试
+用 timeit 对请求处理中的纯 CPU 路径逐项计时（每项取多轮中最快一轮，并给出中位数用于判断波动），
+结果写入 JSON，便于跨提交跟踪：
+- ChatService._build_prompt（不同历史长度）
+- SSE 数据块编码（StreamChunk → "data: ...\\n\\n"）
+- generate_signature（10KB ~ 8MB 请求体）
+- MultiModalService._get_breed_id（命中 / 未命中）
+- APIKeyAuth.hash_api_key 与 APIKey 还原
+- PasswordValidator.validate
+- RedisService.set_json / get_json（使用内存后端，只测量序列化开销）
+不连接任何外部服务。日志输出被关闭，以免 I/O 影响结果。
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from loguru import logger
+
+from app.core.api_key_auth import APIKeyAuth
+from app.models.api_key import APIKey
+from app.models.chat import StreamChunk
+from app.models.pet import PetInfo
+from app.services.chat_service import ChatService
+from app.services.external.multimodal_service import MultiModalService
+from app.services.storage.redis_service import RedisService
+from app.utils.password_validator import PasswordValidator
+from app.utils.signature import generate_signature
+from bench_model_hydration import sample_api_key
+
+QUESTION = "狗狗最近食欲不振，精神也不太好，偶尔会呕吐黄色泡沫，需要注意什么？"
+
+
+class _MemoryRedis:
+    """RedisService 使用的最小 get/set 接口，数据保存在字典中"""
+
+    def __init__(self):
+        self._data: dict[str, bytes] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self._data.get(key)
+
+    async def set(self, key: str, value, ex: int | None = None, nx: bool = False) -> bool:
+        self._data[key] = value if isinstance(value, bytes) else value.encode("utf-8")
+        return True
+
+
+def sample_pet_info() -> PetInfo:
+    return PetInfo(
+        pet_id="PET_1234567",
+        name="Buddy",
+        species="canine",
+        breed="金毛寻回犬",
+        age=5,
+        weight=28.5,
+        vaccination_records=[{"vaccine": "Rabies", "date": "2023-01-15"}],
+        medical_history=[{"date": "2022-08-10", "diagnosis": "Ear infection"}],
+    )
+
+
+def sample_history(count: int) -> list[dict]:
+    base = datetime.now(timezone.utc)
+    return [
+        {
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": QUESTION * 4,
+            "timestamp": base + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+def sample_session(turns: int) -> dict:
+    """与会话缓存结构类似的 JSON 数据"""
+    return {
+        "user_id": "6650f0c2a1b2c3d4e5f60001",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "messages": [{"role": "user", "content": QUESTION, "index": i} for i in range(turns)],
+        "metadata": {"client": "ios", "version": "2.3.1", "locale": "zh-CN"},
+    }
+
+
+def _per_call(timings: list[float], number: int) -> dict:
+    """单次调用耗时（微秒）：最快一轮与各轮中位数"""
+    per_call = [t / number * 1_000_000 for t in timings]
+    return {"best_us": round(min(per_call), 3), "median_us": round(statistics.median(per_call), 3)}
+
+
+def bench(func, number: int, repeat: int) -> dict:
+    return _per_call(timeit.repeat(func, number=number, repeat=repeat), number)
+
+
+def bench_async(factory, number: int, repeat: int, loop: asyncio.AbstractEventLoop) -> dict:
+    """在一次 run_until_complete 中连续执行 number 次协程，避免把事件循环调度开销计入单次调用"""
+    async def run_batch():
+        for _ in range(number):
+            await factory()
+
+    return _per_call(timeit.repeat(lambda: loop.run_until_complete(run_batch()), number=1, repeat=repeat), number)
+
+
+def scaled(number: int, size: int) -> int:
+    """按输入大小缩减调用次数，使每轮耗时大致相同"""
+    return max(3, number * 10_000 // max(size, 10_000))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="纯 Python 热点路径微基准测试")
+    parser.add_argument("--number", type=int, default=2_000, help="每轮调用次数（大输入按比例缩减）")
+    parser.add_argument("--repeat", type=int, default=7, help="轮数")
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[0, 10, 50])
+    parser.add_argument("--signature-kb", type=int, nargs="+", default=[10, 100, 1024, 8192])
+    parser.add_argument("--output", default=None, help="将结果写入JSON文件")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logger.remove()
+    number, repeat = args.number, args.repeat
+    report: dict[str, dict] = {}
+
+    # ChatService._build_prompt 不依赖实例状态，跳过依赖注入的构造函数
+    chat_service = ChatService.__new__(ChatService)
+    pet_info = sample_pet_info()
+    rag = chat_service._rag_retrieval(QUESTION)
+    for size in args.history_sizes:
+        history = sample_history(size)
+        report[f"build_prompt[history={size}]"] = bench(
+            lambda: chat_service._build_prompt(QUESTION, pet_info, history, rag), number, repeat
+        )
+
+    def encode_sse_chunk() -> str:
+        """与 ChatService 流式输出的每个数据块相同"""
+        chunk = StreamChunk(
+            conversation_id="conv-3f2a9c",
+            text_chunk="建议",
+            is_final=False,
+            timestamp=datetime.now(timezone.utc).isoformat(),
+        )
+        return f"data: {chunk.model_dump_json()}\n\n"
+
+    report["sse_chunk_encode"] = bench(encode_sse_chunk, number * 10, repeat)
+
+    for kb in args.signature_kb:
+        image = base64.b64encode(os.urandom(kb * 1024 * 3 // 4)).decode()
+        body = {"image": image, "breed": 12, "birth": "2020-01-01", "gender": 1, "fertility": 2}
+        report[f"generate_signature[{kb}KB]"] = bench(
+            lambda: generate_signature("api-key", "api-secret", "/open/v1/skin-recognition", body),
+            scaled(number, kb * 1024), repeat
+        )
+
+    multimodal_service = MultiModalService()
+    known_breed = next(iter(multimodal_service.breed_map), "金毛寻回犬")
+    report["get_breed_id[hit]"] = bench(lambda: multimodal_service._get_breed_id(known_breed), number * 10, repeat)
+    report["get_breed_id[miss]"] = bench(lambda: multimodal_service._get_breed_id("未知品种"), number * 10, repeat)
+
+    raw_key = "sk-higo-" + "A1b2C3d4" * 6
+    api_key_json = sample_api_key().model_dump_json().encode("utf-8")
+    report["hash_api_key"] = bench(lambda: APIKeyAuth.hash_api_key(raw_key), number * 10, repeat)
+    report["api_key_hydrate"] = bench(lambda: APIKey.model_validate_json(api_key_json), number * 10, repeat)
+
+    report["password_validate[valid]"] = bench(lambda: PasswordValidator.validate("Str0ng#Passw0rd"), number * 10, repeat)
+    report["password_validate[weak]"] = bench(lambda: PasswordValidator.validate("abc"), number * 10, repeat)
+
+    redis_service = RedisService()
+    redis_service._redis = _MemoryRedis()
+    loop = asyncio.new_event_loop()
+    try:
+        for turns in (1, 20):
+            session = sample_session(turns)
+            key = f"session:{turns}"
+            report[f"redis_set_json[turns={turns}]"] = bench_async(
+                lambda: redis_service.set_json(key, session, ex=3600), number, repeat, loop
+            )
+            report[f"redis_get_json[turns={turns}]"] = bench_async(
+                lambda: redis_service.get_json(key), number, repeat, loop
+            )
+    finally:
+        loop.close()
+
+    print("📊 热点路径微基准测试 (单次调用耗时，微秒)")
+    print("=" * 50)
+    for name, result in report.items():
+        print(f"{name:<36} best {result['best_us']:>12.3f}   median {result['median_us']:>12.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"number": number, "repeat": repeat, "results": report}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+日志开销基准测试
+模拟一次图片咨询请求产生的全部日志调用，比较两种配置下每个请求的日志 CPU 开销：
+- legacy:     彩色文本格式、diagnose=True、所有日志 INFO 级别且用 f-string 立即拼接（含请求体/提示词切片）
+- production: JSON Lines、diagnose=False、热点日志降为 DEBUG 并延迟格式化、INFO 日志按比例采样
+输出写入 os.devnull，只测量格式化与过滤的开销，不包含磁盘 I/O。
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from loguru import logger
+
+from app.core.logging import COLOR_TEXT_FORMAT, SamplingFilter, _json_format
+
+REQUEST_ID = "6650f0c2a1b2c3d4e5f60001-1717000000000"
+CONVERSATION_ID = "conv-3f2a9c"
+URL = "https://multimodal.example.com/open/v1/skin-recognition"
+BODY = base64.b64encode(os.urandom(3 * 1024 * 1024))
+PROMPT = "你是一个专业的宠物医生。请根据以下信息，用中文回答用户的问题。" * 40
+QUERY = "狗狗皮肤发红并且一直在抓挠，需要怎么处理？"
+
+
+def legacy_request(images: int):
+    """旧代码中一次图片咨询的日志调用"""
+    logger.info(f"Request ID: {REQUEST_ID} - Starting image chat process for conversation: {CONVERSATION_ID}")
+    logger.info("Fetching mock pet info for pet_id: pet-001")
+    logger.info(f"Fetching history for conversation_id: {CONVERSATION_ID}")
+    logger.info(f"Request ID: {REQUEST_ID} - Analyzing {images} image(s) with type 'skin-recognition'")
+    for _ in range(images):
+        logger.info(f"Calling multimodal API: {URL} with body: {BODY[:100].decode()}...")
+        logger.info("Multimodal API call successful for path: /open/v1/skin-recognition")
+    logger.info(f"Request ID: {REQUEST_ID} - Image analysis complete ({images}/{images} succeeded).")
+    logger.info(f"Performing RAG retrieval for query: '{QUERY[:50]}...'")
+    logger.info(f"Built prompt: {PROMPT[:300]}...")
+    logger.info(f"Request ID: {REQUEST_ID} - Calling LLM for conversation: {CONVERSATION_ID}")
+    logger.info(f"Request ID: {REQUEST_ID} - Finished streaming response for conversation: {CONVERSATION_ID}")
+    logger.info(f"Request ID: {REQUEST_ID} - Saved conversation history for: {CONVERSATION_ID}")
+
+
+def production_request(images: int):
+    """当前代码中一次图片咨询的日志调用"""
+    logger.info("Request ID: {} - Starting image chat process for conversation: {}", REQUEST_ID, CONVERSATION_ID)
+    logger.debug("Fetching mock pet info for pet_id: {}", "pet-001")
+    logger.debug("Fetching history for conversation_id: {}", CONVERSATION_ID)
+    logger.info("Request ID: {} - Analyzing {} image(s) with type '{}'", REQUEST_ID, images, "skin-recognition")
+    for _ in range(images):
+        logger.opt(lazy=True).debug(
+            "Calling multimodal API: {} with body: {}...", lambda: URL, lambda: BODY[:100].decode()
+        )
+        logger.info("Multimodal API call successful for path: {}", "/open/v1/skin-recognition")
+    logger.info("Request ID: {} - Image analysis complete ({}/{} succeeded).", REQUEST_ID, images, images)
+    logger.opt(lazy=True).debug("Performing RAG retrieval for query: '{}...'", lambda: QUERY[:50])
+    logger.opt(lazy=True).debug("Built prompt: {}...", lambda: PROMPT[:300])
+    logger.debug("Request ID: {} - Calling LLM for conversation: {}", REQUEST_ID, CONVERSATION_ID)
+    logger.info("Request ID: {} - Finished streaming response for conversation: {}", REQUEST_ID, CONVERSATION_ID)
+    logger.debug("Request ID: {} - Saved conversation history for: {}", REQUEST_ID, CONVERSATION_ID)
+
+
+def configure(profile: str, sink, sample_rate: float):
+    logger.remove()
+    if profile == "legacy":
+        logger.add(sink, level="INFO", format=COLOR_TEXT_FORMAT, colorize=True, backtrace=True, diagnose=True)
+    else:
+        sampler = SamplingFilter({"__main__": sample_rate})
+        logger.add(sink, level="INFO", format=_json_format, filter=sampler,
+                   colorize=False, backtrace=False, diagnose=False)
+
+
+def measure(profile: str, requests: int, images: int, sample_rate: float) -> dict:
+    with open(os.devnull, "w", encoding="utf-8") as sink:
+        configure(profile, sink, sample_rate)
+        simulate = legacy_request if profile == "legacy" else production_request
+        simulate(images)  # 预热
+
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        for _ in range(requests):
+            simulate(images)
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        logger.remove()
+
+    return {
+        "profile": profile,
+        "requests": requests,
+        "us_per_request": round(elapsed / requests * 1_000_000, 2),
+        "cpu_us_per_request": round(cpu / requests * 1_000_000, 2),
+        "max_rps_on_logging_alone": round(requests / cpu) if cpu else None,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="日志开销基准测试（每个图片咨询请求）")
+    parser.add_argument("--requests", type=int, default=20_000, help="模拟请求数")
+    parser.add_argument("--images", type=int, default=3, help="每个请求的图片数")
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="production 配置下 INFO 日志的采样比例")
+    parser.add_argument("--output", default=None, help="将结果写入JSON文件")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = [
+        measure("legacy", args.requests, args.images, args.sample_rate),
+        measure("production", args.requests, args.images, args.sample_rate),
+    ]
+
+    print("📊 日志开销基准测试")
+    print("=" * 50)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+事件循环延迟基准测试
+模拟并发图片请求在发送前的 CPU 工作（base64 校验、请求体序列化、HMAC 签名），
+分别在事件循环上直接执行（inline）和通过 app.core.executors 卸载到线程池（offload）时，
+用一个 1ms 周期的探针协程测量事件循环延迟（实际唤醒时间 - 预期唤醒时间）。
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core import executors
+from app.core.config import settings
+from app.services.external.multimodal_service import _validate_image
+from app.utils.signature import SignedPayload
+
+PROBE_INTERVAL = 0.001
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """计算百分位数（毫秒）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+async def probe(lags: list[float], stop: asyncio.Event):
+    """周期性睡眠，记录超出预期的唤醒延迟"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def prepare_request(image_base64: str):
+    """与 MultiModalService.analyze_image 中发送前的处理相同"""
+    size = len(image_base64)
+    await executors.offload(_validate_image, image_base64, size=size)
+    body = {"image": image_base64, "breed": 12, "birth": "2021-05-01", "gender": 1, "fertility": 2}
+    payload = await executors.offload(
+        SignedPayload, api_key="bench-key", api_secret="bench-secret",
+        path="/open/v1/skin-recognition", body=body, size=size
+    )
+    payload.headers()
+
+
+async def run_scenario(images: list[str], concurrency: int, offload_enabled: bool) -> dict:
+    settings.CPU_OFFLOAD_ENABLED = offload_enabled
+    lags: list[float] = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(0.05)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(image: str):
+        async with semaphore:
+            await prepare_request(image)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(image) for image in images))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe_task
+    return {
+        "mode": "offload" if offload_enabled else "inline",
+        "requests": len(images),
+        "elapsed_s": round(elapsed, 3),
+        "loop_lag_p50_ms": round(percentile(lags, 50), 3),
+        "loop_lag_p99_ms": round(percentile(lags, 99), 3),
+        "loop_lag_max_ms": round(max(lags) * 1000 if lags else 0.0, 3),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="事件循环延迟基准测试（CPU 工作卸载前后对比）")
+    parser.add_argument("--image-mb", type=float, default=4, help="单张图片大小（MB，base64后）")
+    parser.add_argument("--requests", type=int, default=50, help="图片请求数")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发数")
+    parser.add_argument("--output", default=None, help="将结果写入JSON文件")
+    return parser.parse_args()
+
+
+async def main():
+    """主函数"""
+    args = parse_args()
+    raw = os.urandom(int(args.image_mb * 1024 * 1024) * 3 // 4)
+    image = base64.b64encode(raw).decode("ascii")
+    images = [image] * args.requests
+
+    print(f"📊 事件循环延迟基准测试 ({args.requests} 个请求, 每张 {args.image_mb} MB, 并发 {args.concurrency})")
+    print("=" * 50)
+    report = [
+        await run_scenario(images, args.concurrency, offload_enabled=False),
+        await run_scenario(images, args.concurrency, offload_enabled=True),
+    ]
+    executors.shutdown_executors()
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
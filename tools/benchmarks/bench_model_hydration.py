@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Redis 缓存模型还原基准测试
+对每个缓存模型比较两种从 Redis 原始 bytes 还原对象的方式：
+- legacy: bytes.decode('utf-8') → json.loads → dict → Model(**dict)
+- typed:  Model.model_validate_json(bytes) / TypeAdapter.validate_json(bytes)（RedisService.get_model 等使用）
+不连接 Redis，只测量 CPU 开销。
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from pydantic import TypeAdapter
+
+from app.models.api_key import APIKey
+from app.models.chat import ChatMessage
+from app.models.user import User
+
+
+def sample_api_key() -> APIKey:
+    now = datetime.now(timezone.utc)
+    return APIKey(
+        id="6650f0c2a1b2c3d4e5f60718",
+        key_id="sk-higo-AbCdEfGhIjKl...",
+        key_hash="9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+        user_id="6650f0c2a1b2c3d4e5f60001",
+        name="production key",
+        total_tokens_used=123456,
+        last_used_at=now,
+        created_at=now - timedelta(days=30),
+        expires_at=now + timedelta(days=335),
+        updated_at=now,
+    )
+
+
+def sample_user() -> User:
+    now = datetime.now(timezone.utc)
+    return User(id="6650f0c2a1b2c3d4e5f60001", username="vet_user", email="vet@example.com",
+                created_at=now, updated_at=now)
+
+
+def sample_history(count: int) -> list[bytes]:
+    """与 ChatService 写入的缓存元素格式相同：{role, content, timestamp(iso)}"""
+    base = datetime.now(timezone.utc)
+    return [
+        json.dumps({
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": "狗狗最近食欲不振，精神也不太好，偶尔会呕吐黄色泡沫，需要注意什么？" * 4,
+            "timestamp": (base + timedelta(seconds=i)).isoformat(),
+        }, ensure_ascii=False).encode("utf-8")
+        for i in range(count)
+    ]
+
+
+def bench(func, number: int, repeat: int) -> float:
+    """返回单次调用的最佳耗时（微秒）"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1_000_000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Redis 缓存模型还原基准测试")
+    parser.add_argument("--number", type=int, default=20_000, help="每轮调用次数")
+    parser.add_argument("--repeat", type=int, default=5, help="轮数（取最快一轮）")
+    parser.add_argument("--history", type=int, default=10, help="对话历史条数")
+    parser.add_argument("--output", default=None, help="将结果写入JSON文件")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = []
+
+    for model in (APIKey, User):
+        raw = (sample_api_key() if model is APIKey else sample_user()).model_dump_json().encode("utf-8")
+        legacy = bench(lambda: model(**json.loads(raw.decode("utf-8"))), args.number, args.repeat)
+        typed = bench(lambda: model.model_validate_json(raw), args.number, args.repeat)
+        report.append({"model": model.__name__, "bytes": len(raw),
+                       "legacy_us": round(legacy, 2), "typed_us": round(typed, 2),
+                       "speedup": round(legacy / typed, 2)})
+
+    items = sample_history(args.history)
+    adapter = TypeAdapter(list[ChatMessage])
+
+    def legacy_history():
+        messages = []
+        for item in items:
+            msg = json.loads(item.decode("utf-8"))
+            messages.append(ChatMessage(role=msg["role"], content=msg["content"],
+                                        timestamp=datetime.fromisoformat(msg["timestamp"]),
+                                        metadata=msg.get("metadata")))
+        return messages
+
+    legacy = bench(legacy_history, args.number // 10, args.repeat)
+    typed = bench(lambda: adapter.validate_json(b"[" + b",".join(items) + b"]"), args.number // 10, args.repeat)
+    report.append({"model": f"list[ChatMessage] x{args.history}", "bytes": sum(len(i) for i in items),
+                   "legacy_us": round(legacy, 2), "typed_us": round(typed, 2),
+                   "speedup": round(legacy / typed, 2)})
+
+    print("📊 Redis 缓存模型还原基准测试（单次调用，微秒）")
+    print("=" * 50)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+多模态请求签名基准测试
+对比旧的签名实现（json.dumps → f-string 拼接 → encode → HMAC）与 SignedPayload
+（序列化一次、HMAC 增量计算、发送同一份字节）在大图片下的延迟和峰值内存，并校验两者签名一致。
+只依赖标准库。
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.utils.signature import SignedPayload
+
+API_KEY = "bench-key"
+API_SECRET = "bench-secret"
+API_PATH = "/open/v1/skin-recognition"
+
+
+def legacy_sign(body: dict, nonce: str, timestamp: str) -> tuple[dict, str]:
+    """旧实现（用于对比）"""
+    body_str = json.dumps(body, separators=(',', ':'), sort_keys=True)
+    data_to_sign = f"{API_PATH}{body_str}{nonce}{timestamp}".encode('utf-8')
+    digest = hmac.new(API_SECRET.encode('utf-8'), data_to_sign, hashlib.sha256).digest()
+    headers = {"X-OPENAPI-SIGN": base64.b64encode(digest).decode('utf-8')}
+    # 旧调用方以 data=body_str 发送，httpx 还要再 encode 一次
+    return headers, body_str.encode('utf-8')
+
+
+def incremental_sign(body: dict, nonce: str, timestamp: str) -> tuple[dict, bytes]:
+    payload = SignedPayload(API_KEY, API_SECRET, API_PATH, body)
+    return payload.headers(nonce=nonce, timestamp=timestamp), payload.content
+
+
+def make_body(image_bytes: int) -> dict:
+    """生成指定大小（base64 后）的图片请求体"""
+    raw = os.urandom(image_bytes * 3 // 4)
+    return {
+        "image": base64.b64encode(raw).decode("ascii"),
+        "breed": 12,
+        "birth": "2021-05-01",
+        "gender": 1,
+        "fertility": 2,
+    }
+
+
+def measure(sign, body: dict, attempts: int, rounds: int) -> dict:
+    """attempts: 每个请求的发送次数（重试/对冲会重新签名）"""
+    durations = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        if sign is incremental_sign:
+            payload = SignedPayload(API_KEY, API_SECRET, API_PATH, body)
+            for attempt in range(attempts):
+                payload.headers(nonce=f"nonce{attempt:03d}", timestamp="1700000000")
+        else:
+            for attempt in range(attempts):
+                sign(body, f"nonce{attempt:03d}", "1700000000")
+        durations.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    sign(body, "nonce000", "1700000000")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(durations) * 1000, 3),
+        "min_ms": round(min(durations) * 1000, 3),
+        "peak_alloc_mb": round(peak / 1024 / 1024, 2),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="多模态请求签名基准测试")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4, 8], help="图片大小（MB，base64后）")
+    parser.add_argument("--attempts", type=int, default=1, help="每个请求的签名次数（模拟重试/对冲）")
+    parser.add_argument("--rounds", type=int, default=20, help="每项测量的轮数")
+    parser.add_argument("--output", default=None, help="将结果写入JSON文件")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = []
+
+    print("📊 多模态请求签名基准测试")
+    print("=" * 50)
+    for size_mb in args.sizes_mb:
+        body = make_body(int(size_mb * 1024 * 1024))
+
+        legacy_headers, legacy_content = legacy_sign(body, "nonce000", "1700000000")
+        new_headers, new_content = incremental_sign(body, "nonce000", "1700000000")
+        if legacy_headers["X-OPENAPI-SIGN"] != new_headers["X-OPENAPI-SIGN"] or legacy_content != new_content:
+            print(f"❌ {size_mb} MB: 签名或请求体与旧实现不一致")
+            sys.exit(1)
+
+        report.append({
+            "size_mb": size_mb,
+            "attempts": args.attempts,
+            "legacy": measure(legacy_sign, body, args.attempts, args.rounds),
+            "incremental": measure(incremental_sign, body, args.attempts, args.rounds),
+        })
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
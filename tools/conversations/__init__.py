@@ -0,0 +1,3 @@
+"""
+对话存储运维工具包
+"""
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+冷对话归档工具
+将空闲超过阈值的对话压缩后移入 `conversations_archive` 集合，并报告归档前后的工作集大小
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.config import settings
+from app.services.storage.mongo_service import MongoService, STORAGE_LAYOUT_BUCKET
+
+MB = 1024 * 1024
+
+
+class ConversationArchiver:
+    def __init__(self, idle_days: int, limit: int | None = None, dry_run: bool = False):
+        self.mongo = MongoService()
+        self.idle_days = idle_days
+        self.limit = limit
+        self.dry_run = dry_run
+
+    @property
+    def hot_collection_name(self) -> str:
+        return "conversation_buckets" if self.mongo.storage_layout == STORAGE_LAYOUT_BUCKET else "conversations"
+
+    async def working_set(self) -> dict:
+        """统计热数据集合（数据+索引）与归档集合大小，以及 WiredTiger 缓存占用"""
+        report = {}
+        for name in (self.hot_collection_name, "conversations_archive"):
+            try:
+                stats = await self.mongo.db.command("collStats", name)
+            except Exception:
+                stats = {}
+            report[name] = {
+                "documents": stats.get("count", 0),
+                "data_mb": stats.get("size", 0) / MB,
+                "storage_mb": stats.get("storageSize", 0) / MB,
+                "index_mb": stats.get("totalIndexSize", 0) / MB,
+            }
+
+        try:
+            server_status = await self.mongo.db.command("serverStatus")
+            cache = server_status.get("wiredTiger", {}).get("cache", {})
+            report["wiredtiger_cache_mb"] = cache.get("bytes currently in the cache", 0) / MB
+        except Exception:
+            report["wiredtiger_cache_mb"] = None
+        return report
+
+    def print_working_set(self, title: str, report: dict):
+        print(f"📦 {title}")
+        for name, stats in report.items():
+            if isinstance(stats, dict):
+                print(f"   {name}: {stats['documents']:,} 文档, 数据 {stats['data_mb']:.1f}MB, "
+                      f"存储 {stats['storage_mb']:.1f}MB, 索引 {stats['index_mb']:.1f}MB")
+        if report.get("wiredtiger_cache_mb") is not None:
+            print(f"   WiredTiger 缓存占用: {report['wiredtiger_cache_mb']:.1f}MB")
+
+    async def run(self):
+        """归档所有空闲对话"""
+        await self.mongo.ensure_indexes()
+        idle_before = datetime.now(timezone.utc) - timedelta(days=self.idle_days)
+
+        before = await self.working_set()
+        self.print_working_set("归档前工作集", before)
+
+        archived = 0
+        messages = 0
+        raw_bytes = 0
+        compressed_bytes = 0
+        started = time.perf_counter()
+
+        async for conversation_id in self.mongo.iter_idle_conversations(idle_before):
+            if self.limit and archived >= self.limit:
+                break
+            if self.dry_run:
+                archived += 1
+                continue
+
+            result = await self.mongo.archive_conversation(conversation_id)
+            if not result:
+                continue
+            archived += 1
+            messages += result["message_count"]
+            raw_bytes += result["raw_size"]
+            compressed_bytes += result["compressed_size"]
+            if archived % 1000 == 0:
+                print(f"  已归档 {archived:,} 个对话 / {messages:,} 条消息")
+
+        elapsed = time.perf_counter() - started
+        action = "可归档" if self.dry_run else "已归档"
+        print(f"✅ {action} {archived:,} 个对话 (空闲超过 {self.idle_days} 天), 用时 {elapsed:.1f}s")
+        if compressed_bytes:
+            print(f"   消息 {messages:,} 条, 原始 {raw_bytes / MB:.1f}MB -> 压缩 {compressed_bytes / MB:.1f}MB "
+                  f"(压缩比 {raw_bytes / compressed_bytes:.1f}x)")
+
+        if not self.dry_run:
+            after = await self.working_set()
+            self.print_working_set("归档后工作集", after)
+            hot = self.hot_collection_name
+            saved = (before[hot]["data_mb"] + before[hot]["index_mb"]) - (after[hot]["data_mb"] + after[hot]["index_mb"])
+            print(f"   热数据工作集减少: {saved:.1f}MB")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="归档空闲对话到压缩归档集合")
+    parser.add_argument("--idle-days", type=int, default=settings.CONVERSATION_ARCHIVE_IDLE_DAYS,
+                        help="空闲天数阈值，默认使用 CONVERSATION_ARCHIVE_IDLE_DAYS")
+    parser.add_argument("--limit", type=int, default=None, help="本次最多归档的对话数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计不归档")
+    return parser.parse_args()
+
+
+async def main():
+    """主函数"""
+    args = parse_args()
+    print("🗄️  冷对话归档")
+    print("=" * 50)
+    archiver = ConversationArchiver(idle_days=args.idle_days, limit=args.limit, dry_run=args.dry_run)
+    await archiver.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+对话存储布局基准测试
+在独立的基准数据库中分别按 message / bucket 两种布局写入同样规模的数据，
+比较“读取最近10条消息”和“写入一轮问答”的延迟与存储占用
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from bson import ObjectId
+from app.core.config import settings
+from app.services.storage.mongo_service import MongoService, STORAGE_LAYOUT_MESSAGE, STORAGE_LAYOUT_BUCKET
+
+SAMPLE_CONTENT = "狗狗最近食欲不振，精神也不太好，偶尔会呕吐黄色泡沫，需要注意什么？" * 3
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """计算百分位数（毫秒）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+class StorageLayoutBenchmark:
+    def __init__(self, db_name: str, messages: int, conversations: int, bucket_size: int | None):
+        self.db_name = db_name
+        self.messages = messages
+        self.conversations = conversations
+        self.per_conversation = max(1, messages // conversations)
+        self.services = {
+            STORAGE_LAYOUT_MESSAGE: MongoService.for_layout(STORAGE_LAYOUT_MESSAGE, db_name=db_name),
+            STORAGE_LAYOUT_BUCKET: MongoService.for_layout(STORAGE_LAYOUT_BUCKET, db_name=db_name),
+        }
+        if bucket_size:
+            self.services[STORAGE_LAYOUT_BUCKET].bucket_size = bucket_size
+
+    def _conversation_messages(self, index: int) -> list[dict]:
+        """生成一个对话的全部消息（按时间正序）"""
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=index)
+        return [
+            {
+                "_id": ObjectId(),
+                "role": "user" if i % 2 == 0 else "assistant",
+                "content": SAMPLE_CONTENT,
+                "timestamp": base + timedelta(seconds=i),
+                "metadata": {}
+            }
+            for i in range(self.per_conversation)
+        ]
+
+    async def seed(self, batch_docs: int = 10000):
+        """写入基准数据"""
+        message_service = self.services[STORAGE_LAYOUT_MESSAGE]
+        bucket_service = self.services[STORAGE_LAYOUT_BUCKET]
+        await message_service.conversations.drop()
+        await bucket_service.conversation_buckets.drop()
+        await message_service.ensure_indexes()
+
+        message_batch: list[dict] = []
+        bucket_batch: list[dict] = []
+        started = time.perf_counter()
+        for index in range(self.conversations):
+            conversation_id = f"bench_{index}"
+            messages = self._conversation_messages(index)
+
+            for msg in messages:
+                message_batch.append({**msg, "conversation_id": conversation_id})
+
+            size = bucket_service.bucket_size
+            for start in range(0, len(messages), size):
+                chunk = messages[start:start + size]
+                bucket_batch.append({
+                    "conversation_id": conversation_id,
+                    "seq": start // size,
+                    "count": len(chunk),
+                    "first_ts": chunk[0]["timestamp"],
+                    "last_ts": chunk[-1]["timestamp"],
+                    "messages": chunk
+                })
+
+            if len(message_batch) >= batch_docs:
+                await message_service.conversations.insert_many(message_batch, ordered=False)
+                await bucket_service.conversation_buckets.insert_many(bucket_batch, ordered=False)
+                message_batch, bucket_batch = [], []
+                done = (index + 1) * self.per_conversation
+                print(f"  已写入 {done:,}/{self.messages:,} 条消息 ({time.perf_counter() - started:.0f}s)")
+
+        if message_batch:
+            await message_service.conversations.insert_many(message_batch, ordered=False)
+        if bucket_batch:
+            await bucket_service.conversation_buckets.insert_many(bucket_batch, ordered=False)
+
+    async def _run(self, operation, requests: int, concurrency: int) -> dict:
+        """以固定并发执行操作并统计延迟"""
+        latencies: list[float] = []
+        queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(f"bench_{random.randrange(self.conversations)}")
+
+        async def worker():
+            while not queue.empty():
+                conversation_id = queue.get_nowait()
+                start = time.perf_counter()
+                await operation(conversation_id)
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return {
+            "requests": requests,
+            "ops_per_sec": round(requests / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+        }
+
+    async def _collection_stats(self, layout: str) -> dict:
+        """读取集合大小与索引大小"""
+        service = self.services[layout]
+        name = "conversation_buckets" if layout == STORAGE_LAYOUT_BUCKET else "conversations"
+        stats = await service.db.command("collStats", name)
+        return {
+            "documents": stats.get("count", 0),
+            "data_size_mb": round(stats.get("size", 0) / 1024 / 1024, 1),
+            "storage_size_mb": round(stats.get("storageSize", 0) / 1024 / 1024, 1),
+            "index_size_mb": round(stats.get("totalIndexSize", 0) / 1024 / 1024, 1),
+        }
+
+    async def measure(self, requests: int, concurrency: int, history_limit: int) -> dict:
+        """对两种布局分别测量读写性能"""
+        report = {
+            "messages": self.messages,
+            "conversations": self.conversations,
+            "bucket_size": self.services[STORAGE_LAYOUT_BUCKET].bucket_size,
+            "history_limit": history_limit,
+            "concurrency": concurrency,
+            "layouts": {}
+        }
+        for layout, service in self.services.items():
+            read = await self._run(
+                lambda cid: service.get_conversation_history(cid, limit=history_limit),
+                requests, concurrency
+            )
+            write = await self._run(
+                # 与聊天流程一致：写入前已读过历史，不检查归档
+                lambda cid: service.save_turn(cid, SAMPLE_CONTENT, SAMPLE_CONTENT, has_history=True),
+                requests, concurrency
+            )
+            report["layouts"][layout] = {
+                "read_history": read,
+                "write_turn": write,
+                "collection": await self._collection_stats(layout),
+            }
+        return report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="对比 message / bucket 两种对话存储布局")
+    parser.add_argument("--messages", type=int, default=10_000_000, help="总消息数")
+    parser.add_argument("--conversations", type=int, default=500_000, help="对话数")
+    parser.add_argument("--bucket-size", type=int, default=None, help="桶大小，默认使用 CONVERSATION_BUCKET_SIZE")
+    parser.add_argument("--requests", type=int, default=20_000, help="每项测试的请求数")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发数")
+    parser.add_argument("--history-limit", type=int, default=10, help="读取的历史消息条数")
+    parser.add_argument("--db", default=f"{settings.MONGODB_DB_NAME}_bench", help="基准数据库名")
+    parser.add_argument("--skip-seed", action="store_true", help="跳过数据写入，复用已有数据")
+    parser.add_argument("--output", default=None, help="将结果写入JSON文件")
+    return parser.parse_args()
+
+
+async def main():
+    """主函数"""
+    args = parse_args()
+    bench = StorageLayoutBenchmark(args.db, args.messages, args.conversations, args.bucket_size)
+
+    print(f"📊 对话存储布局基准测试 (数据库: {args.db})")
+    print("=" * 50)
+    if not args.skip_seed:
+        print(f"写入 {args.messages:,} 条消息 / {args.conversations:,} 个对话...")
+        await bench.seed()
+
+    report = await bench.measure(args.requests, args.concurrency, args.history_limit)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+对话存储迁移工具
+将 `conversations` 集合中每条消息一个文档的布局迁移为 `conversation_buckets` 桶文档布局
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.services.storage.mongo_service import MongoService, MESSAGE_ORDER_DESC, STORAGE_LAYOUT_BUCKET
+
+
+class BucketMigrator:
+    def __init__(self, bucket_size: int | None = None, batch_size: int = 1000, dry_run: bool = False):
+        self.mongo = MongoService.for_layout(STORAGE_LAYOUT_BUCKET)
+        if bucket_size:
+            self.mongo.bucket_size = bucket_size
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.conversations_done = 0
+        self.messages_done = 0
+        self.buckets_written = 0
+
+    async def _flush(self, conversation_id: str, messages: list[dict]):
+        """写入一个对话的全部桶（先删除旧桶，保证重复运行幂等）"""
+        # 游标按索引顺序（timestamp 倒序）返回，这里恢复为正序
+        messages.reverse()
+        buckets = self.mongo.build_buckets(conversation_id, messages)
+
+        if not self.dry_run:
+            await self.mongo.conversation_buckets.delete_many({"conversation_id": conversation_id})
+            await self.mongo.conversation_buckets.insert_many(buckets, ordered=True)
+
+        self.conversations_done += 1
+        self.messages_done += len(messages)
+        self.buckets_written += len(buckets)
+
+    async def migrate(self, resume_after: str | None = None):
+        """按 (conversation_id, timestamp, _id) 索引顺序流式读取并迁移"""
+        await self.mongo.ensure_indexes()
+
+        query = {"conversation_id": {"$gt": resume_after}} if resume_after else {}
+        cursor = self.mongo.conversations.find(query).sort(
+            [("conversation_id", 1), *MESSAGE_ORDER_DESC]
+        ).batch_size(self.batch_size)
+
+        started = time.perf_counter()
+        current_id = None
+        pending: list[dict] = []
+
+        async for doc in cursor:
+            if doc["conversation_id"] != current_id:
+                if pending:
+                    await self._flush(current_id, pending)
+                    if self.conversations_done % 1000 == 0:
+                        elapsed = time.perf_counter() - started
+                        print(f"  已迁移 {self.conversations_done:,} 个对话 / {self.messages_done:,} 条消息 "
+                              f"({self.messages_done / elapsed:,.0f} msg/s), 最后对话ID: {current_id}")
+                current_id = doc["conversation_id"]
+                pending = []
+            pending.append(doc)
+
+        if pending:
+            await self._flush(current_id, pending)
+
+        elapsed = time.perf_counter() - started
+        print(f"✅ 迁移完成: {self.conversations_done:,} 个对话, {self.messages_done:,} 条消息, "
+              f"{self.buckets_written:,} 个桶, 用时 {elapsed:.1f}s")
+        if current_id:
+            print(f"   最后处理的对话ID: {current_id} (可用 --resume-after 继续)")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="迁移对话存储到桶文档布局")
+    parser.add_argument("--bucket-size", type=int, default=None, help="每个桶的消息数，默认使用 CONVERSATION_BUCKET_SIZE")
+    parser.add_argument("--batch-size", type=int, default=1000, help="游标批大小")
+    parser.add_argument("--resume-after", default=None, help="从指定对话ID之后继续迁移")
+    parser.add_argument("--dry-run", action="store_true", help="只统计不写入")
+    return parser.parse_args()
+
+
+async def main():
+    """主函数"""
+    args = parse_args()
+    print("🔄 对话存储迁移: conversations -> conversation_buckets")
+    print("=" * 50)
+    migrator = BucketMigrator(bucket_size=args.bucket_size, batch_size=args.batch_size, dry_run=args.dry_run)
+    await migrator.migrate(resume_after=args.resume_after)
+    print("迁移完成后请设置 CONVERSATION_STORAGE_LAYOUT=bucket 并重启服务")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
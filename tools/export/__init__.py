@@ -0,0 +1,3 @@
+"""
+数据导出工具包
+"""
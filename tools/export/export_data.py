@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+数据导出工具
+以常量内存将 conversations / conversations_archive / usage_records 流式导出为 NDJSON（可选 gzip），支持断点续传
+"""
+import argparse
+import asyncio
+import gzip
+import sys
+import os
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.services.export_service import ExportService, EXPORTABLE_COLLECTIONS, encode_ndjson_line
+
+
+class DataExporter:
+    def __init__(self, collection: str, output: str, use_gzip: bool, checkpoint_every: int):
+        self.export_service = ExportService()
+        self.name = collection
+        self.collection = self.export_service.resolve_collection(collection)
+        self.output = output
+        self.use_gzip = use_gzip
+        self.checkpoint_every = checkpoint_every
+        self.state_file = f"{output}.state"
+
+    def load_checkpoint(self) -> str | None:
+        """读取上次导出的最后一个 _id"""
+        try:
+            with open(self.state_file, "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def save_checkpoint(self, last_id: str):
+        """原子写入断点"""
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(last_id)
+        os.replace(tmp_file, self.state_file)
+
+    def _open_output(self, resume: bool):
+        # 续传时追加写入；gzip 多成员文件可被标准工具连续解压
+        mode = "ab" if resume else "wb"
+        if self.use_gzip:
+            return gzip.open(self.output, mode, compresslevel=6)
+        return open(self.output, mode)
+
+    async def run(self, resume: bool, limit: int | None):
+        """执行导出"""
+        after_id = self.load_checkpoint() if resume else None
+        if after_id:
+            print(f"从 _id > {after_id} 继续导出")
+
+        exported = 0
+        last_id = after_id
+        started = time.perf_counter()
+
+        with self._open_output(resume=bool(after_id)) as out:
+            # 归档导出时一个源文档对应多行，断点记录在源文档边界
+            async for source_id, docs in self.export_service.iter_records(self.name, after_id=after_id):
+                for doc in docs:
+                    out.write(encode_ndjson_line(doc))
+                previous = exported
+                exported += len(docs)
+                last_id = str(source_id)
+
+                if exported // self.checkpoint_every > previous // self.checkpoint_every:
+                    # 先刷新数据再记录断点，保证断点之前的数据都已落盘
+                    out.flush()
+                    self.save_checkpoint(last_id)
+                    rate = exported / (time.perf_counter() - started)
+                    print(f"  已导出 {exported:,} 条 ({rate:,.0f} docs/s), 最后 _id: {last_id}")
+
+                if limit and exported >= limit:
+                    break
+
+        if last_id:
+            self.save_checkpoint(last_id)
+        elapsed = time.perf_counter() - started
+        print(f"✅ 导出完成: {exported:,} 条, 用时 {elapsed:.1f}s, 输出文件: {self.output}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="流式导出 MongoDB 数据为 NDJSON")
+    parser.add_argument("collection", choices=sorted(EXPORTABLE_COLLECTIONS), help="导出的数据集")
+    parser.add_argument("--output", "-o", default=None, help="输出文件，默认 <collection>.ndjson[.gz]")
+    parser.add_argument("--gzip", action="store_true", help="gzip 压缩输出")
+    parser.add_argument("--resume", action="store_true", help="从 <output>.state 记录的 _id 继续导出")
+    parser.add_argument("--limit", type=int, default=None, help="最多导出的文档数")
+    parser.add_argument("--checkpoint-every", type=int, default=100_000, help="每导出多少条记录一次断点")
+    return parser.parse_args()
+
+
+async def main():
+    """主函数"""
+    args = parse_args()
+    output = args.output or f"{args.collection}.ndjson{'.gz' if args.gzip else ''}"
+    print(f"📤 导出 {args.collection} -> {output}")
+    print("=" * 50)
+    exporter = DataExporter(args.collection, output, args.gzip, args.checkpoint_every)
+    await exporter.run(resume=args.resume, limit=args.limit)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
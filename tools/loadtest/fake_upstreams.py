@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+压测用的本地上游替身
+- LLM: OpenAI 兼容的 /v1/chat/completions，流式输出，可配置首 token 延迟（TTFT）和生成速度
+- 多模态: /open/v1/{image_type}，按 app.utils.signature 的规则校验 HMAC 签名头，签名错误返回 401
+两个服务在同一个进程中运行，GET /stats 返回各自的请求计数。
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# 签名时间戳允许的偏差（秒）
+MAX_CLOCK_SKEW = 300
+
+
+def create_llm_app(ttft: float, tokens_per_second: float, tokens: int) -> FastAPI:
+    app = FastAPI(title="Fake LLM")
+    stats = {"requests": 0, "streams": 0, "tokens": 0}
+    interval = 1 / tokens_per_second if tokens_per_second > 0 else 0
+
+    def chunk(completion_id: str, model: str, delta: dict, finish_reason: str | None = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    async def stream(completion_id: str, model: str):
+        stats["streams"] += 1
+        await asyncio.sleep(ttft)
+        yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+        for index in range(tokens):
+            if index:
+                await asyncio.sleep(interval)
+            stats["tokens"] += 1
+            yield chunk(completion_id, model, {"content": f"词{index} "})
+        yield chunk(completion_id, model, {}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        stats["requests"] += 1
+        body = await request.json()
+        model = body.get("model", "fake-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        if body.get("stream"):
+            return StreamingResponse(stream(completion_id, model), media_type="text/event-stream")
+
+        await asyncio.sleep(ttft + interval * max(tokens - 1, 0))
+        stats["tokens"] += tokens
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(f"词{i}" for i in range(tokens))},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def create_multimodal_app(api_key: str, api_secret: str, latency: float) -> FastAPI:
+    app = FastAPI(title="Fake Multimodal")
+    stats = {"requests": 0, "verified": 0, "rejected": 0}
+
+    def verify(request: Request, path: str, body: bytes) -> str | None:
+        """返回拒绝原因；签名为 HMAC-SHA256(secret, path + body + nonce + timestamp) 的 Base64"""
+        headers = request.headers
+        if headers.get("authorization") != f"Bearer {api_key}":
+            return "invalid api key"
+        nonce = headers.get("x-openapi-nonce")
+        timestamp = headers.get("x-openapi-timestamp")
+        signature = headers.get("x-openapi-sign")
+        if not (nonce and timestamp and signature):
+            return "missing signature headers"
+        if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > MAX_CLOCK_SKEW:
+            return "timestamp out of range"
+        mac = hmac.new(api_secret.encode("utf-8"), digestmod=hashlib.sha256)
+        mac.update(path.encode("utf-8"))
+        mac.update(body)
+        mac.update(nonce.encode("utf-8"))
+        mac.update(timestamp.encode("utf-8"))
+        if not hmac.compare_digest(base64.b64encode(mac.digest()).decode("utf-8"), signature):
+            return "signature mismatch"
+        return None
+
+    @app.post("/open/v1/{image_type}")
+    async def analyze(image_type: str, request: Request):
+        stats["requests"] += 1
+        body = await request.body()
+        error = verify(request, f"/open/v1/{image_type}", body)
+        if error:
+            stats["rejected"] += 1
+            return JSONResponse(status_code=401, content={"code": 401, "message": error})
+
+        stats["verified"] += 1
+        await asyncio.sleep(latency)
+        return {"code": 0, "message": "ok", "data": [{"text": f"{image_type} 分析结果：未见明显异常。"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="压测用的本地 LLM / 多模态上游替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--llm-port", type=int, default=9101)
+    parser.add_argument("--multimodal-port", type=int, default=9102)
+    parser.add_argument("--ttft", type=float, default=0.3, help="LLM 首 token 延迟（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="LLM 生成速度")
+    parser.add_argument("--tokens", type=int, default=100, help="每个回复的 token 数")
+    parser.add_argument("--multimodal-latency", type=float, default=0.5, help="多模态分析延迟（秒）")
+    parser.add_argument("--multimodal-api-key", default="loadtest-key")
+    parser.add_argument("--multimodal-api-secret", default="loadtest-secret")
+    return parser.parse_args()
+
+
+async def serve(args):
+    servers = [
+        uvicorn.Server(uvicorn.Config(
+            create_llm_app(args.ttft, args.tokens_per_second, args.tokens),
+            host=args.host, port=args.llm_port, log_level="warning",
+        )),
+        uvicorn.Server(uvicorn.Config(
+            create_multimodal_app(args.multimodal_api_key, args.multimodal_api_secret, args.multimodal_latency),
+            host=args.host, port=args.multimodal_port, log_level="warning",
+        )),
+    ]
+    print(f"🤖 Fake LLM:        http://{args.host}:{args.llm_port}/v1")
+    print(f"🖼️  Fake multimodal: http://{args.host}:{args.multimodal_port}")
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main():
+    asyncio.run(serve(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
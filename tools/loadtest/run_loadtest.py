@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+端到端压测
+启动本地上游替身（fake_upstreams.py）和指向它们的服务进程，按配置的并发压测
+/auth/token、/chat/text、/chat/image、/chat/completions，
+输出每个端点的 RPS、延迟、TTFT、token 间隔的 p50/p95/p99，并写入 JSON 报告，便于在不同提交之间对比。
+服务进程开启 BACKEND_USAGE_HEADER，按 X-Backend-Usage 响应头统计每请求的 Redis/MongoDB 往返次数，
+指定 --backend-budget 时超出预算的请求会使脚本以非零状态退出。
+Redis 和 MongoDB 使用本地实例（默认 localhost，压测数据写入独立的数据库）。
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.core.backend_usage import USAGE_HEADER, parse_header  # noqa: E402
+
+FAKE_UPSTREAMS = Path(__file__).resolve().parent / "fake_upstreams.py"
+
+ENDPOINT_TOKEN = "token"
+ENDPOINT_TEXT = "text"
+ENDPOINT_IMAGE = "image"
+ENDPOINT_COMPLETIONS = "completions"
+ENDPOINTS = (ENDPOINT_TOKEN, ENDPOINT_TEXT, ENDPOINT_IMAGE, ENDPOINT_COMPLETIONS)
+STREAMING_ENDPOINTS = (ENDPOINT_TEXT, ENDPOINT_IMAGE)
+
+MULTIMODAL_API_KEY = "loadtest-key"
+MULTIMODAL_API_SECRET = "loadtest-secret"
+QUESTION = "狗狗最近食欲不振并且精神不好，可能是什么原因？"
+
+
+class Sample:
+    """单个请求的结果"""
+
+    __slots__ = ("status", "latency", "ttft", "gaps", "tokens", "error", "backend")
+
+    def __init__(self):
+        self.status = 0
+        self.latency = 0.0
+        self.ttft: float | None = None
+        self.gaps: list[float] = []
+        self.tokens = 0
+        self.error: str | None = None
+        self.backend: dict[str, int] | None = None
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """最近秩法百分位"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+def distribution_ms(values: list[float]) -> dict:
+    return {
+        name: round(value * 1000, 2) if value is not None else None
+        for name, value in (
+            ("p50", percentile(values, 50)),
+            ("p95", percentile(values, 95)),
+            ("p99", percentile(values, 99)),
+            ("max", max(values) if values else None),
+        )
+    }
+
+
+def parse_budget(items: list[str]) -> dict[str, int]:
+    """解析 --backend-budget 参数，如 ["redis=6", "mongo=1"]"""
+    budget = {}
+    for item in items:
+        backend, _, limit = item.partition("=")
+        if not backend or not limit.isdigit():
+            raise argparse.ArgumentTypeError(f"Invalid backend budget: {item!r} (expected backend=count)")
+        budget[backend] = int(limit)
+    return budget
+
+
+def exceeded_budget(commands: dict[str, int], budget: dict[str, int]) -> dict[str, tuple[int, int]]:
+    """返回超出预算的后端 -> (实际次数, 预算次数)"""
+    return {
+        backend: (commands.get(backend, 0), limit)
+        for backend, limit in budget.items()
+        if commands.get(backend, 0) > limit
+    }
+
+
+# ==================== 进程管理 ====================
+
+def start_fake_upstreams(args) -> subprocess.Popen:
+    command = [
+        sys.executable, str(FAKE_UPSTREAMS),
+        "--llm-port", str(args.llm_port),
+        "--multimodal-port", str(args.multimodal_port),
+        "--ttft", str(args.ttft),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--tokens", str(args.tokens),
+        "--multimodal-latency", str(args.multimodal_latency),
+        "--multimodal-api-key", MULTIMODAL_API_KEY,
+        "--multimodal-api-secret", MULTIMODAL_API_SECRET,
+    ]
+    return subprocess.Popen(command, cwd=PROJECT_ROOT)
+
+
+def start_app(args) -> subprocess.Popen:
+    """启动服务进程，上游地址指向本地替身，其余配置沿用 .env"""
+    llm_url = f"http://127.0.0.1:{args.llm_port}/v1"
+    env = os.environ.copy()
+    env.update({
+        "OPENAI_BASE_URL": llm_url,
+        "LLM_OPENAI_BASE_URL": llm_url,
+        "OPENAI_API_KEY": "loadtest",
+        "LLM_OPENAI_API_KEY": "loadtest",
+        "LLM_MODEL_NAME": "fake-model",
+        "MULTIMODAL_BASE_URL": f"http://127.0.0.1:{args.multimodal_port}",
+        "MULTIMODAL_API_KEY": MULTIMODAL_API_KEY,
+        "MULTIMODAL_API_SECRET": MULTIMODAL_API_SECRET,
+        "REDIS_URL": args.redis_url,
+        "MONGODB_URL": args.mongodb_url,
+        "MONGODB_DB_NAME": args.mongodb_db,
+        "LOG_LEVEL": "WARNING",
+        "BACKEND_USAGE_HEADER": "true",
+    })
+    # .env 不存在时补齐必填配置
+    env.setdefault("JWT_SECRET_KEY", "loadtest-jwt-secret")
+    env.setdefault("PET_INFO_BASE_URL", "http://127.0.0.1:9")
+    env.setdefault("PET_INFO_CLIENT_ID", "loadtest")
+    env.setdefault("PET_INFO_CLIENT_SECRET", "loadtest")
+
+    command = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(args.app_port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=PROJECT_ROOT, env=env)
+
+
+async def wait_until_ready(client: httpx.AsyncClient, url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get(url, timeout=2.0)
+            if response.status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+# ==================== 准备账号 ====================
+
+async def login(client: httpx.AsyncClient, api: str, username: str, password: str) -> httpx.Response:
+    return await client.post(f"{api}/auth/token", data={"username": username, "password": password})
+
+
+async def prepare_credentials(client: httpx.AsyncClient, api: str, args) -> tuple[str, str | None]:
+    """注册（已存在时忽略）并登录压测用户；需要压测 completions 时创建 API Key"""
+    await client.post(f"{api}/auth/register", json={"username": args.username, "password": args.password})
+    response = await login(client, api, args.username, args.password)
+    response.raise_for_status()
+    token = response.json()["access_token"]
+
+    api_key = args.api_key
+    if api_key is None and ENDPOINT_COMPLETIONS in args.endpoints:
+        response = await client.post(
+            f"{api}/account/api-keys",
+            json={"name": f"loadtest-{int(time.time())}", "rate_limit_rpm": 1000, "rate_limit_tpm": 100000},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        response.raise_for_status()
+        api_key = response.json()["key"]
+    return token, api_key
+
+
+# ==================== 请求场景 ====================
+
+async def consume_sse(response: httpx.Response, sample: Sample, started: float):
+    """读取 SSE 流：data 行中非空的 text_chunk 计为一个 token，image_analysis 事件不计"""
+    event = None
+    last_token_at = None
+    async for line in response.aiter_lines():
+        if not line:
+            event = None
+            continue
+        if line.startswith("event:"):
+            event = line[6:].strip()
+            continue
+        if not line.startswith("data:") or event is not None:
+            continue
+        payload = json.loads(line[5:].strip())
+        if payload.get("error"):
+            sample.error = str(payload["error"])
+            continue
+        if not payload.get("text_chunk"):
+            continue
+        now = time.perf_counter()
+        if last_token_at is None:
+            sample.ttft = now - started
+        else:
+            sample.gaps.append(now - last_token_at)
+        last_token_at = now
+        sample.tokens += 1
+
+
+class Scenario:
+    def __init__(self, client: httpx.AsyncClient, api: str, args, token: str, api_key: str | None):
+        self.client = client
+        self.api = api
+        self.args = args
+        self.auth = {"Authorization": f"Bearer {token}"}
+        self.api_key_auth = {"Authorization": f"Bearer {api_key}"} if api_key else None
+        self.run_id = uuid.uuid4().hex[:8]
+        image = base64.b64encode(os.urandom(args.image_kb * 1024)).decode()
+        self.images = [image] * args.images
+
+    def _chat_body(self, user: int) -> dict:
+        return {
+            "user_id": self.args.username,
+            "conversation_id": f"loadtest-{self.run_id}-{user}",
+            "pet_id": "PET_1234567",
+            "question": QUESTION,
+        }
+
+    async def request(self, endpoint: str, user: int) -> Sample:
+        sample = Sample()
+        started = time.perf_counter()
+        try:
+            if endpoint == ENDPOINT_TOKEN:
+                response = await login(self.client, self.api, self.args.username, self.args.password)
+                sample.status = response.status_code
+            elif endpoint == ENDPOINT_COMPLETIONS:
+                response = await self.client.post(
+                    f"{self.api}/chat/completions",
+                    json={"model": "fake-model", "messages": [{"role": "user", "content": QUESTION}]},
+                    headers=self.api_key_auth,
+                )
+                sample.status = response.status_code
+            else:
+                body = self._chat_body(user)
+                if endpoint == ENDPOINT_IMAGE:
+                    body.update(image_type="skin-recognition", images=self.images)
+                async with self.client.stream(
+                    "POST", f"{self.api}/chat/{endpoint}", json=body, headers=self.auth
+                ) as response:
+                    sample.status = response.status_code
+                    if response.status_code == 200:
+                        await consume_sse(response, sample, started)
+                    else:
+                        await response.aread()
+            # 流式响应的响应头在流开始前发出，只包含此前的命令
+            usage = response.headers.get(USAGE_HEADER)
+            if usage:
+                sample.backend = parse_header(usage)
+        except httpx.HTTPError as e:
+            sample.error = type(e).__name__
+        sample.latency = time.perf_counter() - started
+        return sample
+
+
+async def run_endpoint(scenario: Scenario, endpoint: str, args) -> dict:
+    """concurrency 个虚拟用户循环发送请求，直到完成 requests 个或超过 duration 秒"""
+    samples: list[Sample] = []
+    remaining = args.requests
+    deadline = time.monotonic() + args.duration if args.duration else None
+
+    async def virtual_user(user: int):
+        nonlocal remaining
+        while remaining > 0 and (deadline is None or time.monotonic() < deadline):
+            remaining -= 1
+            samples.append(await scenario.request(endpoint, user))
+
+    for user in range(min(args.warmup, args.concurrency)):
+        await scenario.request(endpoint, user)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(user) for user in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(endpoint, samples, elapsed, args.backend_budget)
+
+
+def summarize(endpoint: str, samples: list[Sample], elapsed: float, budget: dict[str, int]) -> dict:
+    ok = [s for s in samples if s.status == 200 and s.error is None]
+    result = {
+        "requests": len(samples),
+        "succeeded": len(ok),
+        "status_codes": dict(Counter(str(s.status or s.error) for s in samples)),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency_ms": distribution_ms([s.latency for s in ok]),
+    }
+    if endpoint in STREAMING_ENDPOINTS:
+        streamed = [s for s in ok if s.ttft is not None]
+        result["ttft_ms"] = distribution_ms([s.ttft for s in streamed])
+        result["inter_token_ms"] = distribution_ms([gap for s in streamed for gap in s.gaps])
+        rates = [(s.tokens - 1) / (s.latency - s.ttft) for s in streamed if s.tokens > 1 and s.latency > s.ttft]
+        result["tokens_per_second_p50"] = round(percentile(rates, 50), 2) if rates else None
+    measured = [s.backend for s in ok if s.backend is not None]
+    if measured:
+        backends = sorted({backend for commands in measured for backend in commands})
+        result["backend_round_trips"] = {
+            backend: {
+                "p50": percentile([commands.get(backend, 0) for commands in measured], 50),
+                "max": max(commands.get(backend, 0) for commands in measured),
+            }
+            for backend in backends
+        }
+        if budget:
+            result["backend_budget_exceeded"] = sum(1 for commands in measured if exceeded_budget(commands, budget))
+    errors = Counter(s.error for s in samples if s.error)
+    if errors:
+        result["errors"] = dict(errors.most_common(5))
+    return result
+
+
+# ==================== 报告 ====================
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline_path: str):
+    """打印与基线报告的 p50/p95/p99 变化（正数表示变慢）"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\n📈 与基线对比 ({baseline.get('commit')} → {report.get('commit')})")
+    for endpoint, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous:
+            continue
+        for metric in ("latency_ms", "ttft_ms", "inter_token_ms"):
+            if metric not in current or metric not in previous:
+                continue
+            changes = []
+            for pct in ("p50", "p95", "p99"):
+                old, new = previous[metric].get(pct), current[metric].get(pct)
+                if old and new is not None:
+                    changes.append(f"{pct} {old}→{new} ({(new - old) / old * 100:+.1f}%)")
+            if changes:
+                print(f"   {endpoint:<12} {metric:<15} " + ", ".join(changes))
+
+
+async def fetch_upstream_stats(client: httpx.AsyncClient, args) -> dict:
+    stats = {}
+    for name, port in (("llm", args.llm_port), ("multimodal", args.multimodal_port)):
+        try:
+            stats[name] = (await client.get(f"http://127.0.0.1:{port}/stats")).json()
+        except httpx.HTTPError:
+            stats[name] = None
+    return stats
+
+
+async def run(args) -> dict:
+    base_url = args.base_url or f"http://127.0.0.1:{args.app_port}"
+    api = f"{base_url.rstrip('/')}/api/v1"
+    limits = httpx.Limits(max_connections=args.concurrency + 10, max_keepalive_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        await wait_until_ready(client, f"{base_url.rstrip('/')}/health")
+        token, api_key = await prepare_credentials(client, api, args)
+        scenario = Scenario(client, api, args, token, api_key)
+
+        endpoints = {}
+        for endpoint in args.endpoints:
+            print(f"🚀 压测 {endpoint} (并发 {args.concurrency})...")
+            endpoints[endpoint] = await run_endpoint(scenario, endpoint, args)
+            print(f"   RPS: {endpoints[endpoint]['rps']}  延迟: {endpoints[endpoint]['latency_ms']}")
+
+        upstreams = await fetch_upstream_stats(client, args) if not args.base_url else None
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "workers": args.workers,
+            "ttft": args.ttft,
+            "tokens_per_second": args.tokens_per_second,
+            "tokens": args.tokens,
+            "multimodal_latency": args.multimodal_latency,
+            "images": args.images,
+            "image_kb": args.image_kb,
+            "backend_budget": args.backend_budget,
+        },
+        "endpoints": endpoints,
+        "upstreams": upstreams,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="端到端压测（本地上游替身）")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=20, help="虚拟用户数")
+    parser.add_argument("--requests", type=int, default=200, help="每个端点的请求数")
+    parser.add_argument("--duration", type=float, default=None, help="每个端点的最长压测时间（秒）")
+    parser.add_argument("--warmup", type=int, default=2, help="每个端点正式压测前的预热请求数")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--base-url", default=None, help="压测已运行的服务（不启动替身和服务进程）")
+    parser.add_argument("--app-port", type=int, default=8010)
+    parser.add_argument("--workers", type=int, default=1, help="服务进程的 uvicorn worker 数")
+    parser.add_argument("--llm-port", type=int, default=9101)
+    parser.add_argument("--multimodal-port", type=int, default=9102)
+    parser.add_argument("--ttft", type=float, default=0.3, help="替身 LLM 首 token 延迟（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--multimodal-latency", type=float, default=0.5)
+    parser.add_argument("--images", type=int, default=2, help="每个图片咨询请求的图片数")
+    parser.add_argument("--image-kb", type=int, default=256, help="每张图片的大小（KB）")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--mongodb-db", default="higo_loadtest")
+    parser.add_argument("--username", default="loadtest_user")
+    parser.add_argument("--password", default="LoadTest#2024pw")
+    parser.add_argument("--api-key", default=None, help="压测 completions 使用的 API Key（默认自动创建）")
+    parser.add_argument("--output", default="loadtest_report.json", help="JSON 报告路径")
+    parser.add_argument("--compare", default=None, help="与之前的 JSON 报告对比")
+    parser.add_argument(
+        "--backend-budget", nargs="+", default=[], metavar="BACKEND=COUNT",
+        help="每请求的后端往返预算，如 redis=6 mongo=1；有请求超出时以非零状态退出"
+    )
+    args = parser.parse_args()
+    try:
+        args.backend_budget = parse_budget(args.backend_budget)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    return args
+
+
+def main():
+    args = parse_args()
+    processes = []
+    if not args.base_url:
+        processes.append(start_fake_upstreams(args))
+        processes.append(start_app(args))
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print("\n📊 压测结果")
+    print("=" * 50)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(output)
+    print(f"\n💾 报告已写入: {args.output}")
+
+    multimodal = (report.get("upstreams") or {}).get("multimodal")
+    if multimodal and multimodal.get("rejected"):
+        print(f"⚠️  多模态替身拒绝了 {multimodal['rejected']} 个签名错误的请求")
+
+    if args.compare:
+        compare(report, args.compare)
+
+    if args.backend_budget:
+        over = {
+            endpoint: result["backend_budget_exceeded"]
+            for endpoint, result in report["endpoints"].items()
+            if result.get("backend_budget_exceeded")
+        }
+        if over:
+            print(f"❌ 超出后端往返预算 {args.backend_budget} 的请求数: {over}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()